@@ -3,7 +3,7 @@ import pandas as pd
 import os
 import numpy as np
 from db_connector import DatabaseConnector
-import time
+from bulk_import import bulk_import_vendors, bulk_import_items, bulk_import_mappings, prepare_items
 import plotly.express as px
 
 # Set page configuration
@@ -47,6 +47,9 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Code columns kept as text when reading sheets (leading zeros), as the streaming importers do
+TEXT_COLUMNS = {'SKU': str, 'Barcode': str}
+
 # Function to clean data
 def clean_data(df):
     """Clean dataframe by handling NaN values and type conversions"""
@@ -72,57 +75,18 @@ def clean_data(df):
 
 # Function to import vendors
 def import_vendors(df, db, progress_bar=None, status_text=None):
-    """Import vendor data from dataframe with manual ID management"""
-    # Count of successfully imported vendors
-    success_count = 0
+    """Import vendor data from dataframe in one batch (new vendors only, see bulk_import)"""
     total_count = len(df)
     
-    # Get the next available vendor_id
-    cursor = db.connection.cursor()
-    cursor.execute("SELECT ISNULL(MAX(vendor_id), 0) FROM Vendors")
-    next_id = cursor.fetchone()[0] + 1
+    if progress_bar is not None:
+        status_text.text(f"Checking {total_count} vendor rows against the database...")
     
-    # Process each vendor row
-    for i, (_, row) in enumerate(df.iterrows()):
-        vendor_name = row.get('Vendor')
-        contact_name = row.get('Contact Name')
-        vendor_email = row.get('Vendor Email')
-        vendor_phone = row.get('Vendor Phone')
-        
-        # Skip rows with no vendor name
-        if pd.isna(vendor_name) or not vendor_name:
-            continue
-        
-        # Check if vendor already exists
-        existing = db.fetch_data("SELECT vendor_id FROM Vendors WHERE vendor_name = ?", [vendor_name])
-        
-        if existing:
-            if progress_bar is not None:
-                status_text.text(f"Vendor already exists: {vendor_name}")
-            continue
-        
-        # Add vendor using IDENTITY column (don't specify vendor_id)
-        try:
-            query = """
-                INSERT INTO Vendors (vendor_name, contact_name, vendor_email, vendor_phone)
-                VALUES (?, ?, ?, ?)
-            """
-            db.execute_query(query, [vendor_name, contact_name, vendor_email, vendor_phone])
-            
-            success_count += 1
-            
-            if progress_bar is not None:
-                status_text.text(f"Added vendor: {vendor_name}")
-        
-        except Exception as e:
-            if progress_bar is not None:
-                status_text.text(f"Error adding vendor {vendor_name}: {str(e)}")
-        
-        # Update progress
+    try:
+        success_count = bulk_import_vendors(db.connection, df)
+    except Exception as e:
         if progress_bar is not None:
-            progress = (i + 1) / total_count
-            progress_bar.progress(progress)
-            time.sleep(0.01)  # Small delay for visual feedback
+            status_text.text(f"Error importing vendors: {str(e)}")
+        return 0
     
     if progress_bar is not None:
         progress_bar.progress(1.0)
@@ -132,290 +96,64 @@ def import_vendors(df, db, progress_bar=None, status_text=None):
 
 # Function to import unique items (first pass)
 def import_unique_items(df, db, source_sheet, progress_bar=None, status_text=None):
-    """Import unique items from dataframe (first pass) with manual ID management"""
-    # Dictionary to store unique items and their IDs
-    unique_items = {}
-    total_count = len(df)
-    
-    # Get the next available item_id
-    cursor = db.connection.cursor()
-    cursor.execute("SELECT ISNULL(MAX(item_id), 0) FROM Items")
-    next_id = cursor.fetchone()[0] + 1
+    """
+    Import unique items from dataframe (first pass) in one batch.
+    Returns the sheet rows with their item_id (input for create_item_vendor_mappings).
+    """
+    if progress_bar is not None:
+        status_text.text(f"Checking {len(df)} {source_sheet} rows against the database...")
     
-    # Process each item row
-    for i, (_, row) in enumerate(df.iterrows()):
-        item_name = row.get('Item Name')
-        item_type = row.get('Item Type')
-        
-        # Skip rows with no item name
-        if pd.isna(item_name) or not item_name:
-            continue
-        
-        # Get cost for uniqueness and handle numeric conversion properly
-        try:
-            cost = row.get('Cost')
-            cost = float(cost) if cost and not pd.isna(cost) else None
-        except (ValueError, TypeError):
-            cost = None
-        
-        # Create a unique key for this item including cost
-        item_key = f"{item_name}|{item_type}|{source_sheet}|{cost}"
-        
-        # Only add the item if we haven't seen it before
-        if item_key not in unique_items:
-            # Prepare item attributes based on source sheet
-            if source_sheet == 'BoxHero':
-                # Handle BoxHero data properly
-                try:
-                    sku = row.get('SKU')
-                    sku = str(sku) if sku and not pd.isna(sku) else None
-                except:
-                    sku = None
-                    
-                try:
-                    barcode = row.get('Barcode')
-                    barcode = str(barcode) if barcode and not pd.isna(barcode) else None
-                except:
-                    barcode = None
-                    
-                height, width, thickness = None, None, None
-            else:  # Raw Materials
-                sku, barcode = None, None
-                # Get dimensions and handle numeric conversion properly
-                try:
-                    height = row.get('Height')
-                    height = float(height) if height and not pd.isna(height) else None
-                except (ValueError, TypeError):
-                    height = None
-                    
-                try:
-                    width = row.get('Width')
-                    width = float(width) if width and not pd.isna(width) else None
-                except (ValueError, TypeError):
-                    width = None
-                    
-                try:
-                    thickness = row.get('Thickness')
-                    thickness = float(thickness) if thickness and not pd.isna(thickness) else None
-                except (ValueError, TypeError):
-                    thickness = None
-            
-            # Store cost in the item record for uniqueness
-            # We'll add a new column to store the cost with the item
-            
-            # Check if item already exists using proper NULL handling
-            query = """
-                SELECT item_id FROM Items 
-                WHERE item_name = ? AND item_type = ? AND source_sheet = ?
-                AND ISNULL(sku, '') = ISNULL(?, '')
-                AND ISNULL(barcode, '') = ISNULL(?, '')
-                AND ISNULL(height, 0) = ISNULL(?, 0)
-                AND ISNULL(width, 0) = ISNULL(?, 0)
-                AND ISNULL(thickness, 0) = ISNULL(?, 0)
-                AND ISNULL(cost, 0) = ISNULL(?, 0)
-            """
-            
-            existing = db.fetch_data(query, [item_name, item_type, source_sheet, sku, barcode, height, width, thickness, cost])
-            
-            if existing:
-                if progress_bar is not None:
-                    status_text.text(f"Item already exists: {item_name}")
-                unique_items[item_key] = existing[0]['item_id']
-                continue
-            
-            # Add item with manual ID
-            try:
-                # Check if we're connected to the database
-                if not db.connection:
-                    if progress_bar is not None:
-                        status_text.text("Database connection failed. Check your connection settings.")
-                    return False
-                
-                # First, check if cost column exists and add it if needed
-                try:
-                    # Check if cost column exists - using a simpler query that works in all SQL Server versions
-                    check_column_query = """
-                        SELECT COUNT(*) as count FROM INFORMATION_SCHEMA.COLUMNS
-                        WHERE TABLE_NAME = 'Items' AND COLUMN_NAME = 'cost'
-                    """
-                    column_exists = db.fetch_data(check_column_query)
-                    
-                    # Add cost column if it doesn't exist
-                    if column_exists and column_exists[0]['count'] == 0:
-                        alter_table_query = "ALTER TABLE Items ADD cost decimal(10,2) NULL"
-                        db.execute_query(alter_table_query)
-                        if progress_bar is not None:
-                            status_text.text("Added cost column to Items table")
-                except Exception as e:
-                    if progress_bar is not None:
-                        status_text.text(f"Error checking/adding cost column: {str(e)}")
-                
-                # Insert item with cost - using IDENTITY column (don't specify item_id)
-                # First, let's check if the item already exists to avoid unique constraint violations
-                # Use the full unique constraint from the database schema
-                check_query = """
-                    SELECT item_id FROM Items 
-                    WHERE item_name = ? AND item_type = ? 
-                    AND ISNULL(sku, '') = ISNULL(?, '')
-                    AND ISNULL(height, 0) = ISNULL(?, 0)
-                    AND ISNULL(width, 0) = ISNULL(?, 0)
-                    AND ISNULL(thickness, 0) = ISNULL(?, 0)
-                """
-                existing_item = db.fetch_data(check_query, [item_name, item_type, sku, height, width, thickness])
-                
-                if existing_item:
-                    # Item already exists, get its ID
-                    item_id = existing_item[0]['item_id']
-                    unique_items[item_key] = item_id
-                    if progress_bar is not None:
-                        status_text.text(f"Item already exists: {item_name} with ID {item_id}")
-                else:
-                    # Insert new item - handle NULL values properly
-                    query = """
-                        INSERT INTO Items (item_name, item_type, source_sheet, sku, barcode, height, width, thickness)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    """
-                    
-                    # Convert empty strings to None for SQL NULL
-                    if pd.isna(sku) or sku == '':
-                        sku = None
-                    if pd.isna(barcode) or barcode == '':
-                        barcode = None
-                    if pd.isna(height) or height == '':
-                        height = None
-                    if pd.isna(width) or width == '':
-                        width = None
-                    if pd.isna(thickness) or thickness == '':
-                        thickness = None
-                        
-                    # Print debug info
-                    print(f"Inserting item: {item_name}, {item_type}, {source_sheet}")
-                    print(f"Values: sku={sku}, barcode={barcode}, height={height}, width={width}, thickness={thickness}")
-                    
-                    # Try to handle barcode as string if it's a number
-                    try:
-                        if barcode is not None and isinstance(barcode, (int, float)):
-                            barcode = str(int(barcode))
-                    except:
-                        pass
-                    
-                    success = db.execute_query(query, [item_name, item_type, source_sheet, sku, barcode, height, width, thickness])
-                    
-                    if not success:
-                        if progress_bar is not None:
-                            status_text.text(f"Error inserting item: {item_name} - Check console for details")
-                            st.error(f"Error inserting item: {item_name} - Check console for details")
-                        continue
-                
-                # Only get the newly inserted item's ID if we actually inserted a new item
-                if not existing_item:
-                    id_query = "SELECT SCOPE_IDENTITY() AS new_id"
-                    result = db.fetch_data(id_query)
-                    if result and 'new_id' in result[0] and result[0]['new_id'] is not None:
-                        item_id = result[0]['new_id']
-                        unique_items[item_key] = item_id
-                        if progress_bar is not None:
-                            status_text.text(f"Added item: {item_name} with ID {item_id}")
-                    else:
-                        # Try to get the item ID by querying for the item
-                        query = """
-                            SELECT item_id FROM Items 
-                            WHERE item_name = ? AND item_type = ? AND source_sheet = ?
-                        """
-                        result = db.fetch_data(query, [item_name, item_type, source_sheet])
-                        if result:
-                            item_id = result[0]['item_id']
-                            unique_items[item_key] = item_id
-                            if progress_bar is not None:
-                                status_text.text(f"Found existing item: {item_name} with ID {item_id}")
-                
-                # Status already updated above
-            
-            except Exception as e:
-                if progress_bar is not None:
-                    status_text.text(f"Error adding item {item_name}: {str(e)}")
-        
-        # Update progress
+    try:
+        items, added = bulk_import_items(db.connection, df, source_sheet)
+    except Exception as e:
         if progress_bar is not None:
-            progress = (i + 1) / total_count
-            progress_bar.progress(progress)
-            status_text.text(f"Processed {i+1}/{total_count} rows, found {len(unique_items)} unique items")
-            time.sleep(0.01)  # Small delay for visual feedback
+            status_text.text(f"Error importing {source_sheet} items: {str(e)}")
+        return prepare_items(df, source_sheet).assign(item_id=pd.NA)
     
     if progress_bar is not None:
         progress_bar.progress(1.0)
-        status_text.text(f"Successfully added {len(unique_items)} unique {source_sheet} items")
+        status_text.text(f"Successfully added {added} new {source_sheet} items "
+                         f"({items['item_id'].nunique()} unique items in the sheet)")
     
-    return unique_items
+    return items
+
+# Function to make sure Items has the cost column the mappings copy into it
+def ensure_item_cost_column(db):
+    """Add Items.cost if it doesn't exist yet"""
+    check_column_query = """
+        SELECT COUNT(*) as count FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_NAME = 'Items' AND COLUMN_NAME = 'cost'
+    """
+    column_exists = db.fetch_data(check_column_query)
+    if column_exists and column_exists[0]['count'] == 0:
+        db.execute_query("ALTER TABLE Items ADD cost decimal(10,2) NULL")
 
 # Function to create item-vendor mappings (second pass)
-def create_item_vendor_mappings(df, db, source_sheet, items_dict, vendors_dict, progress_bar=None, status_text=None):
-    """Create item-vendor mappings from dataframe (second pass)"""
-    # Count of successfully created mappings
-    mapping_count = 0
-    total_count = len(df)
-    
-    # Process each row
-    for i, (_, row) in enumerate(df.iterrows()):
-        item_name = row.get('Item Name')
-        item_type = row.get('Item Type')
-        vendor_name = row.get('Vendor')
-        cost = row.get('Cost')
-        
-        # Skip rows with missing data
-        if (pd.isna(item_name) or not item_name or 
-            pd.isna(vendor_name) or not vendor_name):
-            continue
-        
-        # Get the item ID from our dictionary using cost in the key
-        item_key = f"{item_name}|{item_type}|{source_sheet}|{cost}"
-        item_id = items_dict.get(item_key)
-        
-        # Get the vendor ID
-        vendor_id = vendors_dict.get(vendor_name)
-        
-        # Create the mapping if both IDs exist
-        if item_id and vendor_id:
-            # Check if mapping already exists
-            existing_mappings = db.fetch_data(
-                "SELECT map_id FROM ItemVendorMap WHERE item_id = ? AND vendor_id = ?",
-                [item_id, vendor_id]
+def create_item_vendor_mappings(items, db, source_sheet, progress_bar=None, status_text=None):
+    """Create item-vendor mappings for the rows returned by import_unique_items (second pass)"""
+    if progress_bar is not None:
+        status_text.text(f"Linking {len(items)} {source_sheet} rows to vendors...")
+    
+    try:
+        new_links = bulk_import_mappings(db.connection, items)
+        
+        # Ensure cost is consistent between Items and ItemVendorMap tables (one batch)
+        costs = new_links[new_links['cost'].notna()].drop_duplicates('item_id')
+        if len(costs):
+            ensure_item_cost_column(db)
+            cursor = db.connection.cursor()
+            cursor.fast_executemany = True
+            cursor.executemany(
+                "UPDATE Items SET cost = ? WHERE item_id = ? AND (cost IS NULL OR cost != ?)",
+                [(float(cost), int(item_id), float(cost)) for item_id, cost in zip(costs['item_id'], costs['cost'])]
             )
-            
-            if not existing_mappings:
-                try:
-                    # Insert mapping directly with SQL to avoid issues
-                    query = "INSERT INTO ItemVendorMap (item_id, vendor_id, cost) VALUES (?, ?, ?)"
-                    db.execute_query(query, [item_id, vendor_id, cost])
-                    
-                    # Ensure cost is consistent between Items and ItemVendorMap tables
-                    update_cost_query = "UPDATE Items SET cost = ? WHERE item_id = ? AND (cost IS NULL OR cost != ?)"
-                    db.execute_query(update_cost_query, [cost, item_id, cost])
-                    
-                    mapping_count += 1
-                    
-                    if progress_bar is not None:
-                        status_text.text(f"Created mapping: {item_name} -> {vendor_name} (${cost})")
-                
-                except Exception as e:
-                    if progress_bar is not None:
-                        status_text.text(f"Error creating mapping {item_name} -> {vendor_name}: {str(e)}")
-            else:
-                if progress_bar is not None:
-                    status_text.text(f"Mapping already exists: {item_name} -> {vendor_name}")
-        else:
-            if not item_id and progress_bar is not None:
-                status_text.text(f"Warning: Item not found: {item_name}")
-            
-            if not vendor_id and progress_bar is not None:
-                status_text.text(f"Warning: Vendor not found: {vendor_name}")
-        
-        # Update progress
+            db.connection.commit()
+    except Exception as e:
         if progress_bar is not None:
-            progress = (i + 1) / total_count
-            progress_bar.progress(progress)
-            time.sleep(0.01)  # Small delay for visual feedback
+            status_text.text(f"Error creating {source_sheet} mappings: {str(e)}")
+        return 0
     
+    mapping_count = len(new_links)
     if progress_bar is not None:
         progress_bar.progress(1.0)
         status_text.text(f"Successfully created {mapping_count} item-vendor mappings for {source_sheet}")
@@ -541,7 +279,7 @@ def main():
             
             # Load and display BoxHero items data
             with tab2:
-                boxhero_df = pd.read_excel(excel_file, "BoxHero_Items")
+                boxhero_df = pd.read_excel(excel_file, "BoxHero_Items", dtype=TEXT_COLUMNS)
                 boxhero_df = clean_data(boxhero_df)
                 st.write("BoxHero Items Preview:")
                 st.dataframe(boxhero_df.head(10), use_container_width=True)
@@ -549,7 +287,7 @@ def main():
             
             # Load and display Raw Materials items data
             with tab3:
-                raw_materials_df = pd.read_excel(excel_file, "Raw_Materials_Items")
+                raw_materials_df = pd.read_excel(excel_file, "Raw_Materials_Items", dtype=TEXT_COLUMNS)
                 raw_materials_df = clean_data(raw_materials_df)
                 st.write("Raw Materials Items Preview:")
                 st.dataframe(raw_materials_df.head(10), use_container_width=True)
@@ -574,7 +312,7 @@ def main():
                         status_text_boxhero = st.empty()
                         
                         # First pass: Add all unique BoxHero items
-                        boxhero_items_dict = import_unique_items(boxhero_df, db, "BoxHero", progress_bar_boxhero, status_text_boxhero)
+                        boxhero_items = import_unique_items(boxhero_df, db, "BoxHero", progress_bar_boxhero, status_text_boxhero)
                         
                         # Step 3: Import unique Raw Materials items
                         st.subheader("Step 3: Importing Raw Materials Items")
@@ -582,19 +320,16 @@ def main():
                         status_text_raw = st.empty()
                         
                         # First pass: Add all unique Raw Materials items
-                        raw_items_dict = import_unique_items(raw_materials_df, db, "Raw Materials", progress_bar_raw, status_text_raw)
+                        raw_items = import_unique_items(raw_materials_df, db, "Raw Materials", progress_bar_raw, status_text_raw)
                         
                         # Step 4: Create all BoxHero item-vendor mappings
                         st.subheader("Step 4: Creating BoxHero Item-Vendor Mappings")
                         progress_bar_boxhero_map = st.progress(0)
                         status_text_boxhero_map = st.empty()
                         
-                        # Get all vendors for mapping
-                        vendors_dict = {v['vendor_name']: v['vendor_id'] for v in db.get_all_vendors()}
-                        
                         # Second pass: Create all BoxHero item-vendor mappings
                         boxhero_map_count = create_item_vendor_mappings(
-                            boxhero_df, db, "BoxHero", boxhero_items_dict, vendors_dict,
+                            boxhero_items, db, "BoxHero",
                             progress_bar_boxhero_map, status_text_boxhero_map
                         )
                         
@@ -605,7 +340,7 @@ def main():
                         
                         # Second pass: Create all Raw Materials item-vendor mappings
                         raw_map_count = create_item_vendor_mappings(
-                            raw_materials_df, db, "Raw Materials", raw_items_dict, vendors_dict,
+                            raw_items, db, "Raw Materials",
                             progress_bar_raw_map, status_text_raw_map
                         )
                         
@@ -616,8 +351,8 @@ def main():
                         # Print summary
                         st.markdown("### Import Summary")
                         st.markdown(f"- **Vendors imported:** {vendor_count}")
-                        st.markdown(f"- **BoxHero items imported:** {len(boxhero_items_dict)}")
-                        st.markdown(f"- **Raw Materials items imported:** {len(raw_items_dict)}")
+                        st.markdown(f"- **BoxHero items imported:** {boxhero_items['item_id'].nunique()}")
+                        st.markdown(f"- **Raw Materials items imported:** {raw_items['item_id'].nunique()}")
                         st.markdown(f"- **BoxHero item-vendor mappings:** {boxhero_map_count}")
                         st.markdown(f"- **Raw Materials item-vendor mappings:** {raw_map_count}")
                         st.markdown(f"- **Total item-vendor mappings:** {boxhero_map_count + raw_map_count}")
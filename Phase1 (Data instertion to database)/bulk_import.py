@@ -0,0 +1,264 @@
+"""
+Bulk import pipeline for the vendor workbook (Final_Vendor_List, BoxHero_Items, Raw_Materials_Items)
+Shared by app.py, import_data.py, improved_import.py and simple_import.py
+- Sheets are cleaned and de-duplicated with pandas instead of row-by-row loops
+- Existing keys are looked up for the rows being imported (IN lists of LOOKUP_CHUNK values)
+  and anti-joined in memory, so only new rows are sent and each call's work and memory stay
+  proportional to its input (stream_import.py feeds it one chunk at a time); the small
+  Vendors table is read whole
+- New rows are inserted with executemany (pyodbc fast_executemany: one round trip per batch)
+- Keys are compared the way the database compares them: NULL/blank like ISNULL(x, '') /
+  ISNULL(x, 0) and text case-insensitively (default SQL Server collation)
+
+Usage:
+    conn = db.connection
+    vendors_added = bulk_import_vendors(conn, vendors_df)
+    items, items_added = bulk_import_items(conn, boxhero_df, 'BoxHero')
+    new_links = bulk_import_mappings(conn, items)
+"""
+
+import pandas as pd
+
+BATCH_SIZE = 1000
+LOOKUP_CHUNK = 1000   # values per IN list (SQL Server allows 2100 parameters per statement)
+
+# Column in the Excel sheet -> column in the database
+VENDOR_COLUMNS = {
+    'Vendor': 'vendor_name',
+    'Contact Name': 'contact_name',
+    'Vendor Email': 'vendor_email',
+    'Vendor Phone': 'vendor_phone',
+}
+ITEM_COLUMNS = {
+    'Item Name': 'item_name',
+    'Item Type': 'item_type',
+    'SKU': 'sku',
+    'Barcode': 'barcode',
+    'Height': 'height',
+    'Width': 'width',
+    'Thickness': 'thickness',
+    'Vendor': 'vendor_name',
+    'Cost': 'cost',
+}
+NUMERIC_COLUMNS = ('height', 'width', 'thickness', 'cost')
+
+# Uniqueness keys (match the UNIQUE constraints in database_setup.sql)
+VENDOR_KEY = ['vendor_name']
+ITEM_KEY = ['item_name', 'item_type', 'sku', 'height', 'width', 'thickness']
+MAPPING_KEY = ['item_id', 'vendor_id']
+
+
+def _text_column(series):
+    """Strip text, write whole-number cells (numeric SKUs/barcodes) without '.0', blanks -> NA"""
+    if pd.api.types.is_float_dtype(series) and (series.dropna() % 1 == 0).all():
+        series = series.astype('Int64')
+    text = series.astype('string').str.strip()
+    return text.mask(text == '')
+
+
+def _select_columns(df, columns):
+    """Rename sheet columns to database columns and normalize them (missing columns -> NA)"""
+    out = pd.DataFrame(index=df.index)
+    for sheet_column, column in columns.items():
+        values = df[sheet_column] if sheet_column in df.columns else pd.Series(pd.NA, index=df.index, dtype=object)
+        if column in NUMERIC_COLUMNS:
+            out[column] = pd.to_numeric(values, errors='coerce').round(4)
+        else:
+            out[column] = _text_column(values)
+    return out
+
+
+def key_frame(df, columns):
+    """Comparison key for `columns`: ISNULL(text, '') case-folded, ISNULL(number, 0) rounded"""
+    key = pd.DataFrame(index=df.index)
+    for column in columns:
+        if column in NUMERIC_COLUMNS:
+            key[column] = pd.to_numeric(df[column], errors='coerce').fillna(0).round(4).astype(float)
+        elif column in MAPPING_KEY:
+            key[column] = df[column].astype('int64')
+        else:
+            key[column] = df[column].astype('string').fillna('').str.casefold()
+    return key
+
+
+def _db_values(df, columns):
+    """Rows as plain Python tuples for the driver (NA -> None, numpy scalars -> Python)"""
+    values = df[columns].astype(object)
+    values = values.where(values.notna(), None)
+    return [tuple(v.item() if hasattr(v, 'item') else v for v in row) for row in values.itertuples(index=False)]
+
+
+def _fetch_frame(conn, query, columns, params=None):
+    cursor = conn.cursor()
+    cursor.execute(query, params or [])
+    rows = [tuple(row) for row in cursor.fetchall()]
+    cursor.close()
+    return pd.DataFrame.from_records(rows, columns=columns)
+
+
+def _fetch_matching(conn, query, column, values, columns):
+    """`query` rows WHERE column IN (values), one query per LOOKUP_CHUNK distinct values"""
+    values = list(dict.fromkeys(values))
+    frames = [pd.DataFrame(columns=columns)]
+    for start in range(0, len(values), LOOKUP_CHUNK):
+        chunk = values[start:start + LOOKUP_CHUNK]
+        placeholders = ','.join('?' for _ in chunk)
+        frames.append(_fetch_frame(conn, f"{query} WHERE {column} IN ({placeholders})", columns, chunk))
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+
+def _anti_join(df, existing, key_columns):
+    """Rows of df whose key is not in `existing`"""
+    if existing.empty:
+        return df
+    merged = key_frame(df, key_columns).merge(
+        key_frame(existing, key_columns).drop_duplicates(),
+        on=key_columns, how='left', indicator=True
+    )
+    merged.index = df.index
+    return df[merged['_merge'] == 'left_only']
+
+
+def _insert_many(conn, query, rows):
+    """executemany in BATCH_SIZE batches (does not commit)"""
+    if not rows:
+        return 0
+    cursor = conn.cursor()
+    if hasattr(cursor, 'fast_executemany'):
+        cursor.fast_executemany = True
+    try:
+        for start in range(0, len(rows), BATCH_SIZE):
+            cursor.executemany(query, rows[start:start + BATCH_SIZE])
+    finally:
+        cursor.close()
+    return len(rows)
+
+
+# ========== Sheet cleaning ==========
+
+def prepare_vendors(df):
+    """Final_Vendor_List -> one row per vendor name (first occurrence wins)"""
+    vendors = _select_columns(df, VENDOR_COLUMNS)
+    vendors = vendors[vendors['vendor_name'].notna()]
+    return vendors.loc[key_frame(vendors, VENDOR_KEY).drop_duplicates().index]
+
+
+def prepare_items(df, source_sheet):
+    """
+    Item sheet -> one row per sheet line with database columns, source_sheet set and the
+    fields that don't apply to the sheet blanked (SKU/barcode for BoxHero, dimensions for
+    Raw Materials). Lines without an item name or type are dropped.
+    """
+    items = _select_columns(df, ITEM_COLUMNS)
+    items['source_sheet'] = source_sheet
+    if source_sheet == 'BoxHero':
+        items[['height', 'width', 'thickness']] = pd.NA
+    else:
+        items[['sku', 'barcode']] = pd.NA
+
+    skipped = len(items) - int((items['item_name'].notna() & items['item_type'].notna()).sum())
+    if skipped:
+        print(f"Skipping {skipped} {source_sheet} rows without an item name or type")
+    return items[items['item_name'].notna() & items['item_type'].notna()]
+
+
+# ========== Bulk loaders ==========
+
+def bulk_import_vendors(conn, df):
+    """Insert the vendors that aren't in the database yet. Returns the number added."""
+    vendors = prepare_vendors(df)
+    existing = _fetch_frame(conn, "SELECT vendor_name FROM Vendors", VENDOR_KEY)
+    new_vendors = _anti_join(vendors, existing, VENDOR_KEY)
+
+    try:
+        added = _insert_many(conn, """
+            INSERT INTO Vendors (vendor_name, contact_name, vendor_email, vendor_phone)
+            VALUES (?, ?, ?, ?)
+        """, _db_values(new_vendors, ['vendor_name', 'contact_name', 'vendor_email', 'vendor_phone']))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    print(f"Vendors: {added} added, {len(vendors) - added} already in the database")
+    return added
+
+
+def _item_ids(conn, items):
+    """item_id for every row of `items`, looked up by ITEM_KEY"""
+    existing = _fetch_matching(conn, f"SELECT item_id, {', '.join(ITEM_KEY)} FROM Items", 'item_name',
+                               items['item_name'].tolist(), ['item_id'] + ITEM_KEY)
+    if existing.empty:
+        return pd.Series(pd.NA, index=items.index, dtype='Int64')
+    lookup = key_frame(existing, ITEM_KEY)
+    lookup['item_id'] = existing['item_id'].astype('int64')
+    lookup = lookup.drop_duplicates(ITEM_KEY)
+    merged = key_frame(items, ITEM_KEY).merge(lookup, on=ITEM_KEY, how='left')
+    return pd.Series(merged['item_id'].to_numpy(), index=items.index).astype('Int64')
+
+
+def bulk_import_items(conn, df, source_sheet):
+    """
+    Insert the items of one sheet that aren't in the database yet.
+    Returns (items, added): every sheet line as database columns plus its item_id, and
+    the number of items inserted.
+    """
+    items = prepare_items(df, source_sheet)
+    unique_items = items.loc[key_frame(items, ITEM_KEY).drop_duplicates().index]
+    existing = _fetch_matching(conn, f"SELECT {', '.join(ITEM_KEY)} FROM Items", 'item_name',
+                               unique_items['item_name'].tolist(), ITEM_KEY)
+    new_items = _anti_join(unique_items, existing, ITEM_KEY)
+
+    columns = ['item_name', 'item_type', 'source_sheet', 'sku', 'barcode', 'height', 'width', 'thickness']
+    try:
+        added = _insert_many(conn, f"""
+            INSERT INTO Items ({', '.join(columns)})
+            VALUES ({', '.join('?' for _ in columns)})
+        """, _db_values(new_items, columns))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    items = items.assign(item_id=_item_ids(conn, items))
+    print(f"{source_sheet} items: {added} added, {len(unique_items) - added} already in the database")
+    return items, added
+
+
+def bulk_import_mappings(conn, items):
+    """
+    Insert the item-vendor links (with cost) for sheet lines returned by bulk_import_items
+    that aren't in ItemVendorMap yet. Returns the links added (item_id, vendor_id, cost, ...).
+    """
+    vendors = _fetch_frame(conn, "SELECT vendor_id, vendor_name FROM Vendors", ['vendor_id', 'vendor_name'])
+    vendor_ids = dict(zip(vendors['vendor_name'].astype(str).str.strip().str.casefold(), vendors['vendor_id']))
+
+    links = items[items['vendor_name'].notna()].copy()
+    links['vendor_id'] = links['vendor_name'].str.casefold().map(vendor_ids)
+
+    unknown_vendors = links.loc[links['vendor_id'].isna(), 'vendor_name'].unique()
+    if len(unknown_vendors):
+        print(f"Warning: {len(unknown_vendors)} vendors not found: {', '.join(sorted(unknown_vendors)[:10])}")
+    missing_items = int(links['item_id'].isna().sum())
+    if missing_items:
+        print(f"Warning: {missing_items} rows reference items that could not be imported")
+
+    links = links[links['vendor_id'].notna() & links['item_id'].notna()]
+    links = links.astype({'item_id': 'int64', 'vendor_id': 'int64'})
+    links = links.drop_duplicates(MAPPING_KEY)
+    existing = _fetch_matching(conn, "SELECT item_id, vendor_id FROM ItemVendorMap", 'item_id',
+                               links['item_id'].tolist(), MAPPING_KEY)
+    new_links = _anti_join(links, existing, MAPPING_KEY)
+
+    try:
+        added = _insert_many(conn, """
+            INSERT INTO ItemVendorMap (item_id, vendor_id, cost)
+            VALUES (?, ?, ?)
+        """, _db_values(new_links, ['item_id', 'vendor_id', 'cost']))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    print(f"Item-vendor mappings: {added} added, {len(links) - added} already in the database")
+    return new_links
@@ -40,3 +40,23 @@ CREATE TABLE ItemVendorMap (
     -- Add a unique constraint to prevent duplicate links
     CONSTRAINT unique_map UNIQUE (item_id, vendor_id)
 );
+
+-- Table 4: ReferenceDataVersions
+-- Bumped by the Phase 2 app whenever Items, Vendors or ItemVendorMap change, so the
+-- Phase 3 app knows when to reload its cached copy of that reference data
+CREATE TABLE ReferenceDataVersions (
+    table_name VARCHAR(64) PRIMARY KEY,
+    version INT NOT NULL DEFAULT 0,
+    updated_at DATETIME NULL
+);
+
+-- Table 5: ImportRowHashes
+-- Content hash of each Vendors / Items / ItemVendorMap row as last synced by delta_import.py,
+-- so a re-import only writes the rows whose source data changed
+CREATE TABLE ImportRowHashes (
+    table_name VARCHAR(64) NOT NULL,
+    row_id INT NOT NULL,
+    row_hash CHAR(40) NOT NULL,
+    synced_at DATETIME NULL,
+    PRIMARY KEY (table_name, row_id)
+);
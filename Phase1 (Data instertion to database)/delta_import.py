@@ -0,0 +1,357 @@
+"""
+Delta (incremental) sync of the vendor workbook or a supplier CSV, driven by content hashes
+- Every cleaned vendor / item / item-vendor row is hashed (SHA-1 of its normalized values)
+- The hash of what was last synced is kept in ImportRowHashes (table_name, row_id) next to
+  the record's id, so Vendors / Items / ItemVendorMap and the apps that read them are unchanged
+- On re-import rows are matched on their unique key and only rows whose hash changed are
+  written: new rows are inserted, changed rows updated, unchanged rows are not touched
+- Rows in the database that are no longer in the file are reported as deletes and only removed
+  with apply_deletes (--apply-deletes); if a delete fails (e.g. an item used by a Phase 3
+  request) that table's deletes are rolled back and reported
+- Rows without a stored hash (loaded by the other importers) are hashed from their database
+  values, so the first sync only writes the rows that really differ
+- A manual edit (e.g. in Phase 2) is kept until that row changes in the source file
+- Files are read in chunks (stream_import.iter_chunks) and each chunk is committed on its own;
+  a sync always runs from the top (unchanged rows are cheap) so deletes see the whole file
+
+Usage:
+    python delta_import.py Vendor_Data.xlsx
+    python delta_import.py supplier_prices.csv --source "Raw Materials" --apply-deletes
+"""
+
+import hashlib
+import argparse
+from datetime import datetime
+import pandas as pd
+from bulk_import import (
+    prepare_vendors, prepare_items, key_frame, _fetch_frame, _fetch_matching, _insert_many, _db_values,
+    VENDOR_KEY, ITEM_KEY, MAPPING_KEY
+)
+from stream_import import iter_chunks, is_csv, CHUNK_SIZE, ITEM_SHEETS, VENDOR_SHEET
+
+HASH_TABLE = 'ImportRowHashes'
+
+# Hashed columns per table (numbers at the scale the database stores them)
+VENDOR_FIELDS = ['vendor_name', 'contact_name', 'vendor_email', 'vendor_phone']
+ITEM_FIELDS = ['item_name', 'item_type', 'source_sheet', 'sku', 'barcode', 'height', 'width', 'thickness']
+MAPPING_FIELDS = ['item_id', 'vendor_id', 'cost']
+DECIMALS = {'height': 4, 'width': 4, 'thickness': 4, 'cost': 2}
+
+TABLES = {
+    'Vendors': {
+        'id': 'vendor_id', 'key': VENDOR_KEY, 'fields': VENDOR_FIELDS,
+        'query': f"""SELECT t.vendor_id, {', '.join('t.' + f for f in VENDOR_FIELDS)}, h.row_hash AS stored_hash
+                     FROM Vendors t
+                     LEFT JOIN {HASH_TABLE} h ON h.table_name = 'Vendors' AND h.row_id = t.vendor_id""",
+        'lookup_column': None,   # small table - read whole
+    },
+    'Items': {
+        'id': 'item_id', 'key': ITEM_KEY, 'fields': ITEM_FIELDS,
+        'query': f"""SELECT t.item_id, {', '.join('t.' + f for f in ITEM_FIELDS)}, h.row_hash AS stored_hash
+                     FROM Items t
+                     LEFT JOIN {HASH_TABLE} h ON h.table_name = 'Items' AND h.row_id = t.item_id""",
+        'lookup_column': 'item_name',
+    },
+    'ItemVendorMap': {
+        'id': 'map_id', 'key': MAPPING_KEY, 'fields': MAPPING_FIELDS,
+        'query': f"""SELECT t.map_id, {', '.join('t.' + f for f in MAPPING_FIELDS)}, h.row_hash AS stored_hash
+                     FROM ItemVendorMap t
+                     LEFT JOIN {HASH_TABLE} h ON h.table_name = 'ItemVendorMap' AND h.row_id = t.map_id""",
+        'lookup_column': 'item_id',
+    },
+}
+
+
+def row_hashes(df, fields):
+    """SHA-1 of each row's normalized values (NULL -> '', numbers at their database scale)"""
+    parts = []
+    for field in fields:
+        column = df[field]
+        if field in DECIMALS:
+            scale = DECIMALS[field]
+            numbers = pd.to_numeric(column, errors='coerce').astype(float).round(scale)
+            text = numbers.map(lambda v: '' if pd.isna(v) else f"{v:.{scale}f}")
+        elif field in MAPPING_KEY:
+            text = column.astype('int64').astype(str)
+        else:
+            text = column.astype('string').fillna('').astype(str)
+        parts.append(text.astype(str))
+    joined = parts[0].str.cat(parts[1:], sep='\x1f') if len(parts) > 1 else parts[0]
+    return joined.map(lambda value: hashlib.sha1(value.encode('utf-8')).hexdigest())
+
+
+def ensure_hash_table(conn):
+    """Create ImportRowHashes if this database predates it"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT row_hash FROM {HASH_TABLE} WHERE 1 = 0")
+        cursor.fetchall()
+    except Exception:
+        conn.rollback()
+        cursor.execute(f"""
+            CREATE TABLE {HASH_TABLE} (
+                table_name VARCHAR(64) NOT NULL,
+                row_id INT NOT NULL,
+                row_hash CHAR(40) NOT NULL,
+                synced_at DATETIME NULL,
+                PRIMARY KEY (table_name, row_id)
+            )
+        """)
+        conn.commit()
+    finally:
+        cursor.close()
+
+
+def new_report():
+    return {table: {'added': 0, 'updated': 0, 'unchanged': 0, 'stale': 0, 'deleted': 0} for table in TABLES}
+
+
+def _existing_rows(conn, table, rows):
+    spec = TABLES[table]
+    columns = [spec['id']] + spec['fields'] + ['stored_hash']
+    if spec['lookup_column'] is None:
+        return _fetch_frame(conn, spec['query'], columns)
+    return _fetch_matching(conn, spec['query'], f"t.{spec['lookup_column']}",
+                           rows[spec['lookup_column']].tolist(), columns)
+
+
+def _match(rows, existing, table):
+    """rows + the matching record's id and its current hash (stored, else computed from its values)"""
+    spec = TABLES[table]
+    id_column = spec['id']
+    if existing.empty:
+        return rows.assign(**{id_column: pd.NA, 'current_hash': None, 'stored_hash': None})
+
+    existing = existing.copy()
+    computed = row_hashes(existing, spec['fields'])
+    existing['current_hash'] = existing['stored_hash'].where(existing['stored_hash'].notna(), computed)
+    lookup = key_frame(existing, spec['key'])
+    lookup[[id_column, 'current_hash', 'stored_hash']] = existing[[id_column, 'current_hash', 'stored_hash']]
+    lookup = lookup.drop_duplicates(spec['key'])
+
+    merged = key_frame(rows, spec['key']).merge(lookup, on=spec['key'], how='left')
+    merged.index = rows.index
+    return rows.assign(**{column: merged[column] for column in (id_column, 'current_hash', 'stored_hash')})
+
+
+def _store_hashes(conn, table, ids, hashes):
+    """Replace the stored hashes of `ids` (does not commit)"""
+    ids = [int(row_id) for row_id in ids]
+    if not ids:
+        return
+    _insert_many(conn, f"DELETE FROM {HASH_TABLE} WHERE table_name = ? AND row_id = ?",
+                 [(table, row_id) for row_id in ids])
+    synced_at = datetime.now()
+    _insert_many(conn, f"INSERT INTO {HASH_TABLE} (table_name, row_id, row_hash, synced_at) VALUES (?, ?, ?, ?)",
+                 [(table, row_id, row_hash, synced_at) for row_id, row_hash in zip(ids, hashes)])
+
+
+def sync_rows(conn, table, rows, report):
+    """
+    Write the rows (unique on the table's key) whose hash differs from the database and commit.
+    Returns the rows with the record id of each one.
+    """
+    spec = TABLES[table]
+    id_column = spec['id']
+    fields = spec['fields']
+
+    rows = rows.assign(row_hash=row_hashes(rows, fields))
+    matched = _match(rows, _existing_rows(conn, table, rows), table)
+    found = matched[id_column].notna()
+    same = found & (matched['row_hash'] == matched['current_hash'])
+    new_rows = matched[~found]
+    changed = matched[found & ~same]
+    backfill = matched[same & matched['stored_hash'].isna()]
+
+    try:
+        _insert_many(conn, f"INSERT INTO {table} ({', '.join(fields)}) VALUES ({', '.join('?' for _ in fields)})",
+                     _db_values(new_rows, fields))
+        _insert_many(conn, f"UPDATE {table} SET {', '.join(f + ' = ?' for f in fields)} WHERE {id_column} = ?",
+                     [values + (int(row_id),) for values, row_id in zip(_db_values(changed, fields), changed[id_column])])
+
+        if len(new_rows):
+            inserted = _match(new_rows.drop(columns=[id_column, 'current_hash', 'stored_hash']),
+                              _existing_rows(conn, table, new_rows), table)
+            matched.loc[inserted.index, id_column] = inserted[id_column]
+            new_rows = matched.loc[new_rows.index]
+
+        written = pd.concat([new_rows, changed, backfill])
+        written = written[written[id_column].notna()]
+        _store_hashes(conn, table, written[id_column], written['row_hash'])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    report[table]['added'] += len(new_rows)
+    report[table]['updated'] += len(changed)
+    report[table]['unchanged'] += int(same.sum())
+    return matched
+
+
+def sync_vendors(conn, chunk, report):
+    """Sync one chunk of the vendor sheet. Returns the vendor ids it contains."""
+    vendors = sync_rows(conn, 'Vendors', prepare_vendors(chunk), report)
+    return set(vendors['vendor_id'].dropna().astype(int))
+
+
+def sync_items(conn, chunk, source_sheet, report):
+    """
+    Sync one chunk of an item sheet: items first, then their vendor links (with cost).
+    Returns (item ids, mapping ids) it contains.
+    """
+    items = prepare_items(chunk, source_sheet)
+    unique_items = items.loc[key_frame(items, ITEM_KEY).drop_duplicates().index]
+    synced = sync_rows(conn, 'Items', unique_items, report)
+
+    # Every sheet line gets the id of its (deduplicated) item
+    ids = key_frame(synced, ITEM_KEY).assign(item_id=synced['item_id'])
+    merged = key_frame(items, ITEM_KEY).merge(ids, on=ITEM_KEY, how='left')
+    items = items.assign(item_id=pd.Series(merged['item_id'].to_numpy(), index=items.index))
+
+    vendors = _fetch_frame(conn, "SELECT vendor_id, vendor_name FROM Vendors", ['vendor_id', 'vendor_name'])
+    vendor_ids = dict(zip(vendors['vendor_name'].astype(str).str.strip().str.casefold(), vendors['vendor_id']))
+    links = items[items['vendor_name'].notna() & items['item_id'].notna()].copy()
+    links['vendor_id'] = links['vendor_name'].str.casefold().map(vendor_ids)
+    unknown_vendors = links.loc[links['vendor_id'].isna(), 'vendor_name'].unique()
+    if len(unknown_vendors):
+        print(f"Warning: {len(unknown_vendors)} vendors not found: {', '.join(sorted(unknown_vendors)[:10])}")
+
+    links = links[links['vendor_id'].notna()].astype({'item_id': 'int64', 'vendor_id': 'int64'})
+    links = links.drop_duplicates(MAPPING_KEY)
+    links['cost'] = links['cost'].round(DECIMALS['cost'])
+    links = sync_rows(conn, 'ItemVendorMap', links[MAPPING_FIELDS], report)
+
+    return set(synced['item_id'].dropna().astype(int)), set(links['map_id'].dropna().astype(int))
+
+
+def _stale_ids(conn, query, params, seen):
+    rows = _fetch_frame(conn, query, ['row_id'], params)
+    return sorted(set(rows['row_id'].astype(int)) - seen)
+
+
+def remove_stale(conn, table, stale_ids, report, apply_deletes):
+    """Report (and with apply_deletes, delete) rows that are no longer in the source file"""
+    report[table]['stale'] += len(stale_ids)
+    if not apply_deletes or not stale_ids:
+        return
+    id_column = TABLES[table]['id']
+    try:
+        _insert_many(conn, f"DELETE FROM {table} WHERE {id_column} = ?", [(row_id,) for row_id in stale_ids])
+        _insert_many(conn, f"DELETE FROM {HASH_TABLE} WHERE table_name = ? AND row_id = ?",
+                     [(table, row_id) for row_id in stale_ids])
+        conn.commit()
+        report[table]['deleted'] += len(stale_ids)
+    except Exception as e:
+        conn.rollback()
+        print(f"Could not delete {len(stale_ids)} stale {table} rows (still referenced?): {e}")
+
+
+def prune_hashes(conn):
+    """Drop stored hashes of records deleted elsewhere (Phase 2, cascades from vendor deletes)"""
+    cursor = conn.cursor()
+    try:
+        for table, spec in TABLES.items():
+            cursor.execute(f"""
+                DELETE FROM {HASH_TABLE}
+                WHERE table_name = ?
+                  AND NOT EXISTS (SELECT 1 FROM {table} t WHERE t.{spec['id']} = {HASH_TABLE}.row_id)
+            """, [table])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def sync_item_source(conn, path, sheet_name, source_sheet, report, chunk_size=CHUNK_SIZE, apply_deletes=False):
+    """Sync one item sheet (or CSV) for a source_sheet, then handle the rows that disappeared"""
+    seen_items, seen_links = set(), set()
+    rows_done = 0
+    for chunk in iter_chunks(path, sheet_name, chunk_size):
+        item_ids, link_ids = sync_items(conn, chunk, source_sheet, report)
+        seen_items |= item_ids
+        seen_links |= link_ids
+        rows_done += len(chunk)
+        print(f"{sheet_name or 'csv'}: {rows_done} rows synced")
+
+    stale_links = _stale_ids(conn, """
+        SELECT m.map_id FROM ItemVendorMap m
+        JOIN Items i ON i.item_id = m.item_id
+        WHERE i.source_sheet = ?
+    """, [source_sheet], seen_links)
+    remove_stale(conn, 'ItemVendorMap', stale_links, report, apply_deletes)
+    stale_items = _stale_ids(conn, "SELECT item_id FROM Items WHERE source_sheet = ?", [source_sheet], seen_items)
+    remove_stale(conn, 'Items', stale_items, report, apply_deletes)
+
+
+def sync_workbook(conn, path, chunk_size=CHUNK_SIZE, apply_deletes=False):
+    """Sync vendors, then every item sheet of the vendor workbook. Returns the report."""
+    ensure_hash_table(conn)
+    report = new_report()
+
+    seen_vendors = set()
+    for chunk in iter_chunks(path, VENDOR_SHEET, chunk_size):
+        seen_vendors |= sync_vendors(conn, chunk, report)
+
+    for sheet_name, source_sheet in ITEM_SHEETS.items():
+        sync_item_source(conn, path, sheet_name, source_sheet, report, chunk_size, apply_deletes)
+
+    stale_vendors = _stale_ids(conn, "SELECT vendor_id FROM Vendors", None, seen_vendors)
+    remove_stale(conn, 'Vendors', stale_vendors, report, apply_deletes)
+    prune_hashes(conn)
+    return report
+
+
+def sync_csv(conn, path, source_sheet, chunk_size=CHUNK_SIZE, apply_deletes=False):
+    """Sync a CSV price list holding every item of one source_sheet. Returns the report."""
+    ensure_hash_table(conn)
+    report = new_report()
+    sync_item_source(conn, path, None, source_sheet, report, chunk_size, apply_deletes)
+    prune_hashes(conn)
+    return report
+
+
+def print_report(report, apply_deletes):
+    print("\nSync Summary:")
+    for table, counts in report.items():
+        deletes = (f"{counts['deleted']} deleted" if apply_deletes
+                   else f"{counts['stale']} no longer in the file (run with --apply-deletes to remove)")
+        print(f"- {table}: {counts['added']} added, {counts['updated']} updated, "
+              f"{counts['unchanged']} unchanged, {deletes}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally sync a vendor workbook or CSV price list")
+    parser.add_argument('path', help="Excel workbook (.xlsx) or CSV file")
+    parser.add_argument('--source', choices=sorted(ITEM_SHEETS.values()),
+                        help="source_sheet for the items of a CSV file (required for CSV)")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help=f"rows per batch (default {CHUNK_SIZE})")
+    parser.add_argument('--apply-deletes', action='store_true',
+                        help="delete rows that are no longer in the file (default: only report them)")
+    args = parser.parse_args()
+
+    if is_csv(args.path) and not args.source:
+        parser.error("--source is required for CSV files")
+
+    from db_connector import DatabaseConnector
+    db = DatabaseConnector()
+    if not db.connection:
+        print("Failed to connect to the database. Please check your connection settings.")
+        return
+
+    try:
+        if is_csv(args.path):
+            report = sync_csv(db.connection, args.path, args.source, args.chunk_size, args.apply_deletes)
+        else:
+            report = sync_workbook(db.connection, args.path, args.chunk_size, args.apply_deletes)
+        print_report(report, args.apply_deletes)
+    except Exception as e:
+        print(f"An error occurred during sync: {e}")
+    finally:
+        db.close_connection()
+
+
+if __name__ == "__main__":
+    main()
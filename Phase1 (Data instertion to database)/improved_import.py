@@ -1,144 +1,30 @@
-import pandas as pd
 import os
 from dotenv import load_dotenv
 from db_connector import DatabaseConnector
-import numpy as np
+from stream_import import stream_vendors, stream_items
 
 # Load environment variables
 load_dotenv()
 
-def clean_data(df):
-    """Clean dataframe by replacing NaN values with None"""
-    return df.replace({np.nan: None})
-
 def import_vendors(excel_path, db):
-    """Import vendor data from the Final_Vendor_List sheet"""
+    """Import vendor data from the Final_Vendor_List sheet (new vendors only, batched)"""
     print("Importing vendors...")
     
-    # Read vendor data from Excel
-    vendors_df = pd.read_excel(excel_path, sheet_name='Final_Vendor_List')
-    vendors_df = clean_data(vendors_df)
-    
-    # Count of successfully imported vendors
-    success_count = 0
+    # Read the sheet in chunks (one pass, bounded memory)
+    success_count = stream_vendors(db.connection, excel_path)
     
-    # Process each vendor row
-    for _, row in vendors_df.iterrows():
-        vendor_name = row.get('Vendor')
-        contact_name = row.get('Contact Name')
-        vendor_email = row.get('Vendor Email')
-        vendor_phone = row.get('Vendor Phone')
-        
-        # Skip rows with no vendor name
-        if pd.isna(vendor_name) or not vendor_name:
-            continue
-            
-        # Add vendor to database
-        if db.add_vendor(vendor_name, contact_name, vendor_email, vendor_phone):
-            success_count += 1
-    
-    print(f"Successfully imported {success_count} vendors out of {len(vendors_df)}")
+    print(f"Successfully imported {success_count} vendors")
     return success_count
 
 def import_items_with_mappings(excel_path, sheet_name, source_sheet, db):
     """Import items and create vendor mappings from Excel sheet"""
     print(f"Importing {source_sheet} items...")
     
-    # Read items data from Excel
-    items_df = pd.read_excel(excel_path, sheet_name=sheet_name)
-    items_df = clean_data(items_df)
-    
-    # Get all vendors for mapping
-    all_vendors = db.get_all_vendors()
-    vendors_dict = {v['vendor_name']: v['vendor_id'] for v in all_vendors}
-    
-    # First pass: Add all unique items to the database
-    unique_items = {}  # Dictionary to store unique items and their IDs
-    item_count = 0
-    
-    print("Step 1: Adding unique items...")
-    for _, row in items_df.iterrows():
-        item_name = row.get('Item Name')
-        item_type = row.get('Item Type')
-        
-        # Skip rows with no item name
-        if pd.isna(item_name) or not item_name:
-            continue
-        
-        # Create a unique key for this item
-        item_key = f"{item_name}|{item_type}|{source_sheet}"
-        
-        # Only add the item if we haven't seen it before
-        if item_key not in unique_items:
-            # Prepare item attributes based on source sheet
-            if source_sheet == 'BoxHero':
-                sku = row.get('SKU')
-                barcode = row.get('Barcode')
-                height, width, thickness = None, None, None
-            else:  # Raw Materials
-                sku, barcode = None, None
-                height = row.get('Height')
-                width = row.get('Width')
-                thickness = row.get('Thickness')
-            
-            # Add item to database
-            if db.add_item(item_name, item_type, source_sheet, sku, barcode, height, width, thickness):
-                item_count += 1
-                
-                # Get the item ID and store it
-                items = db.fetch_data(
-                    "SELECT item_id FROM Items WHERE item_name = ? AND item_type = ? AND source_sheet = ?", 
-                    [item_name, item_type, source_sheet]
-                )
-                
-                if items:
-                    unique_items[item_key] = items[0]['item_id']
+    # One pass over the sheet: each chunk adds its unique items (deduped on the Items
+    # unique key), then its item-vendor mappings, and is committed before the next one
+    item_count, mapping_count = stream_items(db.connection, excel_path, sheet_name, source_sheet)
     
     print(f"Successfully added {item_count} unique {source_sheet} items")
-    
-    # Second pass: Create all item-vendor mappings
-    mapping_count = 0
-    
-    print("Step 2: Creating item-vendor mappings...")
-    for _, row in items_df.iterrows():
-        item_name = row.get('Item Name')
-        item_type = row.get('Item Type')
-        vendor_name = row.get('Vendor')
-        cost = row.get('Cost')
-        
-        # Skip rows with missing data
-        if (pd.isna(item_name) or not item_name or 
-            pd.isna(vendor_name) or not vendor_name):
-            continue
-        
-        # Get the item ID from our dictionary
-        item_key = f"{item_name}|{item_type}|{source_sheet}"
-        item_id = unique_items.get(item_key)
-        
-        # Get the vendor ID
-        vendor_id = vendors_dict.get(vendor_name)
-        
-        # Create the mapping if both IDs exist
-        if item_id and vendor_id:
-            # Check if mapping already exists
-            existing_mappings = db.fetch_data(
-                "SELECT map_id FROM ItemVendorMap WHERE item_id = ? AND vendor_id = ?",
-                [item_id, vendor_id]
-            )
-            
-            if not existing_mappings:
-                # Link item to vendor with cost
-                if db.link_item_to_vendor(item_id, vendor_id, cost):
-                    mapping_count += 1
-                    print(f"  Created mapping: {item_name} -> {vendor_name} (${cost})")
-            else:
-                print(f"  Mapping already exists: {item_name} -> {vendor_name}")
-        else:
-            if not item_id:
-                print(f"  Warning: Could not find item ID for {item_name}")
-            if not vendor_id:
-                print(f"  Warning: Could not find vendor ID for {vendor_name}")
-    
     print(f"Successfully created {mapping_count} item-vendor mappings for {source_sheet}")
     return item_count, mapping_count
 
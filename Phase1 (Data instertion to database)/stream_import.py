@@ -0,0 +1,205 @@
+"""
+Streaming import for large vendor workbooks and CSV price lists
+- Each sheet is read once, row by row (openpyxl read_only for .xlsx, chunked pandas reader
+  for .csv), and handed to the bulk_import pipeline in fixed-size chunks
+- Items and their vendor mappings are imported and committed chunk by chunk, so memory stays
+  bounded by the chunk size no matter how large the file is
+- With a checkpoint, the number of committed rows per sheet is saved after every chunk; an
+  interrupted import resumes after the last committed chunk (a chunk that was half done is
+  simply re-run - the pipeline skips rows that are already in the database)
+
+Usage:
+    python stream_import.py Vendor_Data.xlsx
+    python stream_import.py supplier_prices.csv --source "Raw Materials" --chunk-size 10000
+    python stream_import.py Vendor_Data.xlsx --restart      # ignore a saved checkpoint
+"""
+
+import os
+import json
+import argparse
+import pandas as pd
+from bulk_import import bulk_import_vendors, bulk_import_items, bulk_import_mappings
+
+CHUNK_SIZE = 5000
+
+# Workbook sheet -> source_sheet value stored on Items
+ITEM_SHEETS = {
+    'BoxHero_Items': 'BoxHero',
+    'Raw_Materials_Items': 'Raw Materials',
+}
+VENDOR_SHEET = 'Final_Vendor_List'
+CSV_SHEET = 'csv'   # checkpoint key for CSV files (they have a single "sheet")
+
+
+def is_csv(path):
+    return os.path.splitext(path)[1].lower() in ('.csv', '.txt')
+
+
+def iter_chunks(path, sheet_name=None, chunk_size=CHUNK_SIZE, skip_rows=0):
+    """
+    DataFrames of up to chunk_size data rows from one sheet (or a CSV file), read in a
+    single pass. skip_rows data rows after the header are skipped (resuming a checkpoint).
+    """
+    if is_csv(path):
+        # Text columns stay text (SKUs keep leading zeros); numbers are converted by bulk_import
+        reader = pd.read_csv(path, chunksize=chunk_size, dtype=str,
+                             skiprows=range(1, skip_rows + 1), skipinitialspace=True)
+        for chunk in reader:
+            chunk.columns = [str(column).strip() for column in chunk.columns]
+            yield chunk
+        return
+
+    from openpyxl import load_workbook
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook[sheet_name].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(column).strip() if column is not None else f"Unnamed: {i}" for i, column in enumerate(header)]
+        width = len(columns)
+
+        batch = []
+        for row_number, row in enumerate(rows):
+            if row_number < skip_rows:
+                continue
+            # read_only rows stop at the last non-empty cell - pad them to the header width
+            batch.append(row[:width] + (None,) * (width - len(row)))
+            if len(batch) == chunk_size:
+                yield pd.DataFrame.from_records(batch, columns=columns)
+                batch = []
+        if batch:
+            yield pd.DataFrame.from_records(batch, columns=columns)
+    finally:
+        workbook.close()
+
+
+class ImportCheckpoint:
+    """
+    Committed row counts per sheet, saved next to the source file (<file>.checkpoint.json).
+    Ignored if the source file has changed since the checkpoint was written.
+    """
+
+    def __init__(self, path):
+        self.file = f"{path}.checkpoint.json"
+        stat = os.stat(path)
+        self.source = {'size': stat.st_size, 'mtime': stat.st_mtime}
+        self.rows = {}
+        if os.path.exists(self.file):
+            try:
+                with open(self.file) as f:
+                    saved = json.load(f)
+                if saved.get('source') == self.source:
+                    self.rows = saved.get('rows', {})
+            except (ValueError, OSError) as e:
+                print(f"Ignoring unreadable checkpoint {self.file}: {e}")
+
+    def rows_done(self, sheet_name):
+        return self.rows.get(sheet_name, 0)
+
+    def save(self, sheet_name, rows_done):
+        self.rows[sheet_name] = rows_done
+        temp_file = f"{self.file}.tmp"
+        with open(temp_file, 'w') as f:
+            json.dump({'source': self.source, 'rows': self.rows}, f)
+        os.replace(temp_file, self.file)
+
+    def clear(self):
+        self.rows = {}
+        if os.path.exists(self.file):
+            os.remove(self.file)
+
+
+def stream_vendors(conn, path, sheet_name=VENDOR_SHEET, chunk_size=CHUNK_SIZE, checkpoint=None):
+    """Import the vendor sheet chunk by chunk. Returns the number of vendors added."""
+    done = checkpoint.rows_done(sheet_name) if checkpoint else 0
+    added = 0
+    for chunk in iter_chunks(path, sheet_name, chunk_size, skip_rows=done):
+        added += bulk_import_vendors(conn, chunk)
+        done += len(chunk)
+        if checkpoint:
+            checkpoint.save(sheet_name, done)
+    return added
+
+
+def stream_items(conn, path, sheet_name, source_sheet, chunk_size=CHUNK_SIZE, checkpoint=None):
+    """
+    Import the items of one sheet (or CSV) and their vendor mappings chunk by chunk.
+    Returns (items_added, mappings_added).
+    """
+    checkpoint_key = sheet_name or CSV_SHEET
+    done = checkpoint.rows_done(checkpoint_key) if checkpoint else 0
+    if done:
+        print(f"Resuming {checkpoint_key} after {done} committed rows")
+
+    items_added = 0
+    mappings_added = 0
+    for chunk in iter_chunks(path, sheet_name, chunk_size, skip_rows=done):
+        items, added = bulk_import_items(conn, chunk, source_sheet)
+        items_added += added
+        mappings_added += len(bulk_import_mappings(conn, items))
+
+        done += len(chunk)
+        if checkpoint:
+            checkpoint.save(checkpoint_key, done)
+        print(f"{checkpoint_key}: {done} rows processed ({items_added} items, {mappings_added} mappings added)")
+
+    return items_added, mappings_added
+
+
+def stream_workbook(conn, path, chunk_size=CHUNK_SIZE, checkpoint=None):
+    """Vendors, then every item sheet of the vendor workbook. Returns a summary dict."""
+    summary = {'vendors': stream_vendors(conn, path, chunk_size=chunk_size, checkpoint=checkpoint)}
+    for sheet_name, source_sheet in ITEM_SHEETS.items():
+        summary[source_sheet] = stream_items(conn, path, sheet_name, source_sheet, chunk_size, checkpoint)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream a vendor workbook or CSV price list into the database")
+    parser.add_argument('path', help="Excel workbook (.xlsx) or CSV file")
+    parser.add_argument('--source', choices=sorted(ITEM_SHEETS.values()),
+                        help="source_sheet for the items of a CSV file (required for CSV)")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help=f"rows per batch (default {CHUNK_SIZE})")
+    parser.add_argument('--restart', action='store_true', help="ignore a saved checkpoint and start from the top")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        print(f"File not found: {args.path}")
+        return
+    if is_csv(args.path) and not args.source:
+        parser.error("--source is required for CSV files")
+
+    from db_connector import DatabaseConnector
+    db = DatabaseConnector()
+    if not db.connection:
+        print("Failed to connect to the database. Please check your connection settings.")
+        return
+
+    checkpoint = ImportCheckpoint(args.path)
+    if args.restart:
+        checkpoint.clear()
+
+    try:
+        if is_csv(args.path):
+            items_added, mappings_added = stream_items(db.connection, args.path, None, args.source,
+                                                       args.chunk_size, checkpoint)
+            print(f"\nImport Summary:\n- {args.source} items imported: {items_added}\n- Item-vendor mappings: {mappings_added}")
+        else:
+            summary = stream_workbook(db.connection, args.path, args.chunk_size, checkpoint)
+            print("\nImport Summary:")
+            print(f"- Vendors imported: {summary['vendors']}")
+            for source_sheet in ITEM_SHEETS.values():
+                items_added, mappings_added = summary[source_sheet]
+                print(f"- {source_sheet} items imported: {items_added} ({mappings_added} item-vendor mappings)")
+        # Finished - the next run starts from the top again
+        checkpoint.clear()
+    except Exception as e:
+        print(f"An error occurred during import: {e}")
+        print("Run the same command again to resume from the last committed chunk.")
+    finally:
+        db.close_connection()
+
+
+if __name__ == "__main__":
+    main()
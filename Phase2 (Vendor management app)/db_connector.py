@@ -1,9 +1,18 @@
 import os
 import pyodbc
 import pandas as pd
+from collections import namedtuple
+from functools import lru_cache
 from dotenv import load_dotenv
 import streamlit as st
 
+
+@lru_cache(maxsize=256)
+def _row_type(columns):
+    """Named-tuple row class for a column list (built once per distinct result shape)"""
+    return namedtuple('Row', columns, rename=True)
+
+
 class DatabaseConnector:
     """Database connection and operations class"""
     
@@ -122,16 +131,80 @@ class DatabaseConnector:
                 self.cursor.execute(query)
             
             columns = [column[0] for column in self.cursor.description]
-            results = []
-            
-            for row in self.cursor.fetchall():
-                results.append(dict(zip(columns, row)))
-            
-            return results
+            return [dict(zip(columns, row)) for row in self.cursor.fetchall()]
+        except Exception as e:
+            print(f"Error fetching data: {str(e)}")
+            return None
+    
+    def _execute_select(self, query, params=None, cursor=None):
+        """Run a SELECT and return its column names (cursor left positioned on the results)"""
+        cursor = cursor or self.cursor
+        if params:
+            cursor.execute(query, params)
+        else:
+            cursor.execute(query)
+        return tuple(column[0] for column in cursor.description)
+    
+    def fetch_rows(self, query, params=None):
+        """Execute a query and fetch all results as named-tuple rows (no dict per row)"""
+        try:
+            columns = self._execute_select(query, params)
+            return list(map(_row_type(columns)._make, self.cursor.fetchall()))
         except Exception as e:
             print(f"Error fetching data: {str(e)}")
             return None
     
+    def iter_rows(self, query, params=None, batch_size=1000):
+        """
+        Stream named-tuple rows using fetchmany batches, on a cursor of their own (closed when
+        the generator finishes or is closed). Without MARS the connection stays busy until
+        then - finish or close() the generator before running other queries.
+        """
+        cursor = self.conn.cursor()
+        try:
+            columns = self._execute_select(query, params, cursor)
+            make_row = _row_type(columns)._make
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                yield from map(make_row, batch)
+        finally:
+            cursor.close()
+    
+    def fetch_dataframe(self, query, params=None):
+        """Execute a query and build a DataFrame directly from fetchall (skips the list-of-dicts step)"""
+        try:
+            columns = self._execute_select(query, params)
+            return pd.DataFrame.from_records([tuple(row) for row in self.cursor.fetchall()], columns=columns)
+        except Exception as e:
+            print(f"Error fetching data: {str(e)}")
+            return None
+    
+    def _touch_reference_data(self, *table_names):
+        """
+        Bump ReferenceDataVersions for changed tables so the Phase 3 app reloads its cached
+        copy of Items / Vendors / ItemVendorMap. Best effort: skipped if the table doesn't exist.
+        """
+        try:
+            for table_name in table_names:
+                self.cursor.execute(
+                    "UPDATE ReferenceDataVersions SET version = version + 1, updated_at = GETDATE() WHERE table_name = ?",
+                    [table_name]
+                )
+                if self.cursor.rowcount == 0:
+                    self.cursor.execute(
+                        "INSERT INTO ReferenceDataVersions (table_name, version, updated_at) VALUES (?, 1, GETDATE())",
+                        [table_name]
+                    )
+            self.conn.commit()
+        except Exception as e:
+            print(f"Could not update reference data versions: {str(e)}")
+            try:
+                self.conn.rollback()
+            except Exception:
+                pass
+    
     # Vendor operations
     def get_all_vendors(self):
         """Get all vendors from the database"""
@@ -169,6 +242,8 @@ class DatabaseConnector:
             VALUES (?, ?, ?, ?)
         """
         success = self.execute_query(query, [vendor_name, contact_name, vendor_email, vendor_phone])
+        if success:
+            self._touch_reference_data('Vendors')
         return success, "Vendor added successfully" if success else "Failed to add vendor"
     
     def update_vendor(self, vendor_id, vendor_name, contact_name=None, vendor_email=None, vendor_phone=None):
@@ -192,6 +267,8 @@ class DatabaseConnector:
             WHERE vendor_id = ?
         """
         success = self.execute_query(query, [vendor_name, contact_name, vendor_email, vendor_phone, vendor_id])
+        if success:
+            self._touch_reference_data('Vendors')
         return success, "Vendor updated successfully" if success else "Failed to update vendor"
     
     def delete_vendor(self, vendor_id):
@@ -208,13 +285,20 @@ class DatabaseConnector:
         mapping_count = mappings[0]['count'] if mappings else 0
         
         # Delete mappings first
+        changed_tables = []
         if mapping_count > 0:
             delete_mappings_query = "DELETE FROM ItemVendorMap WHERE vendor_id = ?"
-            self.execute_query(delete_mappings_query, [vendor_id])
+            if self.execute_query(delete_mappings_query, [vendor_id]):
+                changed_tables.append('ItemVendorMap')
         
         # Delete vendor
         query = "DELETE FROM Vendors WHERE vendor_id = ?"
         success = self.execute_query(query, [vendor_id])
+        if success:
+            changed_tables.append('Vendors')
+        # Only bump the tables that actually changed (each delete commits on its own)
+        if changed_tables:
+            self._touch_reference_data(*changed_tables)
         
         message = f"Vendor and {mapping_count} mappings deleted successfully" if success else "Failed to delete vendor"
         return success, message
@@ -290,23 +374,31 @@ class DatabaseConnector:
         if existing:
             return False, "Item with these attributes already exists"
         
-        # Insert new item
+        # Insert new item and read its item_id in the same batch (SCOPE_IDENTITY is not
+        # affected by later inserts such as the ReferenceDataVersions bump below)
         query = """
+            SET NOCOUNT ON;
             INSERT INTO Items (item_name, item_type, source_sheet, sku, barcode, 
                              height, width, thickness)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?);
+            SELECT CAST(SCOPE_IDENTITY() AS INT) AS item_id;
         """
-        success = self.execute_query(query, [item_name, item_type, source_sheet, 
-                                           sku, barcode, height, width, thickness])
-        
-        # Get the new item_id
-        if success:
-            new_item_query = "SELECT @@IDENTITY AS item_id"
-            new_item = self.fetch_data(new_item_query)
-            item_id = new_item[0]['item_id'] if new_item else None
-            return success, item_id
-        else:
+        try:
+            self.cursor.execute(query, [item_name, item_type, source_sheet, 
+                                        sku, barcode, height, width, thickness])
+            new_item = self.cursor.fetchone()
+            item_id = new_item[0] if new_item else None
+            self.conn.commit()
+        except Exception as e:
+            print(f"Error executing query: {str(e)}")
+            try:
+                self.conn.rollback()
+            except Exception:
+                pass
             return False, "Failed to add item"
+        
+        self._touch_reference_data('Items')
+        return True, item_id
     
     def update_item(self, item_id, item_name, item_type, source_sheet, sku=None, barcode=None, 
                    height=None, width=None, thickness=None, cost=None):
@@ -326,6 +418,8 @@ class DatabaseConnector:
         """
         success = self.execute_query(query, [item_name, item_type, source_sheet, sku, barcode,
                                            height, width, thickness, item_id])
+        if success:
+            self._touch_reference_data('Items')
         return success, "Item updated successfully" if success else "Failed to update item"
     
     def delete_item(self, item_id):
@@ -342,13 +436,20 @@ class DatabaseConnector:
         mapping_count = mappings[0]['count'] if mappings else 0
         
         # Delete mappings first
+        changed_tables = []
         if mapping_count > 0:
             delete_mappings_query = "DELETE FROM ItemVendorMap WHERE item_id = ?"
-            self.execute_query(delete_mappings_query, [item_id])
+            if self.execute_query(delete_mappings_query, [item_id]):
+                changed_tables.append('ItemVendorMap')
         
         # Delete item
         query = "DELETE FROM Items WHERE item_id = ?"
         success = self.execute_query(query, [item_id])
+        if success:
+            changed_tables.append('Items')
+        # Only bump the tables that actually changed (each delete commits on its own)
+        if changed_tables:
+            self._touch_reference_data(*changed_tables)
         
         message = f"Item and {mapping_count} mappings deleted successfully" if success else "Failed to delete item"
         return success, message
@@ -388,6 +489,8 @@ class DatabaseConnector:
         # Insert new mapping
         query = "INSERT INTO ItemVendorMap (item_id, vendor_id, cost) VALUES (?, ?, ?)"
         success = self.execute_query(query, [item_id, vendor_id, cost])
+        if success:
+            self._touch_reference_data('ItemVendorMap')
         return success, "Mapping added successfully" if success else "Failed to add mapping"
     
     def update_mapping(self, map_id, cost):
@@ -401,6 +504,8 @@ class DatabaseConnector:
         # Update mapping
         query = "UPDATE ItemVendorMap SET cost = ? WHERE map_id = ?"
         success = self.execute_query(query, [cost, map_id])
+        if success:
+            self._touch_reference_data('ItemVendorMap')
         return success, "Mapping updated successfully" if success else "Failed to update mapping"
     
     def delete_mapping(self, map_id):
@@ -414,6 +519,8 @@ class DatabaseConnector:
         # Delete mapping
         query = "DELETE FROM ItemVendorMap WHERE map_id = ?"
         success = self.execute_query(query, [map_id])
+        if success:
+            self._touch_reference_data('ItemVendorMap')
         return success, "Mapping deleted successfully" if success else "Failed to delete mapping"
     
     # Data validation operations
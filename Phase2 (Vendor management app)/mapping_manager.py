@@ -81,18 +81,16 @@ class MappingManager:
             query = " ".join(query_parts)
             
             # Execute query
-            mappings = self.db.fetch_data(query, params)
+            df = self.db.fetch_dataframe(query, params)
             
-            if mappings:
-                # Convert to DataFrame for better display
-                df = pd.DataFrame(mappings)
+            if df is not None and not df.empty:
                 
                 # Format cost column
                 if 'cost' in df.columns:
                     df['cost'] = df['cost'].apply(lambda x: format_currency(x))
                 
                 st.dataframe(df, use_container_width=True)
-                st.success(f"Found {len(mappings)} item-vendor mappings")
+                st.success(f"Found {len(df)} item-vendor mappings")
                 
                 # Show mapping statistics
                 st.subheader("Mapping Statistics")
@@ -7,6 +7,8 @@ from datetime import datetime, date
 from dotenv import load_dotenv
 from db_connector import DatabaseConnector
 from bundling_engine import SmartBundlingEngine
+from notification_outbox import enqueue_user_notifications
+from notification_outbox import deliver as deliver_notifications
 # Page configuration
 st.set_page_config(
     page_title="Requirements Management System",
@@ -231,34 +233,25 @@ def display_boxhero_tab(db):
         st.session_state.bh_selected_item = None
     
     try:
-        # Get all BoxHero items with lightweight session cache (TTL ~60s)
-        now_ts = time.time()
-        cache_key = 'bh_items_cache'
-        cache_ttl = 60
-        if cache_key not in st.session_state or (now_ts - st.session_state[cache_key]['ts'] > cache_ttl):
-            all_items = db.get_all_items(source_filter="BoxHero")
-            st.session_state[cache_key] = {'data': all_items or [], 'ts': now_ts}
-        else:
-            all_items = st.session_state[cache_key]['data']
+        # BoxHero items indexed by type/name (built once per reference cache load, shared by every session)
+        # Use all items - duplicate check happens in add_to_cart()
+        item_index = db.get_item_selection_index("BoxHero")
         
-        if not all_items:
+        if not item_index.types:
             st.info("No BoxHero items available at the moment.")
             return
         
-        # Use all items - duplicate check happens in add_to_cart()
-        available_items = all_items
-        
         # Step 1: Select Item Type
         if st.session_state.bh_step >= 1:
             st.subheader("Step 1: What type of item do you need?")
             
-            # Get unique item types from available items only
-            item_types = sorted(list(set(item.get('item_type', '') for item in available_items if item.get('item_type'))))
+            item_types = item_index.types
+            type_position = item_index.type_position(st.session_state.bh_selected_type)
             
             selected_type = st.selectbox(
                 "Choose item type:",
                 [""] + item_types,
-                index=0 if not st.session_state.bh_selected_type else item_types.index(st.session_state.bh_selected_type) + 1,
+                index=0 if type_position is None else type_position + 1,
                 key="bh_type_select"
             )
             
@@ -272,11 +265,8 @@ def display_boxhero_tab(db):
             st.subheader("Step 2: Which specific item?")
             st.caption(f"Selected type: **{st.session_state.bh_selected_type}**")
             
-            # Filter available items by selected type
-            type_items = [item for item in available_items if item.get('item_type') == st.session_state.bh_selected_type]
-            
-            # Get unique item names for this type
-            item_names = sorted(list(set(item.get('item_name', '') for item in type_items if item.get('item_name'))))
+            # Item names for this type
+            item_names = item_index.names(st.session_state.bh_selected_type)
             
             selected_name = st.selectbox(
                 "Choose item:",
@@ -286,7 +276,7 @@ def display_boxhero_tab(db):
             
             if selected_name:
                 # Find the item with this name (BoxHero items should be unique by name within type)
-                selected_item = next((item for item in type_items if item.get('item_name') == selected_name), None)
+                selected_item = item_index.first(st.session_state.bh_selected_type, selected_name)
                 
                 if selected_item:
                     st.session_state.bh_selected_item = selected_item
@@ -403,34 +393,25 @@ def display_raw_materials_tab(db):
         st.session_state.rm_selected_item = None
     
     try:
-        # Get all raw materials with lightweight session cache (TTL ~60s)
-        now_ts = time.time()
-        cache_key = 'rm_items_cache'
-        cache_ttl = 60
-        if cache_key not in st.session_state or (now_ts - st.session_state[cache_key]['ts'] > cache_ttl):
-            all_items = db.get_all_items(source_filter="Raw Materials")
-            st.session_state[cache_key] = {'data': all_items or [], 'ts': now_ts}
-        else:
-            all_items = st.session_state[cache_key]['data']
+        # Raw Materials indexed by type/name/dimensions (built once per reference cache load, shared by every session)
+        # Use all items - duplicate check happens in add_to_cart()
+        item_index = db.get_item_selection_index("Raw Materials")
         
-        if not all_items:
+        if not item_index.types:
             st.info("No raw materials available at the moment.")
             return
         
-        # Use all items - duplicate check happens in add_to_cart()
-        available_items = all_items
-        
         # Step 1: Select Item Type
         if st.session_state.rm_step >= 1:
             st.subheader("Step 1: What type of material do you need?")
             
-            # Get unique item types from available items only
-            item_types = sorted(list(set(item.get('item_type', '') for item in available_items if item.get('item_type'))))
+            item_types = item_index.types
+            type_position = item_index.type_position(st.session_state.rm_selected_type)
             
             selected_type = st.selectbox(
                 "Choose material type:",
                 [""] + item_types,
-                index=0 if not st.session_state.rm_selected_type else item_types.index(st.session_state.rm_selected_type) + 1,
+                index=0 if type_position is None else type_position + 1,
                 key="rm_type_select"
             )
             
@@ -445,16 +426,14 @@ def display_raw_materials_tab(db):
             st.subheader("Step 2: Which specific material?")
             st.caption(f"Selected type: **{st.session_state.rm_selected_type}**")
             
-            # Filter available items by selected type
-            type_items = [item for item in available_items if item.get('item_type') == st.session_state.rm_selected_type]
-            
-            # Get unique item names for this type
-            item_names = sorted(list(set(item.get('item_name', '') for item in type_items if item.get('item_name'))))
+            # Material names for this type
+            item_names = item_index.names(st.session_state.rm_selected_type)
+            name_position = item_index.name_position(st.session_state.rm_selected_type, st.session_state.rm_selected_name)
             
             selected_name = st.selectbox(
                 "Choose material:",
                 [""] + item_names,
-                index=0 if not st.session_state.rm_selected_name else item_names.index(st.session_state.rm_selected_name) + 1,
+                index=0 if name_position is None else name_position + 1,
                 key="rm_name_select"
             )
             
@@ -468,10 +447,8 @@ def display_raw_materials_tab(db):
             st.subheader("Step 3: Select dimensions")
             st.caption(f"Selected material: **{st.session_state.rm_selected_name}**")
             
-            # Filter available items by selected type and name
-            name_items = [item for item in available_items if 
-                         item.get('item_type') == st.session_state.rm_selected_type and 
-                         item.get('item_name') == st.session_state.rm_selected_name]
+            # Dimension variants for the selected type and name
+            name_items = item_index.variants(st.session_state.rm_selected_type, st.session_state.rm_selected_name)
             
             if len(name_items) == 1:
                 # Only one variant - auto-select it
@@ -1767,57 +1744,65 @@ def display_active_bundles_for_operator(db):
     st.write("Track your approved orders and their status")
     
     try:
-        # Batch fetch: bundles with vendor info in a single query
-        all_bundles = get_bundles_with_vendor_info(db)
+        # Per-status counts in one grouped query (bundles themselves are loaded a page at a time)
+        status_counts, rejected_total = get_bundle_status_counts(db)
+        total_bundles = sum(status_counts.values())
         
-        if not all_bundles:
+        if not total_bundles:
             st.info("No active bundles yet. Generate recommendations first!")
             return
         
-        # Count bundles by status
-        status_counts = {
-            'Active': sum(1 for b in all_bundles if b['status'] == 'Active'),
-            'Reviewed': sum(1 for b in all_bundles if b['status'] == 'Reviewed'),
-            'Approved': sum(1 for b in all_bundles if b['status'] == 'Approved'),
-            'Ordered': sum(1 for b in all_bundles if b['status'] == 'Ordered'),
-            'Completed': sum(1 for b in all_bundles if b['status'] == 'Completed')
-        }
-        
         # Status filter
         col_filter, col_total = st.columns([3, 1])
         with col_filter:
             status_options = [
-                f"🟡 Active ({status_counts['Active']})",
-                f"🟢 Reviewed ({status_counts['Reviewed']})",
-                f"🔵 Approved ({status_counts['Approved']})",
-                f"📦 Ordered ({status_counts['Ordered']})",
-                f"🎉 Completed ({status_counts['Completed']})",
-                f"📋 All Bundles ({len(all_bundles)})"
+                f"🟡 Active ({status_counts.get('Active', 0)})",
+                f"🟢 Reviewed ({status_counts.get('Reviewed', 0)})",
+                f"🔵 Approved ({status_counts.get('Approved', 0)})",
+                f"📦 Ordered ({status_counts.get('Ordered', 0)})",
+                f"🎉 Completed ({status_counts.get('Completed', 0)})",
+                f"📋 All Bundles ({total_bundles})"
             ]
             selected_filter = st.selectbox("Filter by Status:", status_options, index=5)
         
         with col_total:
-            st.metric("Total", len(all_bundles))
+            st.metric("Total", total_bundles)
         
-        # Filter bundles based on selection
+        # Statuses for the selected filter (None = all bundles)
         if "Active" in selected_filter and "All" not in selected_filter:
-            bundles = [b for b in all_bundles if b['status'] == 'Active']
-            st.info(f"Showing {len(bundles)} Active bundles (Need Review)")
+            filter_statuses = ['Active']
+            st.info(f"Showing {status_counts.get('Active', 0)} Active bundles (Need Review)")
         elif "Reviewed" in selected_filter and "All" not in selected_filter:
-            bundles = [b for b in all_bundles if b['status'] == 'Reviewed']
-            st.success(f"Showing {len(bundles)} Reviewed bundles (Ready to Approve)")
+            filter_statuses = ['Reviewed']
+            st.success(f"Showing {status_counts.get('Reviewed', 0)} Reviewed bundles (Ready to Approve)")
         elif "Approved" in selected_filter:
-            bundles = [b for b in all_bundles if b['status'] == 'Approved']
-            st.info(f"Showing {len(bundles)} Approved bundles (Ready to Order)")
+            filter_statuses = ['Approved']
+            st.info(f"Showing {status_counts.get('Approved', 0)} Approved bundles (Ready to Order)")
         elif "Ordered" in selected_filter:
-            bundles = [b for b in all_bundles if b['status'] == 'Ordered']
-            st.info(f"Showing {len(bundles)} Ordered bundles (Waiting Delivery)")
+            filter_statuses = ['Ordered']
+            st.info(f"Showing {status_counts.get('Ordered', 0)} Ordered bundles (Waiting Delivery)")
         elif "Completed" in selected_filter:
-            bundles = [b for b in all_bundles if b['status'] == 'Completed']
-            st.success(f"Showing {len(bundles)} Completed bundles")
+            filter_statuses = ['Completed']
+            st.success(f"Showing {status_counts.get('Completed', 0)} Completed bundles")
         else:
-            bundles = all_bundles
-            st.write(f"**📊 Showing all {len(bundles)} bundles**")
+            filter_statuses = None
+            st.write(f"**📊 Showing all {total_bundles} bundles**")
+        
+        # Active bundles rejected by the Operation Team are their own group above page 1
+        show_rejected = filter_statuses is None or 'Active' in filter_statuses
+        if rejected_total and show_rejected:
+            st.warning(f"⚠️ {rejected_total} Active bundle(s) were rejected by the Operation Team and need revision")
+        
+        # Keyset pagination: one cursor per page already visited, reset when the filter changes
+        if st.session_state.get('bundle_page_filter') != selected_filter:
+            st.session_state.bundle_page_filter = selected_filter
+            st.session_state.bundle_page_cursors = [None]
+        page_cursors = st.session_state.bundle_page_cursors
+        bundles, next_cursor = get_bundles_with_vendor_info(db, filter_statuses, page_cursors[-1],
+                                                            rejected=False if show_rejected else None)
+        if show_rejected and len(page_cursors) == 1:
+            rejected_bundles, _ = get_bundles_with_vendor_info(db, ['Active'], rejected=True, limit=None)
+            bundles = rejected_bundles + bundles
         
         if not bundles:
             st.info("No bundles in this status")
@@ -1826,11 +1811,11 @@ def display_active_bundles_for_operator(db):
         st.markdown("---")
         
         # Review Progress Indicator (for Active/Reviewed bundles only)
-        active_or_reviewed_bundles = [b for b in bundles if b['status'] in ('Active', 'Reviewed')]
-        if active_or_reviewed_bundles:
-            reviewed_count = len([b for b in active_or_reviewed_bundles if b['status'] == 'Reviewed'])
-            active_count = len([b for b in active_or_reviewed_bundles if b['status'] == 'Active'])
-            total_count = len(active_or_reviewed_bundles)
+        shown_statuses = filter_statuses or ['Active', 'Reviewed']
+        active_count = status_counts.get('Active', 0) if 'Active' in shown_statuses else 0
+        reviewed_count = status_counts.get('Reviewed', 0) if 'Reviewed' in shown_statuses else 0
+        if active_count or reviewed_count:
+            total_count = active_count + reviewed_count
             
             # Simple progress indicator
             if active_count > 0:
@@ -1838,10 +1823,11 @@ def display_active_bundles_for_operator(db):
             
             st.markdown("---")
 
-        # Prepare IDs for batched item and user lookups
-        bundle_ids = [b.get('bundle_id') for b in bundles if b.get('bundle_id') is not None]
+        # Details are loaded only for bundles the operator has opened on this page
+        open_bundles = [b for b in bundles if st.session_state.get(f"bundle_open_{b['bundle_id']}")]
+        bundle_ids = [b.get('bundle_id') for b in open_bundles if b.get('bundle_id') is not None]
 
-        # Batch fetch: all items for these bundles in one query
+        # Batch fetch: all items for the open bundles in one query
         items_by_bundle = {}
         if bundle_ids:
             items_list = get_bundle_items_for_bundles(db, bundle_ids)
@@ -1863,13 +1849,17 @@ def display_active_bundles_for_operator(db):
         # Batch fetch: user names for all referenced user IDs
         user_name_map = get_user_names_map(db, sorted(user_ids_set)) if user_ids_set else {}
         
+        # One query each for item/project breakdowns, request numbers and duplicate checks of the open bundles
+        project_breakdowns = db.get_bundle_project_breakdowns(bundle_ids) if bundle_ids else {}
+        bundle_req_numbers = get_bundle_request_numbers_map(db, bundle_ids)
+        duplicates_by_bundle = db.detect_duplicate_projects_in_bundles(open_bundles) if open_bundles else {}
+        
         # Initialize session state for selections (MUST be before any usage)
         if 'selected_bundles' not in st.session_state:
             st.session_state.selected_bundles = []
         
         # Bulk Approval Actions (ONLY for Reviewed bundles - NO bulk review)
-        reviewed_bundles = [b for b in bundles if b['status'] == 'Reviewed']
-        if reviewed_bundles and active_count == 0:
+        if reviewed_count and active_count == 0:
             # Only show bulk approval when ALL bundles are reviewed - CLEAN UI
             st.success("✅ **All bundles reviewed!** Select bundles below to approve.")
             
@@ -1878,7 +1868,8 @@ def display_active_bundles_for_operator(db):
             with col_select:
                 select_all = st.checkbox("Select All", key="select_all_bundles")
                 if select_all:
-                    st.session_state.selected_bundles = [b['bundle_id'] for b in reviewed_bundles]
+                    # Every Reviewed bundle, including those on other pages
+                    st.session_state.selected_bundles = get_bundle_ids_by_status(db, 'Reviewed')
                 else:
                     if st.session_state.get('deselect_triggered'):
                         st.session_state.selected_bundles = []
@@ -1897,18 +1888,12 @@ def display_active_bundles_for_operator(db):
             
             st.markdown("---")
         
-        # Sort bundles: rejected ones first, then by created date
-        bundles_sorted = sorted(bundles, key=lambda b: (
-            0 if (b['status'] == 'Active' and b.get('rejection_reason')) else 1,
-            b.get('created_at') or ''
-        ), reverse=False)
-        
-        # Track if we need separator after rejected bundles
+        # Track if we need separator after rejected bundles (listed first on page 1)
         rejected_count = sum(1 for b in bundles if b['status'] == 'Active' and b.get('rejection_reason'))
         rejected_shown = 0
         
         # Display bundles in operator-friendly format
-        for bundle in bundles_sorted:
+        for bundle in bundles:
             # Build expander title with merge badge
             merge_badge = ""
             merge_count_val = bundle.get('merge_count') or 0  # Handle NULL from database
@@ -1921,6 +1906,7 @@ def display_active_bundles_for_operator(db):
                 rejection_badge = " ⚠️ REJECTED"
             
             expander_title = f"📦 {bundle['bundle_name']}{merge_badge}{rejection_badge} - {get_status_badge(bundle['status'])}"
+            open_key = f"bundle_open_{bundle['bundle_id']}"
             
             # Add checkbox ONLY for Reviewed bundles (for approval)
             if bundle['status'] == 'Reviewed':
@@ -1935,9 +1921,9 @@ def display_active_bundles_for_operator(db):
                             st.session_state.selected_bundles.remove(bundle['bundle_id'])
                 
                 with col_exp:
-                    expander_obj = st.expander(expander_title, expanded=False)
+                    is_open = st.toggle(expander_title, key=open_key)
             else:
-                expander_obj = st.expander(expander_title, expanded=False)
+                is_open = st.toggle(expander_title, key=open_key)
             
             # Add separator after rejected bundles
             if bundle['status'] == 'Active' and bundle.get('rejection_reason'):
@@ -1950,6 +1936,11 @@ def display_active_bundles_for_operator(db):
                     st.markdown("")
                     rejected_shown += 1  # Prevent showing separator again
             
+            # Collapsed bundles render only their header - nothing below is queried or built for them
+            if not is_open:
+                continue
+            
+            expander_obj = st.container(border=True)
             with expander_obj:
                 # Show merge indicators if bundle was updated
                 merge_count = bundle.get('merge_count') or 0  # Handle NULL from database
@@ -2164,7 +2155,7 @@ def display_active_bundles_for_operator(db):
                         
                         if breakdown:
                             # Get project breakdown for this item
-                            project_breakdown = db.get_bundle_item_project_breakdown(bundle.get('bundle_id'), it['item_id'])
+                            project_breakdown = project_breakdowns.get((bundle.get('bundle_id'), it['item_id']), [])
                             project_map = {}
                             date_map = {}
                             for pb in project_breakdown or []:
@@ -2273,7 +2264,7 @@ def display_active_bundles_for_operator(db):
 
                 # Duplicate Project Detection and Review
                 st.markdown("---")
-                duplicates = db.detect_duplicate_projects_in_bundle(bundle.get('bundle_id'))
+                duplicates = duplicates_by_bundle.get(bundle.get('bundle_id'), [])
                 duplicates_reviewed = bundle.get('duplicates_reviewed', 0)
                 
                 if duplicates and not duplicates_reviewed:
@@ -2400,7 +2391,6 @@ def display_active_bundles_for_operator(db):
 
                 st.markdown("---")
                 # Show related requests (traceability) using batched map
-                bundle_req_numbers = get_bundle_request_numbers_map(db, bundle_ids)
                 req_list = bundle_req_numbers.get(bundle.get('bundle_id'), [])
                 if req_list:
                     st.write("**From Requests:** " + ", ".join(req_list))
@@ -2472,6 +2462,21 @@ def display_active_bundles_for_operator(db):
                 if st.session_state.get(f'completing_bundle_{bundle["bundle_id"]}'):
                     st.markdown("---")
                     display_completion_form(db, bundle)
+        
+        # Page navigation
+        if len(page_cursors) > 1 or next_cursor:
+            st.markdown("---")
+            col_prev, col_page, col_next = st.columns([1, 2, 1])
+            with col_prev:
+                if len(page_cursors) > 1 and st.button("◀ Previous", key="bundle_page_prev"):
+                    page_cursors.pop()
+                    st.rerun()
+            with col_page:
+                st.caption(f"Page {len(page_cursors)} • {BUNDLE_PAGE_SIZE} bundles per page")
+            with col_next:
+                if next_cursor and st.button("Next ▶", key="bundle_page_next"):
+                    page_cursors.append(next_cursor)
+                    st.rerun()
     
     except Exception as e:
         st.error(f"Error loading active bundles: {str(e)}")
@@ -3628,11 +3633,55 @@ def fmt_dim(val):
         s = s.rstrip('0').rstrip('.')
     return s
 
-def get_bundles_with_vendor_info(db):
-    """Fetch bundles joined with vendor details in one query (performance optimization)."""
+BUNDLE_PAGE_SIZE = 25
+
+def get_bundle_status_counts(db):
+    """({status: count}, rejected) in one grouped query - rejected = Active bundles sent back by Operation Team."""
     try:
         query = """
         SELECT 
+            status,
+            COUNT(*) AS bundle_count,
+            SUM(CASE WHEN ISNULL(rejection_reason, '') <> '' THEN 1 ELSE 0 END) AS rejected_count
+        FROM requirements_bundles
+        GROUP BY status
+        """
+        counts = {}
+        rejected = 0
+        for row in db.execute_query_rows(query) or []:
+            counts[row.status] = row.bundle_count
+            if row.status == 'Active':
+                rejected = row.rejected_count or 0
+        return counts, rejected
+    except Exception as e:
+        print(f"Error in get_bundle_status_counts: {str(e)}")
+        return {}, 0
+
+def get_bundles_with_vendor_info(db, statuses=None, after=None, limit=BUNDLE_PAGE_SIZE, rejected=None):
+    """
+    Fetch one page of bundles joined with vendor details (keyset pagination, newest first).
+    A status filter seeks IX_requirements_bundles_status (status, bundle_id DESC); all
+    bundles page down the primary key.
+    after: bundle_id of the last bundle on the previous page.
+    limit: page size (None = every matching bundle).
+    rejected: True = only Active bundles rejected by Operation Team, False = all but those.
+    Returns (bundles, next_after) - next_after is None on the last page.
+    """
+    try:
+        where = []
+        params = []
+        if statuses:
+            where.append(f"b.status IN ({','.join('?' for _ in statuses)})")
+            params.extend(statuses)
+        if rejected is True:
+            where.append("b.status = 'Active' AND ISNULL(b.rejection_reason, '') <> ''")
+        elif rejected is False:
+            where.append("(b.status <> 'Active' OR ISNULL(b.rejection_reason, '') = '')")
+        if after:
+            where.append("b.bundle_id < ?")
+            params.append(after)
+        query = f"""
+        SELECT {f"TOP {int(limit) + 1}" if limit else ""}
             b.bundle_id,
             b.bundle_name,
             b.status,
@@ -3658,11 +3707,25 @@ def get_bundles_with_vendor_info(db):
             b.rejected_at
         FROM requirements_bundles b
         LEFT JOIN Vendors v ON b.recommended_vendor_id = v.vendor_id
+        {"WHERE " + " AND ".join(where) if where else ""}
         ORDER BY b.bundle_id DESC
         """
-        return db.execute_query(query)
+        bundles = db.execute_query(query, tuple(params))
+        if limit and len(bundles) > limit:
+            bundles = bundles[:limit]
+            return bundles, bundles[-1]['bundle_id']
+        return bundles, None
     except Exception as e:
         print(f"Error in get_bundles_with_vendor_info: {str(e)}")
+        return [], None
+
+def get_bundle_ids_by_status(db, status):
+    """All bundle IDs in one status (e.g. for 'Select All' across pages)."""
+    try:
+        rows = db.execute_query_rows("SELECT bundle_id FROM requirements_bundles WHERE status = ? ORDER BY bundle_id", (status,)) or []
+        return [row.bundle_id for row in rows]
+    except Exception as e:
+        print(f"Error in get_bundle_ids_by_status: {str(e)}")
         return []
 
 def get_bundle_items_for_bundles(db, bundle_ids):
@@ -3702,8 +3765,8 @@ def get_user_names_map(db, user_ids):
         FROM requirements_users
         WHERE user_id IN ({placeholders})
         """
-        rows = db.execute_query(query, tuple(user_ids)) or []
-        return {row['user_id']: row['name'] for row in rows}
+        rows = db.execute_query_rows(query, tuple(user_ids)) or []
+        return {row.user_id: row.name for row in rows}
     except Exception as e:
         print(f"Error in get_user_names_map: {str(e)}")
         return {}
@@ -3721,10 +3784,10 @@ def get_bundle_request_numbers_map(db, bundle_ids):
         WHERE m.bundle_id IN ({placeholders})
         ORDER BY o.req_number
         """
-        rows = db.execute_query(query, tuple(bundle_ids)) or []
+        rows = db.execute_query_rows(query, tuple(bundle_ids)) or []
         out = {}
         for r in rows:
-            out.setdefault(r['bundle_id'], []).append(r['req_number'])
+            out.setdefault(r.bundle_id, []).append(r.req_number)
         return out
     except Exception as e:
         print(f"Error in get_bundle_request_numbers_map: {str(e)}")
@@ -3741,33 +3804,8 @@ def mark_bundle_completed(db, bundle_id):
         """
         db.execute_insert(bundle_query, (bundle_id,))
         
-        # Get all request IDs in this bundle
-        mapping_query = """
-        SELECT req_id FROM requirements_bundle_mapping 
-        WHERE bundle_id = ?
-        """
-        mappings = db.execute_query(mapping_query, (bundle_id,))
-        
-        if mappings:
-            req_ids = [mapping['req_id'] for mapping in mappings]
-            
-            # Check each request to see if ALL its bundles are completed
-            for req_id in req_ids:
-                # Get all bundles for this request
-                all_bundles = db.get_bundles_for_request(req_id)
-                
-                # Check if any bundles are still incomplete
-                incomplete_bundles = [b for b in all_bundles if b['status'] != 'Completed']
-                
-                if len(incomplete_bundles) == 0:
-                    # All bundles completed - mark request as completed
-                    update_request_query = """
-                    UPDATE requirements_orders 
-                    SET status = 'Completed'
-                    WHERE req_id = ?
-                    """
-                    db.execute_insert(update_request_query, (req_id,))
-                # else: Request still has pending bundles - keep status as 'In Progress'
+        # Requests whose bundles are now ALL completed -> Completed (one set-based UPDATE)
+        db.complete_requests_for_bundle(bundle_id)
         
         db.conn.commit()
         return True
@@ -3797,54 +3835,15 @@ def mark_bundle_completed_with_packing_slip(db, bundle_id, packing_slip_code, ac
         
         db.execute_insert(bundle_query, (packing_slip_code, actual_delivery_date, completed_at, completed_by, bundle_id))
         
-        # Get all request IDs in this bundle
-        mapping_query = """
-        SELECT req_id FROM requirements_bundle_mapping 
-        WHERE bundle_id = ?
-        """
-        mappings = db.execute_query(mapping_query, (bundle_id,))
+        # Requests whose bundles are now ALL completed -> Completed (one set-based UPDATE);
+        # requests with other bundles still open stay 'In Progress'
+        completed_req_ids = db.complete_requests_for_bundle(bundle_id)
         
-        if mappings:
-            req_ids = [mapping['req_id'] for mapping in mappings]
-            
-            # Check each request to see if ALL its bundles are completed
-            for req_id in req_ids:
-                # Get all bundles for this request
-                all_bundles = db.get_bundles_for_request(req_id)
-                
-                # Check if any bundles are still incomplete
-                incomplete_bundles = [b for b in all_bundles if b['status'] != 'Completed']
-                
-                if len(incomplete_bundles) == 0:
-                    # All bundles completed - mark request as completed
-                    update_request_query = """
-                    UPDATE requirements_orders 
-                    SET status = 'Completed'
-                    WHERE req_id = ?
-                    """
-                    db.execute_insert(update_request_query, (req_id,))
-                    
-                    # Send email notification to user with ALL bundles data
-                    try:
-                        from user_notifications import send_user_notification
-                        # Get all completed bundles with their details
-                        bundles_data = []
-                        for bundle in all_bundles:
-                            if bundle['status'] == 'Completed':
-                                bundles_data.append({
-                                    'bundle_id': bundle['bundle_id'],
-                                    'vendor_id': bundle['recommended_vendor_id'],
-                                    'packing_slip_code': bundle.get('packing_slip_code'),
-                                    'actual_delivery_date': bundle.get('actual_delivery_date'),
-                                    'po_number': bundle.get('po_number')
-                                })
-                        
-                        send_user_notification(db, req_id, 'completed', {'bundles': bundles_data})
-                    except Exception as email_error:
-                        # Don't fail the whole operation if email fails
-                        print(f"[WARNING] Failed to send email notification: {str(email_error)}")
+        # Queue the 'completed' emails in this transaction - sent after commit
+        notifications = enqueue_user_notifications(db, completed_req_ids, 'completed')
         
         db.conn.commit()
+        deliver_notifications(db, notifications)
         return {'success': True, 'message': 'Bundle completed successfully'}
     except Exception as e:
         print(f"Error in mark_bundle_completed_with_packing_slip: {str(e)}")
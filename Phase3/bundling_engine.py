@@ -1,62 +1,150 @@
 """
 Smart Bundling Engine for Phase 3C
 Automatically groups pending requests by optimal vendor coverage
+
+Output is controlled by a verbosity level (console) and an optional JSON-lines log file:
+- VERBOSITY_QUIET: errors only
+- VERBOSITY_NORMAL: step summaries and one line per bundle (default)
+- VERBOSITY_DEBUG: full per-item / per-vendor analysis, and debug_info is built
 """
 
 import json
 from datetime import datetime
 from collections import defaultdict
-from db_connector import DatabaseConnector
+from db_connector import DatabaseConnector, BUNDLING_LOOKBACK_MINUTES
+from vendor_optimizer import SelectionProblem, VendorOptimizer
+
+VERBOSITY_QUIET = 0
+VERBOSITY_NORMAL = 1
+VERBOSITY_DEBUG = 2
+
+_LEVEL_NAMES = {VERBOSITY_QUIET: 'ERROR', VERBOSITY_NORMAL: 'INFO', VERBOSITY_DEBUG: 'DEBUG'}
 
 class SmartBundlingEngine:
-    def __init__(self):
+    def __init__(self, optimizer=None, vendor_minimums=None, verbosity=VERBOSITY_NORMAL,
+                 log_path=None, log_level=VERBOSITY_NORMAL):
+        """
+        Args:
+            optimizer: Object with solve(SelectionProblem) (default VendorOptimizer - exact for
+                       small instances, greedy for large ones, bounded by a time budget)
+            vendor_minimums: Optional {vendor_id: minimum order value} penalized when not met
+            verbosity: Console output level (VERBOSITY_QUIET / NORMAL / DEBUG)
+            log_path: Optional file to append structured JSON-lines events to
+            log_level: Highest level written to log_path
+        """
         self.db = DatabaseConnector()
+        self.optimizer = optimizer or VendorOptimizer()
+        self.vendor_minimums = vendor_minimums or {}
+        self.verbosity = verbosity
+        self.log_level = log_level if log_path else VERBOSITY_QUIET
+        self._log_file = open(log_path, 'a', encoding='utf-8') if log_path else None
+        
+        # Per-item / per-vendor analysis is only built when someone will read it
+        self.debug_enabled = max(self.verbosity, self.log_level) >= VERBOSITY_DEBUG
+        self.debug_info = {'coverage_strategy': []}
+        
+        # Open Active/Reviewed bundle per vendor, loaded once per run and kept current as bundles are merged/created
+        self.active_bundles = {}
+    
+    def _log(self, level, event, message=None, **fields):
+        """Print `message` if the console verbosity allows it and write a JSON-lines record if logging to file"""
+        if message is not None and level <= self.verbosity:
+            print(message)
+        if self._log_file is not None and level <= self.log_level:
+            record = {
+                'ts': datetime.utcnow().isoformat(timespec='milliseconds') + 'Z',
+                'level': _LEVEL_NAMES.get(level, 'DEBUG'),
+                'event': event
+            }
+            record.update(fields)
+            self._log_file.write(json.dumps(record, default=str) + '\n')
     
-    def run_bundling_process(self):
-        """Main bundling process - called by cron job"""
+    def close_log(self):
+        """Flush and close the JSON-lines log file (no-op when not logging to file)"""
+        if self._log_file is not None:
+            self._log_file.close()
+            self._log_file = None
+    
+    def run_bundling_process(self, incremental=False):
+        """
+        Main bundling process - called by cron job
+        
+        Args:
+            incremental: Only pull Pending lines with req_id above the stored high-water mark, plus
+                         Pending lines created in the last BUNDLING_LOOKBACK_MINUTES (a request
+                         whose transaction committed after a later req_id was bundled). Cheap
+                         enough to run every few minutes. A full run (the default) sweeps every
+                         Pending request.
+        """
         try:
-            print("Starting Smart Bundling Process...")
-            
-            # Step 1: Get all pending requests
-            pending_requests = self.db.get_all_pending_requests()
+            self._log(VERBOSITY_NORMAL, 'run_started', "Starting Smart Bundling Process...", incremental=incremental)
+            
+            # Step 1: Get pending requests (all, or only those above the high-water mark)
+            watermark = self.db.get_bundling_watermark()
+            if incremental:
+                pending_requests = self.db.get_pending_requests_since(watermark['last_req_id'])
+                self._log(VERBOSITY_NORMAL, 'watermark_loaded',
+                          f"Incremental run from req_id > {watermark['last_req_id']} "
+                          f"(plus Pending requests from the last {BUNDLING_LOOKBACK_MINUTES} minutes)",
+                          last_req_id=watermark['last_req_id'], lookback_minutes=BUNDLING_LOOKBACK_MINUTES)
+            else:
+                pending_requests = self.db.get_all_pending_requests()
             
             if not pending_requests:
-                print("No pending requests found. Nothing to bundle.")
+                self._log(VERBOSITY_NORMAL, 'no_pending_requests', "No pending requests found. Nothing to bundle.")
                 return {"success": True, "message": "No pending requests"}
             
-            print(f"Found {len(pending_requests)} pending request items")
+            self._log(VERBOSITY_NORMAL, 'pending_requests_loaded',
+                      f"Found {len(pending_requests)} pending request items",
+                      request_items=len(pending_requests))
             
             # Step 2: Aggregate items and quantities
             aggregated_items = self.aggregate_items(pending_requests)
-            print(f"Aggregated into {len(aggregated_items)} unique items")
+            self._log(VERBOSITY_NORMAL, 'items_aggregated',
+                      f"Aggregated into {len(aggregated_items)} unique items",
+                      unique_items=len(aggregated_items))
             
-            # Debug: Show what items we're trying to bundle
-            for item_id, item_data in aggregated_items.items():
-                print(f"  Item {item_id}: {item_data['item_name']} - {item_data['total_quantity']} pieces")
+            if self.debug_enabled:
+                # Debug: Show what items we're trying to bundle
+                for item_id, item_data in aggregated_items.items():
+                    self._log(VERBOSITY_DEBUG, 'item_aggregated',
+                              f"  Item {item_id}: {item_data['item_name']} - {item_data['total_quantity']} pieces",
+                              item_id=item_id, item_name=item_data['item_name'], quantity=item_data['total_quantity'])
             
             # Step 3: Get vendor information for all items
             vendor_data = self.get_vendor_coverage(aggregated_items)
-            print(f"Found vendor data for {len(vendor_data)} items")
-            
-            # Debug: Show what vendor data we found
-            for item_id, vendors in vendor_data.items():
-                item_name = aggregated_items[item_id]['item_name']
-                print(f"  Item {item_id} ({item_name}): {len(vendors)} vendors")
-                for vendor in vendors:
-                    print(f"    - {vendor['vendor_name']} (ID: {vendor['vendor_id']})")
-            
-            # Step 4: Find optimal vendor combinations with 100% coverage
-            optimization_result = self.optimize_vendor_selection(aggregated_items, vendor_data)
-            print(f"Generated {optimization_result['total_bundles']} bundles with {optimization_result['coverage_percentage']:.1f}% coverage")
+            self._log(VERBOSITY_NORMAL, 'vendor_data_loaded',
+                      f"Found vendor data for {len(vendor_data)} items",
+                      items_with_vendors=len(vendor_data))
+            
+            # Step 4: Find optimal vendor combinations with 100% coverage. Vendors that already
+            # have an open Active/Reviewed bundle cost nothing extra to use - new lines merge into
+            # those bundles instead of opening bundles with other vendors (matters most for small
+            # incremental batches)
+            self.active_bundles = self.db.get_active_bundles_by_vendor()
+            optimization_result = self.optimize_vendor_selection(aggregated_items, vendor_data, set(self.active_bundles))
+            self._log(VERBOSITY_NORMAL, 'optimization_finished',
+                      f"Generated {optimization_result['total_bundles']} bundles with {optimization_result['coverage_percentage']:.1f}% coverage",
+                      bundles=optimization_result['total_bundles'],
+                      coverage_percentage=optimization_result['coverage_percentage'],
+                      **optimization_result['optimizer'])
             
             # Step 5: Update request status to "In Progress"
             request_ids = list(set([req['req_id'] for req in pending_requests]))
             self.db.update_requests_to_in_progress(request_ids)
-            print(f"Updated {len(request_ids)} requests to 'In Progress'")
+            self._log(VERBOSITY_NORMAL, 'requests_in_progress',
+                      f"Updated {len(request_ids)} requests to 'In Progress'",
+                      requests=len(request_ids))
+            
+            # Step 6: Create/merge bundles in database (one per vendor, open bundles loaded in step 4)
+            # item_id -> request ids, built once instead of rescanning every line per bundle
+            requests_by_item = defaultdict(set)
+            for req in pending_requests:
+                requests_by_item[req['item_id']].add(req['req_id'])
             
-            # Step 6: Create/merge bundles in database (one per vendor)
             created_bundles = []
             merged_bundles = []
+            new_bundles = []  # (bundle, request_ids, bundle_number) created together after the merges
             timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
             
             for i, bundle in enumerate(optimization_result['bundles'], 1):
@@ -64,22 +152,20 @@ class SmartBundlingEngine:
                 vendor_name = bundle['vendor_name']
                 
                 # Find which requests contain items in this bundle
-                bundle_item_ids = [item['item_id'] for item in bundle['items_list']]
-                bundle_request_ids = list(set([
-                    req['req_id'] 
-                    for req in pending_requests 
-                    if req['item_id'] in bundle_item_ids
-                ]))
+                bundle_request_ids = list(set().union(*(requests_by_item[item['item_id']] for item in bundle['items_list'])))
                 
                 # Check for existing Active/Reviewed bundle for this vendor
-                existing_bundle = self.db.get_active_bundle_for_vendor(vendor_id)
+                existing_bundle = self.active_bundles.get(vendor_id)
                 
                 if existing_bundle:
                     # MERGE: Add items to existing bundle
-                    print(f"\n[MERGE] Found existing bundle for {vendor_name}")
-                    print(f"        Bundle ID: {existing_bundle['bundle_id']}")
-                    print(f"        Status: {existing_bundle['status']}")
-                    print(f"        Merging {len(bundle['items_list'])} items...")
+                    self._log(VERBOSITY_NORMAL, 'merge_started',
+                              f"\n[MERGE] Found existing bundle for {vendor_name}\n"
+                              f"        Bundle ID: {existing_bundle['bundle_id']}\n"
+                              f"        Status: {existing_bundle['status']}\n"
+                              f"        Merging {len(bundle['items_list'])} items...",
+                              bundle_id=existing_bundle['bundle_id'], vendor_id=vendor_id,
+                              status=existing_bundle['status'], items=len(bundle['items_list']))
                     
                     merge_result = self.db.merge_items_into_bundle(
                         existing_bundle['bundle_id'],
@@ -100,34 +186,63 @@ class SmartBundlingEngine:
                             'items_count': bundle['items_count'],
                             'total_quantity': bundle['total_quantity']
                         })
-                        print(f"        ✅ {merge_result['message']}")
+                        existing_bundle['status'] = 'Active'
+                        existing_bundle['bundle_name'] = merge_result['new_bundle_name']
+                        self._log(VERBOSITY_NORMAL, 'merge_finished', f"        ✅ {merge_result['message']}",
+                                  bundle_id=existing_bundle['bundle_id'],
+                                  items_added=merge_result['items_added'],
+                                  items_updated=merge_result['items_updated'])
                     else:
-                        print(f"        ❌ Merge failed: {merge_result['error']}")
-                        print(f"        Falling back to creating new bundle...")
+                        self._log(VERBOSITY_QUIET, 'merge_failed',
+                                  f"        ❌ Merge failed: {merge_result['error']}\n"
+                                  f"        Falling back to creating new bundle...",
+                                  bundle_id=existing_bundle['bundle_id'], error=merge_result['error'])
                         # Fallback: Create new bundle if merge fails
-                        bundle_id = self._create_new_bundle(bundle, bundle_request_ids, timestamp, i)
-                        created_bundles.append({
-                            'bundle_id': bundle_id,
-                            'bundle_name': f"BUNDLE-{timestamp}-{i:02d}",
-                            'vendor_name': vendor_name,
-                            'items_count': bundle['items_count'],
-                            'total_quantity': bundle['total_quantity']
-                        })
+                        new_bundles.append((bundle, bundle_request_ids, i))
                 else:
                     # CREATE: New bundle (no existing bundle for this vendor)
-                    print(f"\n[CREATE] Creating new bundle for {vendor_name}")
-                    bundle_id = self._create_new_bundle(bundle, bundle_request_ids, timestamp, i)
+                    self._log(VERBOSITY_NORMAL, 'create_queued', f"\n[CREATE] Queued new bundle for {vendor_name}",
+                              vendor_id=vendor_id)
+                    new_bundles.append((bundle, bundle_request_ids, i))
+            
+            # All new bundles of this run are written in one transaction
+            if new_bundles:
+                bundle_ids = self.db.create_bundles([
+                    self._build_bundle_data(bundle, bundle_request_ids, timestamp, i)
+                    for bundle, bundle_request_ids, i in new_bundles
+                ])
+                for (bundle, bundle_request_ids, i), bundle_id in zip(new_bundles, bundle_ids):
+                    self.active_bundles[bundle['vendor_id']] = {
+                        'bundle_id': bundle_id,
+                        'bundle_name': f"BUNDLE-{timestamp}-{i:02d}",
+                        'total_items': bundle['items_count'],
+                        'total_quantity': bundle['total_quantity'],
+                        'status': 'Active',
+                        'recommended_vendor_id': bundle['vendor_id']
+                    }
                     created_bundles.append({
                         'bundle_id': bundle_id,
                         'bundle_name': f"BUNDLE-{timestamp}-{i:02d}",
-                        'vendor_name': vendor_name,
+                        'vendor_name': bundle['vendor_name'],
                         'items_count': bundle['items_count'],
                         'total_quantity': bundle['total_quantity']
                     })
-                    print(f"        ✅ Created Bundle {i}: {vendor_name} - {bundle['items_count']} items")
+                    self._log(VERBOSITY_NORMAL, 'bundle_created',
+                              f"        ✅ Created Bundle {i}: {bundle['vendor_name']} - {bundle['items_count']} items",
+                              bundle_id=bundle_id, vendor_id=bundle['vendor_id'], items=bundle['items_count'])
+            
+            # Step 7: Advance the high-water mark past everything folded in by this run
+            last_req_id = max(req['req_id'] for req in pending_requests)
+            if last_req_id > (watermark['last_req_id'] or 0):
+                last_req_date = max(req['req_date'] for req in pending_requests if req['req_id'] == last_req_id)
+                self.db.set_bundling_watermark(last_req_id, last_req_date)
+                self._log(VERBOSITY_NORMAL, 'watermark_advanced', f"High-water mark advanced to req_id {last_req_id}",
+                          last_req_id=last_req_id)
             
             return {
                 "success": True,
+                "incremental": incremental,
+                "last_req_id": max(last_req_id, watermark['last_req_id'] or 0),
                 "bundles_created": created_bundles,
                 "bundles_merged": merged_bundles,
                 "total_bundles": len(created_bundles) + len(merged_bundles),
@@ -138,16 +253,16 @@ class SmartBundlingEngine:
             }
             
         except Exception as e:
-            print(f"Bundling process failed: {str(e)}")
+            self._log(VERBOSITY_QUIET, 'run_failed', f"Bundling process failed: {str(e)}", error=str(e))
             return {"success": False, "error": str(e)}
         
         finally:
             self.db.close_connection()
+            self.close_log()
     
-    def _create_new_bundle(self, bundle, request_ids, timestamp, bundle_number):
+    def _build_bundle_data(self, bundle, request_ids, timestamp, bundle_number):
         """
-        Helper method to create new bundle
-        Extracted from existing code for reusability
+        Build the create_bundle payload for one optimization bundle
         
         Args:
             bundle: Bundle data from optimization result
@@ -156,9 +271,9 @@ class SmartBundlingEngine:
             bundle_number: Sequential bundle number
         
         Returns:
-            int: Created bundle ID
+            dict: bundle_data for DatabaseConnector.create_bundle / create_bundles
         """
-        bundle_data = {
+        return {
             'timestamp': f"{timestamp}-{bundle_number:02d}",
             'total_requests': len(request_ids),
             'total_items': bundle['total_quantity'],
@@ -168,8 +283,15 @@ class SmartBundlingEngine:
             'bundle_number': bundle_number,
             'vendor_name': bundle['vendor_name']
         }
+    
+    def _create_new_bundle(self, bundle, request_ids, timestamp, bundle_number):
+        """
+        Helper method to create a single new bundle (own transaction)
         
-        return self.db.create_bundle(bundle_data)
+        Returns:
+            int: Created bundle ID
+        """
+        return self.db.create_bundle(self._build_bundle_data(bundle, request_ids, timestamp, bundle_number))
     
     def aggregate_items(self, pending_requests):
         """Aggregate items by item_id and calculate total quantities"""
@@ -221,170 +343,167 @@ class SmartBundlingEngine:
                     'vendor_id': mapping['vendor_id'],
                     'vendor_name': mapping['vendor_name'],
                     'contact_email': mapping['contact_email'],
-                    'contact_phone': mapping['contact_phone']
+                    'contact_phone': mapping['contact_phone'],
+                    'cost': mapping.get('cost')
                 })
             
-            # Add detailed analysis for debugging
-            self.debug_info = {
-                'items_analysis': {},
-                'vendor_coverage_analysis': {},
-                'common_vendors': {},
-                'coverage_strategy': []
-            }
-            
-            # Analyze each item and its vendors
-            print("\n" + "="*60)
-            print("DETAILED BUNDLING ANALYSIS (DEBUG VIEW)")
-            print("="*60)
-            
-            print("\n1. ITEMS AND THEIR VENDORS:")
-            for item_id, vendors in vendor_data.items():
-                item_name = aggregated_items[item_id]['item_name']
-                quantity = aggregated_items[item_id]['total_quantity']
-                
-                print(f"\nITEM: {item_name} ({quantity} pieces)")
-                print(f"   Item ID: {item_id}")
-                
-                vendor_list = []
-                for vendor in vendors:
-                    vendor_info = f"   - {vendor['vendor_name']} (ID: {vendor['vendor_id']})"
-                    if vendor['contact_email']:
-                        vendor_info += f" - {vendor['contact_email']}"
-                    if vendor['contact_phone']:
-                        vendor_info += f" - {vendor['contact_phone']}"
-                    print(vendor_info)
-                    vendor_list.append(vendor['vendor_name'])
-                
-                self.debug_info['items_analysis'][item_id] = {
-                    'item_name': item_name,
-                    'quantity': quantity,
-                    'vendors': vendor_list,
-                    'vendor_count': len(vendors)
-                }
-            
-            # Analyze vendor coverage across all items
-            print("\n2. VENDOR COVERAGE ANALYSIS:")
-            all_vendors = {}
-            for item_id, vendors in vendor_data.items():
-                for vendor in vendors:
-                    vendor_id = vendor['vendor_id']
-                    vendor_name = vendor['vendor_name']
-                    
-                    if vendor_id not in all_vendors:
-                        all_vendors[vendor_id] = {
-                            'vendor_name': vendor_name,
-                            'contact_email': vendor['contact_email'],
-                            'contact_phone': vendor['contact_phone'],
-                            'items_covered': [],
-                            'total_pieces': 0
-                        }
-                    
-                    all_vendors[vendor_id]['items_covered'].append({
-                        'item_id': item_id,
-                        'item_name': aggregated_items[item_id]['item_name'],
-                        'quantity': aggregated_items[item_id]['total_quantity']
-                    })
-                    all_vendors[vendor_id]['total_pieces'] += aggregated_items[item_id]['total_quantity']
-            
-            # Show vendor coverage analysis
-            total_items = len(aggregated_items)
-            for vendor_id, vendor_info in all_vendors.items():
-                coverage_percentage = (len(vendor_info['items_covered']) / total_items) * 100
-                print(f"\nVENDOR: {vendor_info['vendor_name']} (ID: {vendor_id})")
-                print(f"   Coverage: {len(vendor_info['items_covered'])}/{total_items} items ({coverage_percentage:.1f}%)")
-                print(f"   Total Pieces: {vendor_info['total_pieces']}")
-                print(f"   Contact: {vendor_info['contact_email']} | {vendor_info['contact_phone']}")
-                print("   Items covered:")
-                for item in vendor_info['items_covered']:
-                    print(f"     - {item['item_name']} ({item['quantity']} pieces)")
-                
-                self.debug_info['vendor_coverage_analysis'][vendor_id] = {
-                    'vendor_name': vendor_info['vendor_name'],
-                    'coverage_percentage': coverage_percentage,
-                    'items_count': len(vendor_info['items_covered']),
-                    'total_pieces': vendor_info['total_pieces'],
-                    'contact_email': vendor_info['contact_email'],
-                    'contact_phone': vendor_info['contact_phone'],
-                    'items_covered': vendor_info['items_covered']
-                }
+            self.debug_info = {'coverage_strategy': []}
+            if self.debug_enabled:
+                self._build_coverage_analysis(aggregated_items, vendor_data)
             
             return vendor_data
             
         except Exception as e:
-            print(f"Error getting vendor coverage: {str(e)}")
+            self._log(VERBOSITY_QUIET, 'vendor_coverage_failed', f"Error getting vendor coverage: {str(e)}", error=str(e))
             return {}
     
-    def optimize_vendor_selection(self, aggregated_items, vendor_data):
-        """Find optimal vendor combinations for 100% item coverage"""
-        print("Starting smart vendor optimization for complete coverage...")
-        
-        # Step 1: Build vendor capabilities matrix
-        vendor_capabilities = defaultdict(lambda: {
-            'items_available': set(),
-            'vendor_info': {},
-            'total_quantity': 0
+    def _build_coverage_analysis(self, aggregated_items, vendor_data):
+        """Detailed per-item / per-vendor analysis (debug verbosity only)"""
+        self.debug_info.update({
+            'items_analysis': {},
+            'vendor_coverage_analysis': {},
+            'common_vendors': {}
         })
         
-        # Map which vendors can supply which items
-        for item_id, item_data in aggregated_items.items():
-            if item_id in vendor_data:
-                for vendor in vendor_data[item_id]:
-                    vendor_id = vendor['vendor_id']
-                    vendor_capabilities[vendor_id]['items_available'].add(item_id)
-                    vendor_capabilities[vendor_id]['vendor_info'] = {
+        # Analyze each item and its vendors
+        self._log(VERBOSITY_DEBUG, 'analysis_started',
+                  "\n" + "="*60 + "\nDETAILED BUNDLING ANALYSIS (DEBUG VIEW)\n" + "="*60 + "\n\n1. ITEMS AND THEIR VENDORS:")
+        for item_id, vendors in vendor_data.items():
+            item_name = aggregated_items[item_id]['item_name']
+            quantity = aggregated_items[item_id]['total_quantity']
+            
+            lines = [f"\nITEM: {item_name} ({quantity} pieces)", f"   Item ID: {item_id}"]
+            vendor_list = []
+            for vendor in vendors:
+                vendor_line = f"   - {vendor['vendor_name']} (ID: {vendor['vendor_id']})"
+                if vendor['contact_email']:
+                    vendor_line += f" - {vendor['contact_email']}"
+                if vendor['contact_phone']:
+                    vendor_line += f" - {vendor['contact_phone']}"
+                lines.append(vendor_line)
+                vendor_list.append(vendor['vendor_name'])
+            self._log(VERBOSITY_DEBUG, 'item_vendors', "\n".join(lines),
+                      item_id=item_id, item_name=item_name, quantity=quantity,
+                      vendor_ids=[vendor['vendor_id'] for vendor in vendors])
+            
+            self.debug_info['items_analysis'][item_id] = {
+                'item_name': item_name,
+                'quantity': quantity,
+                'vendors': vendor_list,
+                'vendor_count': len(vendors)
+            }
+        
+        # Analyze vendor coverage across all items
+        self._log(VERBOSITY_DEBUG, 'vendor_analysis_started', "\n2. VENDOR COVERAGE ANALYSIS:")
+        all_vendors = {}
+        for item_id, vendors in vendor_data.items():
+            for vendor in vendors:
+                vendor_id = vendor['vendor_id']
+                
+                if vendor_id not in all_vendors:
+                    all_vendors[vendor_id] = {
                         'vendor_name': vendor['vendor_name'],
                         'contact_email': vendor['contact_email'],
-                        'contact_phone': vendor['contact_phone']
+                        'contact_phone': vendor['contact_phone'],
+                        'items_covered': [],
+                        'total_pieces': 0
                     }
+                
+                all_vendors[vendor_id]['items_covered'].append({
+                    'item_id': item_id,
+                    'item_name': aggregated_items[item_id]['item_name'],
+                    'quantity': aggregated_items[item_id]['total_quantity']
+                })
+                all_vendors[vendor_id]['total_pieces'] += aggregated_items[item_id]['total_quantity']
         
-        # Step 2: Smart Bundle Creation Algorithm
-        bundles = []
-        remaining_items = set(aggregated_items.keys())
-        bundle_number = 1
+        # Show vendor coverage analysis
+        total_items = len(aggregated_items)
+        for vendor_id, vendor_info in all_vendors.items():
+            items_count = len(vendor_info['items_covered'])
+            coverage_percentage = (items_count / total_items) * 100
+            lines = [
+                f"\nVENDOR: {vendor_info['vendor_name']} (ID: {vendor_id})",
+                f"   Coverage: {items_count}/{total_items} items ({coverage_percentage:.1f}%)",
+                f"   Total Pieces: {vendor_info['total_pieces']}",
+                f"   Contact: {vendor_info['contact_email']} | {vendor_info['contact_phone']}",
+                "   Items covered:"
+            ]
+            lines.extend(f"     - {item['item_name']} ({item['quantity']} pieces)" for item in vendor_info['items_covered'])
+            self._log(VERBOSITY_DEBUG, 'vendor_coverage', "\n".join(lines),
+                      vendor_id=vendor_id, vendor_name=vendor_info['vendor_name'], items_count=items_count,
+                      coverage_percentage=coverage_percentage, total_pieces=vendor_info['total_pieces'])
+            
+            self.debug_info['vendor_coverage_analysis'][vendor_id] = {
+                'vendor_name': vendor_info['vendor_name'],
+                'coverage_percentage': coverage_percentage,
+                'items_count': items_count,
+                'total_pieces': vendor_info['total_pieces'],
+                'contact_email': vendor_info['contact_email'],
+                'contact_phone': vendor_info['contact_phone'],
+                'items_covered': vendor_info['items_covered']
+            }
+    
+    def optimize_vendor_selection(self, aggregated_items, vendor_data, open_vendor_ids=None):
+        """
+        Find the best vendor combination for 100% item coverage (fewest new vendors, lowest landed cost).
+        open_vendor_ids: vendors with an open bundle - using them opens no new bundle.
+        """
+        self._log(VERBOSITY_NORMAL, 'optimization_started', "Starting smart vendor optimization for complete coverage...")
         
-        print(f"Need to cover {len(remaining_items)} items: {[aggregated_items[i]['item_name'] for i in remaining_items]}")
+        # Step 1: Build the optimization problem from vendor capabilities and ItemVendorMap costs
+        vendor_info = {}
+        offers = {}
+        for item_id in aggregated_items:
+            offers[item_id] = {}
+            for vendor in vendor_data.get(item_id, []):
+                vendor_id = vendor['vendor_id']
+                offers[item_id][vendor_id] = vendor.get('cost')
+                vendor_info[vendor_id] = {
+                    'vendor_name': vendor['vendor_name'],
+                    'contact_email': vendor['contact_email'],
+                    'contact_phone': vendor['contact_phone']
+                }
         
-        print("\n3. BUNDLE CREATION STRATEGY:")
+        problem = SelectionProblem(
+            {item_id: item_data['total_quantity'] for item_id, item_data in aggregated_items.items()},
+            offers,
+            self.vendor_minimums,
+            open_vendor_ids
+        )
         
-        while remaining_items:
-            # Find vendor with maximum coverage of remaining items
-            best_vendor = None
-            best_coverage = 0
-            best_items = set()
-            
-            print(f"\n   Analyzing remaining items: {len(remaining_items)}")
-            for item_id in remaining_items:
-                print(f"     - {aggregated_items[item_id]['item_name']}")
-            
-            print("   Vendor coverage analysis:")
-            for vendor_id, capabilities in vendor_capabilities.items():
-                # Items this vendor can cover from remaining items
-                can_cover = capabilities['items_available'].intersection(remaining_items)
-                coverage_count = len(can_cover)
-                vendor_name = capabilities['vendor_info']['vendor_name']
-                
-                if coverage_count > 0:
-                    print(f"     - {vendor_name}: can cover {coverage_count} items")
-                    for item_id in can_cover:
-                        print(f"       * {aggregated_items[item_id]['item_name']}")
-                
-                if coverage_count > best_coverage:
-                    best_coverage = coverage_count
-                    best_vendor = vendor_id
-                    best_items = can_cover
-            
-            if best_vendor is None:
-                # Handle items with no vendors (shouldn't happen in normal case)
-                print(f"   WARNING: Items without vendors: {remaining_items}")
-                for item_id in remaining_items:
-                    print(f"     - {aggregated_items[item_id]['item_name']} (Item ID: {item_id})")
-                break
-            
-            # Create bundle for this vendor
+        if self.debug_enabled:
+            self._log(VERBOSITY_DEBUG, 'items_to_cover',
+                      f"Need to cover {len(aggregated_items)} items: {[item_data['item_name'] for item_data in aggregated_items.values()]}")
+        
+        # Step 2: Solve (exact for small instances, greedy for large ones)
+        solution = self.optimizer.solve(problem)
+        
+        self._log(VERBOSITY_NORMAL, 'optimizer_result',
+                  "\n3. BUNDLE CREATION STRATEGY:\n"
+                  f"   Optimizer: {solution['method']} ({'optimal' if solution['optimal'] else 'best found'}) "
+                  f"in {solution['elapsed_seconds']:.3f}s - {len(solution['vendors'])} vendors, "
+                  f"landed cost ${solution['total_cost']:,.2f}")
+        
+        if solution['uncovered_items']:
+            # Handle items with no vendors (shouldn't happen in normal case)
+            lines = [f"   WARNING: Items without vendors: {solution['uncovered_items']}"]
+            lines.extend(f"     - {aggregated_items[item_id]['item_name']} (Item ID: {item_id})"
+                         for item_id in solution['uncovered_items'])
+            self._log(VERBOSITY_QUIET, 'items_without_vendors', "\n".join(lines),
+                      item_ids=solution['uncovered_items'])
+        
+        # Step 3: One bundle per chosen vendor, largest bundles first
+        items_by_vendor = defaultdict(list)
+        for item_id, vendor_id in solution['assignment'].items():
+            items_by_vendor[vendor_id].append(item_id)
+        
+        bundles = []
+        ordered_vendors = sorted(items_by_vendor, key=lambda v: (-len(items_by_vendor[v]), vendor_info[v]['vendor_name']))
+        for bundle_number, vendor_id in enumerate(ordered_vendors, 1):
             bundle_items = []
             bundle_total_qty = 0
             
-            for item_id in best_items:
+            for item_id in items_by_vendor[vendor_id]:
                 item_data = aggregated_items[item_id]
                 bundle_items.append({
                     'item_id': item_id,
@@ -396,10 +515,10 @@ class SmartBundlingEngine:
             
             bundle = {
                 'bundle_number': bundle_number,
-                'vendor_id': best_vendor,
-                'vendor_name': vendor_capabilities[best_vendor]['vendor_info']['vendor_name'],
-                'contact_email': vendor_capabilities[best_vendor]['vendor_info']['contact_email'],
-                'contact_phone': vendor_capabilities[best_vendor]['vendor_info']['contact_phone'],
+                'vendor_id': vendor_id,
+                'vendor_name': vendor_info[vendor_id]['vendor_name'],
+                'contact_email': vendor_info[vendor_id]['contact_email'],
+                'contact_phone': vendor_info[vendor_id]['contact_phone'],
                 'items_count': len(bundle_items),
                 'total_quantity': bundle_total_qty,
                 'items_list': bundle_items
@@ -407,43 +526,46 @@ class SmartBundlingEngine:
             
             bundles.append(bundle)
             
-            # Remove covered items from remaining
-            remaining_items -= best_items
+            self._log(VERBOSITY_NORMAL, 'bundle_planned',
+                      f"   Bundle {bundle_number}: {bundle['vendor_name']} covers {len(bundle_items)} items ({bundle_total_qty} pieces)",
+                      bundle_number=bundle_number, vendor_id=vendor_id, items=len(bundle_items), pieces=bundle_total_qty)
+            if self.debug_enabled:
+                lines = [f"      Contact: {bundle['contact_email']} | {bundle['contact_phone']}", "      Items in this bundle:"]
+                lines.extend(f"        - {item['item_name']} ({item['quantity']} pieces)" for item in bundle_items)
+                self._log(VERBOSITY_DEBUG, 'bundle_items', "\n".join(lines),
+                          bundle_number=bundle_number, item_ids=[item['item_id'] for item in bundle_items])
             
-            print(f"   Bundle {bundle_number}: {bundle['vendor_name']} covers {len(best_items)} items ({bundle_total_qty} pieces)")
-            print(f"      Contact: {bundle['contact_email']} | {bundle['contact_phone']}")
-            print("      Items in this bundle:")
-            for item in bundle_items:
-                print(f"        - {item['item_name']} ({item['quantity']} pieces)")
-            
-            # Store bundle strategy in debug info
+            # Bundle strategy (one entry per bundle - the recommendations view reads it)
             self.debug_info['coverage_strategy'].append({
                 'bundle_number': bundle_number,
                 'vendor_name': bundle['vendor_name'],
-                'vendor_id': best_vendor,
+                'vendor_id': vendor_id,
                 'contact_email': bundle['contact_email'],
                 'contact_phone': bundle['contact_phone'],
-                'items_covered': len(best_items),
+                'items_covered': len(bundle_items),
                 'total_pieces': bundle_total_qty,
                 'items_list': [{'item_name': item['item_name'], 'quantity': item['quantity']} for item in bundle_items]
             })
-            
-            bundle_number += 1
         
-        # Step 3: Verify 100% coverage
+        # Step 4: Verify 100% coverage
         total_items_covered = sum(len(bundle['items_list']) for bundle in bundles)
         total_items_needed = len(aggregated_items)
         
         coverage_percentage = (total_items_covered / total_items_needed) * 100 if total_items_needed > 0 else 0
         
-        print(f"Coverage Result: {total_items_covered}/{total_items_needed} items = {coverage_percentage:.1f}%")
+        self._log(VERBOSITY_NORMAL, 'coverage_result',
+                  f"Coverage Result: {total_items_covered}/{total_items_needed} items = {coverage_percentage:.1f}%",
+                  items_covered=total_items_covered, items_needed=total_items_needed)
         
         if coverage_percentage < 100:
-            print(f"Warning: Not all items covered! Missing items: {remaining_items}")
+            self._log(VERBOSITY_QUIET, 'coverage_incomplete',
+                      f"Warning: Not all items covered! Missing items: {solution['uncovered_items']}",
+                      item_ids=solution['uncovered_items'])
         
-        print("\n" + "="*60)
-        print(f"BUNDLING COMPLETED: {len(bundles)} bundles created with {coverage_percentage:.1f}% coverage")
-        print("="*60)
+        self._log(VERBOSITY_NORMAL, 'bundling_completed',
+                  "\n" + "="*60 + "\n"
+                  f"BUNDLING COMPLETED: {len(bundles)} bundles created with {coverage_percentage:.1f}% coverage\n"
+                  + "="*60)
         
         return {
             'bundles': bundles,
@@ -451,7 +573,16 @@ class SmartBundlingEngine:
             'coverage_percentage': coverage_percentage,
             'total_items': total_items_needed,
             'items_covered': total_items_covered,
-            'debug_info': self.debug_info if hasattr(self, 'debug_info') else {}
+            'optimizer': {
+                'method': solution['method'],
+                'optimal': solution['optimal'],
+                'objective': solution['objective'],
+                'total_cost': solution['total_cost'],
+                'minimum_shortfall': solution['minimum_shortfall'],
+                'nodes_explored': solution['nodes_explored'],
+                'elapsed_seconds': solution['elapsed_seconds']
+            },
+            'debug_info': self.debug_info
         }
 
 def run_manual_bundling():
@@ -0,0 +1,207 @@
+"""
+Process-wide pyodbc connection pool for Phase 3
+- Shared by every DatabaseConnector in the process (Streamlit sessions, bundling engine, cron scripts)
+- Bounded pool size, health check on checkout, idle eviction
+- Remembers the ODBC driver that worked so later connects skip the fallback list
+"""
+
+import atexit
+import threading
+import time
+
+import pyodbc
+
+# Pool tuning (overridable per pool via get_pool kwargs)
+DEFAULT_MAX_SIZE = 10
+DEFAULT_MAX_IDLE_SECONDS = 300       # Close connections idle longer than this
+DEFAULT_PING_AFTER_IDLE_SECONDS = 5  # Health-check connections idle longer than this on checkout
+DEFAULT_CHECKOUT_TIMEOUT = 30        # Seconds to wait for a free slot when the pool is full
+
+FALLBACK_DRIVERS = [
+    '{ODBC Driver 18 for SQL Server}',
+    '{ODBC Driver 17 for SQL Server}',
+    '{SQL Server}'
+]
+
+
+class PoolExhaustedError(Exception):
+    """Raised when no connection slot frees up within the checkout timeout"""
+
+
+class ConnectionPool:
+    def __init__(self, server, database, username, password, driver,
+                 max_size=DEFAULT_MAX_SIZE,
+                 max_idle_seconds=DEFAULT_MAX_IDLE_SECONDS,
+                 ping_after_idle_seconds=DEFAULT_PING_AFTER_IDLE_SECONDS,
+                 checkout_timeout=DEFAULT_CHECKOUT_TIMEOUT):
+        self.server = server
+        self.database = database
+        self.username = username
+        self.password = password
+        self.driver = driver
+        self.max_size = max_size
+        self.max_idle_seconds = max_idle_seconds
+        self.ping_after_idle_seconds = ping_after_idle_seconds
+        self.checkout_timeout = checkout_timeout
+
+        # Driver that last produced a working connection (None until first success)
+        self.working_driver = None
+
+        self._idle = []          # [(conn, released_at), ...] - most recently used at the end
+        self._in_use = 0
+        self._lock = threading.Condition()
+
+    def _drivers_to_try(self):
+        """Remembered driver first, then the configured one, then the fallback list"""
+        drivers = []
+        for driver in [self.working_driver, self.driver] + FALLBACK_DRIVERS:
+            if driver and driver not in drivers:
+                drivers.append(driver)
+        return drivers
+
+    def _open_connection(self):
+        """Open a new physical connection, walking the driver list only when needed"""
+        last_error = None
+        for driver in self._drivers_to_try():
+            try:
+                connection_string = f"DRIVER={driver};SERVER={self.server};DATABASE={self.database};UID={self.username};PWD={self.password}"
+                conn = pyodbc.connect(connection_string)
+                self.working_driver = driver
+                return conn
+            except Exception as e:
+                last_error = e
+                continue
+
+        raise Exception(f"Unable to connect with available ODBC drivers: {last_error}")
+
+    @staticmethod
+    def _is_healthy(conn):
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _evict_idle(self, now):
+        """Drop connections that have been idle too long (caller holds the lock)"""
+        keep = []
+        for conn, released_at in self._idle:
+            if now - released_at > self.max_idle_seconds:
+                self._close_quietly(conn)
+            else:
+                keep.append((conn, released_at))
+        self._idle = keep
+
+    def acquire(self):
+        """Check out a connection, reusing an idle one when possible"""
+        deadline = time.monotonic() + self.checkout_timeout
+
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                self._evict_idle(now)
+
+                if self._idle:
+                    conn, released_at = self._idle.pop()
+                    self._in_use += 1
+                    break
+
+                if self._in_use < self.max_size:
+                    conn, released_at = None, None
+                    self._in_use += 1
+                    break
+
+                remaining = deadline - now
+                if remaining <= 0:
+                    raise PoolExhaustedError(
+                        f"No database connection available (pool size {self.max_size})"
+                    )
+                self._lock.wait(remaining)
+
+        # Network work happens outside the lock so other sessions aren't blocked
+        try:
+            if conn is not None:
+                if time.monotonic() - released_at <= self.ping_after_idle_seconds or self._is_healthy(conn):
+                    return conn
+                self._close_quietly(conn)
+            return self._open_connection()
+        except Exception:
+            with self._lock:
+                self._in_use -= 1
+                self._lock.notify()
+            raise
+
+    def release(self, conn):
+        """Return a connection to the pool, discarding it if it can't be reset"""
+        reusable = True
+        try:
+            # Never hand an open transaction to the next caller
+            conn.rollback()
+        except Exception:
+            reusable = False
+            self._close_quietly(conn)
+
+        with self._lock:
+            self._in_use -= 1
+            if reusable:
+                self._idle.append((conn, time.monotonic()))
+            self._lock.notify()
+
+    def discard(self, conn):
+        """Close a broken connection and free its slot"""
+        self._close_quietly(conn)
+        with self._lock:
+            self._in_use -= 1
+            self._lock.notify()
+
+    def close_all(self):
+        """Close every idle connection (in-use connections close when released)"""
+        with self._lock:
+            for conn, _ in self._idle:
+                self._close_quietly(conn)
+            self._idle = []
+
+    def stats(self):
+        with self._lock:
+            return {
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'max_size': self.max_size,
+                'working_driver': self.working_driver
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(server, database, username, password, driver, **kwargs):
+    """Return the process-wide pool for these connection settings, creating it on first use"""
+    key = (server, database, username, password)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(server, database, username, password, driver, **kwargs)
+            _pools[key] = pool
+        return pool
+
+
+def close_all_pools():
+    """Close idle connections in every pool (used at process shutdown)"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_all()
+
+
+atexit.register(close_all_pools)
@@ -1,12 +1,47 @@
-import pyodbc
 import os
 import json
+import threading
+from collections import namedtuple, OrderedDict
+from functools import lru_cache
 import streamlit as st
 from dotenv import load_dotenv
+from sql_backend import create_backend
+from notification_outbox import enqueue_user_notifications, enqueue_bundle_notification
+from notification_outbox import deliver as deliver_notifications
+from recipient_directory import invalidate_recipient_directory
+from reference_data import get_reference_data, get_reference_index, touch_reference_tables, ItemSelectionIndex
+
+
+@lru_cache(maxsize=256)
+def _row_type(columns):
+    """Named-tuple row class for a column list (built once per distinct result shape)"""
+    return namedtuple('Row', columns, rename=True)
+
+
+# Incremental bundling also re-reads Pending requests created this recently, so a request
+# that committed after a higher req_id was bundled is still picked up
+BUNDLING_LOOKBACK_MINUTES = int(os.getenv('BUNDLING_LOOKBACK_MINUTES', '60'))
+
+# Table column lists, introspected once per process: {(dialect, table_name): (column, ...)}
+_table_columns_cache = {}
+
+# Duplicate-project results per bundle: {(dialect, bundle_id): ((merge_count, last_merged_at), duplicates)}
+# A bundle is re-checked only when the cron merged into it or an edit here invalidated it.
+# LRU-bounded: the least recently viewed bundles are dropped past BUNDLE_DUPLICATES_CACHE_SIZE.
+BUNDLE_DUPLICATES_CACHE_SIZE = 1000
+_bundle_duplicates_cache = OrderedDict()
+_bundle_duplicates_lock = threading.Lock()
+
 
 class DatabaseConnector:
-    def __init__(self):
-        """Initialize database connection using Phase 2's proven pattern"""
+    def __init__(self, backend=None):
+        """
+        Initialize database connection using Phase 2's proven pattern
+        
+        Args:
+            backend: Optional sql_backend instance (e.g. SqliteBackend for offline runs).
+                     Defaults to the backend selected by DB_BACKEND (Azure SQL pool).
+        """
         load_dotenv()
         
         # Use Phase 2's proven secrets management approach
@@ -25,36 +60,24 @@ class DatabaseConnector:
             self.password = os.getenv('AZURE_DB_PASSWORD', 'xxxx')
             self.driver = os.getenv('AZURE_DB_DRIVER', '{ODBC Driver 18 for SQL Server}')
         
+        self.backend = backend
         self.conn = None
         self.cursor = None
         self.connection_error = None
         self.connect()
     
     def connect(self):
-        """Connect to Azure SQL Database"""
+        """Check out a connection from the backend (pooled for Azure SQL, avoids a fresh handshake per rerun)"""
         try:
-            # Try multiple driver versions for compatibility
-            drivers_to_try = [
-                self.driver,
-                '{ODBC Driver 18 for SQL Server}',
-                '{ODBC Driver 17 for SQL Server}',
-                '{SQL Server}'
-            ]
-            
-            for driver in drivers_to_try:
-                try:
-                    connection_string = f"DRIVER={driver};SERVER={self.server};DATABASE={self.database};UID={self.username};PWD={self.password}"
-                    self.conn = pyodbc.connect(connection_string)
-                    self.cursor = self.conn.cursor()
-                    self.connection_error = None
-                    return
-                except Exception:
-                    continue
-            
-            # If all drivers failed
-            raise Exception("Unable to connect with available ODBC drivers")
-            
+            if self.backend is None:
+                self.backend = create_backend(self.server, self.database, self.username, self.password, self.driver)
+            self.conn = self.backend.acquire()
+            self.cursor = self.conn.cursor()
+            self.connection_error = None
+
         except Exception as e:
+            if self.conn and self.backend:
+                self.backend.discard(self.conn)
             error_msg = str(e)
             self.connection_error = error_msg
             self.conn = None
@@ -73,16 +96,87 @@ class DatabaseConnector:
             
             # Fetch all results
             columns = [column[0] for column in self.cursor.description]
-            results = []
-            for row in self.cursor.fetchall():
-                results.append(dict(zip(columns, row)))
-            
-            return results
+            return [dict(zip(columns, row)) for row in self.cursor.fetchall()]
             
         except Exception as e:
             print(f"Query execution error: {str(e)}")
             return []
     
+    def _execute_select(self, query, params=None, cursor=None):
+        """Run a SELECT and return its column names (cursor left positioned on the results)"""
+        cursor = cursor or self.cursor
+        if params:
+            cursor.execute(query, params)
+        else:
+            cursor.execute(query)
+        return tuple(column[0] for column in cursor.description)
+    
+    def execute_query_rows(self, query, params=None):
+        """
+        Execute a SELECT query and return named-tuple rows (row.item_id / row[0]).
+        Lighter than execute_query for large result sets - no dict per row.
+        """
+        if not self.conn:
+            return []
+        
+        try:
+            columns = self._execute_select(query, params)
+            return list(map(_row_type(columns)._make, self.cursor.fetchall()))
+        except Exception as e:
+            print(f"Query execution error: {str(e)}")
+            return []
+    
+    def iter_query_rows(self, query, params=None, batch_size=1000):
+        """
+        Stream named-tuple rows using fetchmany batches (bounded memory for very large results).
+        Uses its own cursor (closed when the generator finishes or is closed). On SQL Server
+        without MARS the connection stays busy until then - finish or close() the generator
+        before running other queries on this connector.
+        """
+        if not self.conn:
+            return
+        
+        cursor = self.conn.cursor()
+        try:
+            columns = self._execute_select(query, params, cursor)
+            make_row = _row_type(columns)._make
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                yield from map(make_row, batch)
+        finally:
+            cursor.close()
+    
+    def execute_query_columns(self, query, params=None):
+        """Execute a SELECT query and return columnar results: {column_name: [values...]}"""
+        if not self.conn:
+            return {}
+        
+        try:
+            columns = self._execute_select(query, params)
+            rows = self.cursor.fetchall()
+            if not rows:
+                return {column: [] for column in columns}
+            return {column: list(values) for column, values in zip(columns, zip(*rows))}
+        except Exception as e:
+            print(f"Query execution error: {str(e)}")
+            return {}
+    
+    def execute_query_df(self, query, params=None):
+        """Execute a SELECT query and return a pandas DataFrame built directly from fetchall"""
+        import pandas as pd
+        
+        if not self.conn:
+            return pd.DataFrame()
+        
+        try:
+            columns = self._execute_select(query, params)
+            return pd.DataFrame.from_records([tuple(row) for row in self.cursor.fetchall()], columns=columns)
+        except Exception as e:
+            print(f"Query execution error: {str(e)}")
+            return pd.DataFrame()
+    
     def execute_insert(self, query, params=None):
         """Execute an INSERT/UPDATE/DELETE query"""
         if not self.conn:
@@ -101,6 +195,29 @@ class DatabaseConnector:
             print(f"Insert execution error: {str(e)}")
             raise
     
+    def execute_many(self, query, rows):
+        """
+        Execute one INSERT/UPDATE/DELETE for many parameter rows in a single batch.
+        Uses pyodbc fast_executemany on SQL Server (one round trip per batch).
+        Does not commit - let the calling function handle commits.
+        """
+        if not self.conn:
+            raise Exception("No database connection")
+        
+        rows = list(rows)
+        if not rows:
+            return 0
+        
+        try:
+            self.cursor.fast_executemany = True
+            self.cursor.executemany(query, rows)
+            return len(rows)
+        except Exception as e:
+            print(f"Batch execution error: {str(e)}")
+            raise
+        finally:
+            self.cursor.fast_executemany = False
+    
     def execute_non_query(self, query, params=None):
         """Execute INSERT, UPDATE, DELETE queries"""
         if not self.conn:
@@ -142,12 +259,18 @@ class DatabaseConnector:
         return results[0] if results else None
     
     def get_all_items(self, source_filter=None):
-        """Get items from Phase 2's items table (reusing proven logic)"""
-        query = "SELECT * FROM items"
+        """Get items from Phase 2's items table (app-wide reference cache, shared read-only rows)"""
+        items = get_reference_data(self, 'items')
         if source_filter:
-            query += " WHERE source_sheet = ?"
-            return self.execute_query(query, (source_filter,))
-        return self.execute_query(query)
+            return [item for item in items if item.get('source_sheet') == source_filter]
+        return list(items)
+    
+    def get_item_selection_index(self, source_filter):
+        """Type/name/dimension lookups over one source's items (built once per reference cache load)"""
+        return get_reference_index(
+            self, 'items', ('selection', source_filter),
+            lambda items: ItemSelectionIndex(item for item in items if item.get('source_sheet') == source_filter)
+        )
     
     def get_item_vendors(self, item_id):
         """Get vendors for an item (reusing Phase 2's logic)"""
@@ -170,6 +293,33 @@ class DatabaseConnector:
         """
         return self.execute_query(query, (bundle_id, item_id))
     
+    def get_bundle_project_breakdowns(self, bundle_ids):
+        """
+        Project breakdown for every item of many bundles in one query.
+        Returns {(bundle_id, item_id): [rows]} with the same columns as get_bundle_item_project_breakdown.
+        """
+        bundle_ids = list(dict.fromkeys(b for b in bundle_ids if b is not None))
+        breakdowns = {}
+        for start in range(0, len(bundle_ids), 1000):
+            chunk = bundle_ids[start:start + 1000]
+            placeholders = ','.join('?' for _ in chunk)
+            query = f"""
+            SELECT rbm.bundle_id, roi.item_id, roi.project_number, roi.quantity, ro.user_id, roi.date_needed
+            FROM requirements_bundle_mapping rbm
+            JOIN requirements_orders ro ON rbm.req_id = ro.req_id
+            JOIN requirements_order_items roi ON ro.req_id = roi.req_id
+            WHERE rbm.bundle_id IN ({placeholders})
+              AND EXISTS (
+                  SELECT 1 FROM requirements_bundle_items bi
+                  WHERE bi.bundle_id = rbm.bundle_id AND bi.item_id = roi.item_id
+              )
+            ORDER BY rbm.bundle_id, roi.item_id, ro.req_id
+            """
+            for row in self.execute_query(query, tuple(chunk)):
+                key = (row.pop('bundle_id'), row.pop('item_id'))
+                breakdowns.setdefault(key, []).append(row)
+        return breakdowns
+    
     def get_previous_sub_projects(self, parent_project):
         """
         Get previously used sub-project numbers for a parent project.
@@ -217,72 +367,116 @@ class DatabaseConnector:
             'users': [{'user_id': int, 'full_name': str, 'quantity': int}, ...]
         }]
         """
-        # Find items where multiple users requested same item for same project
-        # CRITICAL: Only check items that are ACTUALLY in this bundle (in requirements_bundle_items)
-        query = """
-        SELECT 
-            roi.item_id,
-            i.item_name,
-            roi.project_number,
-            roi.sub_project_number,
-            ro.user_id,
-            u.full_name,
-            roi.quantity
-        FROM requirements_bundle_mapping rbm
-        JOIN requirements_orders ro ON rbm.req_id = ro.req_id
-        JOIN requirements_order_items roi ON ro.req_id = roi.req_id
-        JOIN items i ON roi.item_id = i.item_id
-        LEFT JOIN requirements_users u ON ro.user_id = u.user_id
-        WHERE rbm.bundle_id = ? 
-          AND roi.project_number IS NOT NULL
-          AND roi.item_id IN (
-              SELECT item_id 
-              FROM requirements_bundle_items 
-              WHERE bundle_id = ?
-          )
-        ORDER BY roi.item_id, roi.project_number, roi.sub_project_number, ro.user_id
+        return self._query_duplicate_projects([bundle_id]).get(bundle_id, [])
+    
+    def detect_duplicate_projects_in_bundles(self, bundles):
         """
+        Duplicate projects for many bundles: {bundle_id: [duplicates]} (same format as
+        detect_duplicate_projects_in_bundle).
+        bundles: bundle rows with bundle_id, merge_count and last_merged_at (as loaded by the dashboards).
+        Cached results are reused while a bundle's merge_count/last_merged_at are unchanged;
+        the rest are computed together in one grouped query.
+        """
+        dialect = getattr(self.backend, 'dialect', None)
+        results = {}
+        stale = {}
+        with _bundle_duplicates_lock:
+            for bundle in bundles:
+                bundle_id = bundle.get('bundle_id')
+                if bundle_id is None or bundle_id in results or bundle_id in stale:
+                    continue
+                version = (bundle.get('merge_count') or 0, bundle.get('last_merged_at'))
+                cached = _bundle_duplicates_cache.get((dialect, bundle_id))
+                if cached is not None and cached[0] == version:
+                    _bundle_duplicates_cache.move_to_end((dialect, bundle_id))
+                    results[bundle_id] = cached[1]
+                else:
+                    stale[bundle_id] = version
         
-        results = self.execute_query(query, (bundle_id, bundle_id))
-        
-        if not results:
-            return []
-        
-        # Group by (item_id, project_number, sub_project_number)
+        if stale:
+            found = self._query_duplicate_projects(list(stale))
+            with _bundle_duplicates_lock:
+                for bundle_id, version in stale.items():
+                    duplicates = found.get(bundle_id, [])
+                    _bundle_duplicates_cache[(dialect, bundle_id)] = (version, duplicates)
+                    _bundle_duplicates_cache.move_to_end((dialect, bundle_id))
+                    results[bundle_id] = duplicates
+                while len(_bundle_duplicates_cache) > BUNDLE_DUPLICATES_CACHE_SIZE:
+                    _bundle_duplicates_cache.popitem(last=False)
+        return results
+    
+    def _invalidate_bundle_duplicates(self, *bundle_ids):
+        """Forget cached duplicate results for bundles whose items/quantities were edited"""
+        dialect = getattr(self.backend, 'dialect', None)
+        with _bundle_duplicates_lock:
+            for bundle_id in bundle_ids:
+                _bundle_duplicates_cache.pop((dialect, bundle_id), None)
+    
+    def _query_duplicate_projects(self, bundle_ids):
+        """
+        One grouped query for several bundles: item/project/sub-project combinations in a bundle
+        requested by more than one user, with each user's line. Returns {bundle_id: [duplicates]}.
+        """
         from collections import defaultdict
-        grouped = defaultdict(lambda: {
-            'item_id': None,
-            'item_name': '',
-            'project_number': '',
-            'sub_project_number': None,
-            'users': []
-        })
-        
-        for row in results:
-            # Create unique key for grouping
-            key = (row['item_id'], row['project_number'], row.get('sub_project_number'))
-            
-            # Initialize if first time seeing this combination
-            if grouped[key]['item_id'] is None:
-                grouped[key]['item_id'] = row['item_id']
-                grouped[key]['item_name'] = row['item_name']
-                grouped[key]['project_number'] = row['project_number']
-                grouped[key]['sub_project_number'] = row.get('sub_project_number')
-            
-            # Add user to list
-            grouped[key]['users'].append({
-                'user_id': row['user_id'],
-                'full_name': row.get('full_name', f"User {row['user_id']}"),
-                'quantity': row['quantity']
-            })
-        
-        # Filter to only duplicates (multiple users)
-        duplicates = []
-        for key, data in grouped.items():
-            if len(data['users']) > 1:
-                duplicates.append(data)
-        
-        return duplicates
+        duplicates_by_bundle = defaultdict(list)
+        bundle_ids = list(dict.fromkeys(bundle_ids))
+        for start in range(0, len(bundle_ids), 1000):
+            chunk = bundle_ids[start:start + 1000]
+            placeholders = ','.join('?' for _ in chunk)
+            # CRITICAL: Only check items that are ACTUALLY in the bundle (in requirements_bundle_items)
+            query = f"""
+            SELECT 
+                rbm.bundle_id,
+                roi.item_id,
+                i.item_name,
+                roi.project_number,
+                roi.sub_project_number,
+                ro.user_id,
+                u.full_name,
+                roi.quantity
+            FROM requirements_bundle_mapping rbm
+            JOIN requirements_orders ro ON rbm.req_id = ro.req_id
+            JOIN requirements_order_items roi ON ro.req_id = roi.req_id
+            JOIN items i ON roi.item_id = i.item_id
+            LEFT JOIN requirements_users u ON ro.user_id = u.user_id
+            JOIN (
+                SELECT rbm2.bundle_id, roi2.item_id, roi2.project_number,
+                       ISNULL(roi2.sub_project_number, '') AS sub_project_key
+                FROM requirements_bundle_mapping rbm2
+                JOIN requirements_orders ro2 ON rbm2.req_id = ro2.req_id
+                JOIN requirements_order_items roi2 ON ro2.req_id = roi2.req_id
+                JOIN requirements_bundle_items bi ON bi.bundle_id = rbm2.bundle_id AND bi.item_id = roi2.item_id
+                WHERE rbm2.bundle_id IN ({placeholders})
+                  AND roi2.project_number IS NOT NULL
+                GROUP BY rbm2.bundle_id, roi2.item_id, roi2.project_number, ISNULL(roi2.sub_project_number, '')
+                HAVING COUNT(DISTINCT ro2.user_id) > 1
+            ) d ON d.bundle_id = rbm.bundle_id
+               AND d.item_id = roi.item_id
+               AND d.project_number = roi.project_number
+               AND d.sub_project_key = ISNULL(roi.sub_project_number, '')
+            ORDER BY rbm.bundle_id, roi.item_id, roi.project_number, roi.sub_project_number, ro.user_id
+            """
+            
+            # Group rows by (bundle, item, project, sub-project), keeping query order
+            grouped = {}
+            for row in self.execute_query(query, tuple(chunk)):
+                key = (row['bundle_id'], row['item_id'], row['project_number'], row.get('sub_project_number') or '')
+                entry = grouped.get(key)
+                if entry is None:
+                    entry = grouped[key] = {
+                        'item_id': row['item_id'],
+                        'item_name': row['item_name'],
+                        'project_number': row['project_number'],
+                        'sub_project_number': row.get('sub_project_number'),
+                        'users': []
+                    }
+                    duplicates_by_bundle[row['bundle_id']].append(entry)
+                entry['users'].append({
+                    'user_id': row['user_id'],
+                    'full_name': row.get('full_name', f"User {row['user_id']}"),
+                    'quantity': row['quantity']
+                })
+        return dict(duplicates_by_bundle)
     
     def update_bundle_item_user_quantity(self, bundle_id, item_id, user_id, new_quantity):
         """
@@ -362,6 +556,7 @@ class DatabaseConnector:
                 self.execute_insert(delete_bundle_query, (bundle_id, item_id))
             
             self.conn.commit()
+            self._invalidate_bundle_duplicates(bundle_id)
             
             return {
                 'success': True,
@@ -408,6 +603,23 @@ class DatabaseConnector:
         """
         return self.execute_query(query, (item_id, exclude_vendor_id))
     
+    def get_active_bundles_by_vendor(self):
+        """
+        Latest ACTIVE or REVIEWED bundle per vendor in one query: {vendor_id: bundle}
+        (same rows get_active_bundle_for_vendor returns, without a query per vendor)
+        """
+        query = """
+        SELECT bundle_id, bundle_name, total_items, total_quantity, status, recommended_vendor_id
+        FROM requirements_bundles
+        WHERE recommended_vendor_id IS NOT NULL
+          AND status IN ('Active', 'Reviewed')
+        ORDER BY bundle_id DESC
+        """
+        bundles = {}
+        for bundle in self.execute_query(query):
+            bundles.setdefault(bundle['recommended_vendor_id'], bundle)
+        return bundles
+    
     def get_active_bundle_for_vendor(self, vendor_id):
         """Check if vendor already has an ACTIVE or REVIEWED bundle (not Approved - those are locked)"""
         query = """
@@ -448,6 +660,8 @@ class DatabaseConnector:
             }
         """
         try:
+            from datetime import datetime
+            
             # Step 1: Get current bundle status
             bundle_query = """
             SELECT status, bundle_name 
@@ -465,8 +679,6 @@ class DatabaseConnector:
             bundle = bundle_result[0]
             original_status = bundle['status']
             status_changed = False
-            items_added = 0
-            items_updated = 0
             
             # Step 2: If Reviewed, revert to Active
             if original_status == 'Reviewed':
@@ -480,90 +692,77 @@ class DatabaseConnector:
                 status_changed = True
                 print(f"[MERGE] Bundle {bundle_id} reverted from Reviewed to Active")
             
-            # Step 3: Process each item
+            # Step 3: Load the bundle's current items once and merge breakdowns in memory
+            existing_query = """
+            SELECT item_id, total_quantity, user_breakdown 
+            FROM requirements_bundle_items 
+            WHERE bundle_id = ?
+            """
+            bundle_items = {}
+            for row in self.execute_query_rows(existing_query, (bundle_id,)):
+                try:
+                    breakdown = json.loads(row.user_breakdown) if row.user_breakdown else {}
+                except Exception:
+                    breakdown = {}
+                bundle_items[row.item_id] = {
+                    'total_quantity': row.total_quantity or 0,
+                    'user_breakdown': breakdown
+                }
+            
+            updated_ids = []
+            added_ids = []
             for item in new_items:
                 item_id = item['item_id']
-                new_quantity = item['quantity']
-                new_breakdown = item['user_breakdown']
-                
-                # Check if item already exists in bundle
-                check_query = """
-                SELECT total_quantity, user_breakdown 
-                FROM requirements_bundle_items 
-                WHERE bundle_id = ? AND item_id = ?
-                """
-                existing = self.execute_query(check_query, (bundle_id, item_id))
                 
-                if existing and len(existing) > 0:
+                if item_id in bundle_items:
                     # UPDATE existing item - merge user breakdowns
-                    old_quantity = existing[0]['total_quantity']
-                    old_breakdown_str = existing[0]['user_breakdown']
-                    
-                    # Parse existing breakdown
-                    try:
-                        old_breakdown = json.loads(old_breakdown_str) if old_breakdown_str else {}
-                    except:
-                        old_breakdown = {}
-                    
-                    # Merge user breakdowns
-                    merged_breakdown = old_breakdown.copy()
-                    for user_id, qty in new_breakdown.items():
+                    merged_breakdown = bundle_items[item_id]['user_breakdown']
+                    for user_id, qty in item['user_breakdown'].items():
                         user_id_str = str(user_id)  # Ensure string key
                         merged_breakdown[user_id_str] = merged_breakdown.get(user_id_str, 0) + qty
                     
-                    # Calculate new total
-                    new_total = sum(merged_breakdown.values())
-                    
-                    # Update the item
-                    update_query = """
-                    UPDATE requirements_bundle_items 
-                    SET total_quantity = ?,
-                        user_breakdown = ?
-                    WHERE bundle_id = ? AND item_id = ?
-                    """
-                    self.execute_insert(update_query, (
-                        new_total,
-                        json.dumps(merged_breakdown),
-                        bundle_id,
-                        item_id
-                    ))
-                    
-                    items_updated += 1
-                    print(f"[MERGE] Updated item {item_id}: {old_quantity} → {new_total} pcs")
-                    
+                    old_quantity = bundle_items[item_id]['total_quantity']
+                    bundle_items[item_id]['total_quantity'] = sum(merged_breakdown.values())
+                    if item_id not in added_ids and item_id not in updated_ids:
+                        updated_ids.append(item_id)
+                    print(f"[MERGE] Updated item {item_id}: {old_quantity} → {bundle_items[item_id]['total_quantity']} pcs")
                 else:
-                    # INSERT new item
-                    insert_query = """
-                    INSERT INTO requirements_bundle_items 
-                    (bundle_id, item_id, total_quantity, user_breakdown)
-                    VALUES (?, ?, ?, ?)
-                    """
-                    
-                    # Ensure user_breakdown keys are strings
-                    breakdown_str_keys = {str(k): v for k, v in new_breakdown.items()}
-                    
-                    self.execute_insert(insert_query, (
-                        bundle_id,
-                        item_id,
-                        new_quantity,
-                        json.dumps(breakdown_str_keys)
-                    ))
-                    
-                    items_added += 1
-                    print(f"[MERGE] Added new item {item_id}: {new_quantity} pcs")
-            
-            # Step 4: Recalculate bundle totals
-            totals_query = """
-            SELECT 
-                COUNT(*) as item_count, 
-                SUM(total_quantity) as total_qty
-            FROM requirements_bundle_items
-            WHERE bundle_id = ?
+                    # INSERT new item - ensure user_breakdown keys are strings
+                    bundle_items[item_id] = {
+                        'total_quantity': item['quantity'],
+                        'user_breakdown': {str(k): v for k, v in item['user_breakdown'].items()}
+                    }
+                    added_ids.append(item_id)
+                    print(f"[MERGE] Added new item {item_id}: {item['quantity']} pcs")
+            
+            items_added = len(added_ids)
+            items_updated = len(updated_ids)
+            
+            # Step 4: Write all item changes in two batched statements
+            update_query = """
+            UPDATE requirements_bundle_items 
+            SET total_quantity = ?,
+                user_breakdown = ?
+            WHERE bundle_id = ? AND item_id = ?
+            """
+            self.execute_many(update_query, [
+                (bundle_items[item_id]['total_quantity'], json.dumps(bundle_items[item_id]['user_breakdown']), bundle_id, item_id)
+                for item_id in updated_ids
+            ])
+            
+            insert_query = """
+            INSERT INTO requirements_bundle_items 
+            (bundle_id, item_id, total_quantity, user_breakdown)
+            VALUES (?, ?, ?, ?)
             """
-            totals = self.execute_query(totals_query, (bundle_id,))[0]
+            self.execute_many(insert_query, [
+                (bundle_id, item_id, bundle_items[item_id]['total_quantity'], json.dumps(bundle_items[item_id]['user_breakdown']))
+                for item_id in added_ids
+            ])
             
-            total_items = totals['item_count'] or 0
-            total_quantity = totals['total_qty'] or 0
+            # Bundle totals come from the merged in-memory view (no re-read needed)
+            total_items = len(bundle_items)
+            total_quantity = sum(data['total_quantity'] for data in bundle_items.values())
             
             # Step 5: Update bundle metadata with merge info
             timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
@@ -597,30 +796,31 @@ class DatabaseConnector:
             print(f"[MERGE] Updated bundle totals: {total_items} items, {total_quantity} pieces")
             print(f"[MERGE] Bundle renamed: {bundle['bundle_name']} → {new_bundle_name}")
             
-            # Step 6: Link new requests to bundle
-            requests_linked = 0
+            # Step 6: Link new requests to bundle (one lookup, one batched insert)
+            linked_query = """
+            SELECT req_id 
+            FROM requirements_bundle_mapping 
+            WHERE bundle_id = ?
+            """
+            already_linked = {row.req_id for row in self.execute_query_rows(linked_query, (bundle_id,))}
+            new_req_ids = []
             for req_id in request_ids:
-                # Check if already linked
-                check_mapping = """
-                SELECT COUNT(*) as count 
-                FROM requirements_bundle_mapping 
-                WHERE bundle_id = ? AND req_id = ?
-                """
-                exists = self.execute_query(check_mapping, (bundle_id, req_id))
-                
-                if exists and exists[0]['count'] == 0:
-                    # Link request to bundle
-                    insert_mapping = """
-                    INSERT INTO requirements_bundle_mapping (bundle_id, req_id)
-                    VALUES (?, ?)
-                    """
-                    self.execute_insert(insert_mapping, (bundle_id, req_id))
-                    requests_linked += 1
+                if req_id not in already_linked:
+                    already_linked.add(req_id)
+                    new_req_ids.append(req_id)
+            
+            insert_mapping = """
+            INSERT INTO requirements_bundle_mapping (bundle_id, req_id)
+            VALUES (?, ?)
+            """
+            self.execute_many(insert_mapping, [(bundle_id, req_id) for req_id in new_req_ids])
+            requests_linked = len(new_req_ids)
             
             print(f"[MERGE] Linked {requests_linked} new requests to bundle")
             
             # Commit transaction
             self.conn.commit()
+            self._invalidate_bundle_duplicates(bundle_id)
             
             # Build success message
             message = f"Merged {items_added} new items and updated {items_updated} existing items"
@@ -658,7 +858,111 @@ class DatabaseConnector:
         ORDER BY b.bundle_id
         """
         return self.execute_query(query, (req_id,))
+
+    def complete_requests_for_bundle(self, bundle_id):
+        """
+        Mark Completed every request in this bundle whose bundles are now all Completed, in one
+        set-based UPDATE (runs in the caller's transaction, no commit).
+        Returns the req_ids that changed to Completed (for the 'completed' notifications).
+        """
+        query = """
+        UPDATE requirements_orders
+        SET status = 'Completed'
+        OUTPUT inserted.req_id
+        WHERE req_id IN (
+                SELECT req_id FROM requirements_bundle_mapping WHERE bundle_id = ?
+            )
+          AND status <> 'Completed'
+          AND NOT EXISTS (
+                SELECT 1
+                FROM requirements_bundle_mapping m
+                JOIN requirements_bundles b ON b.bundle_id = m.bundle_id
+                WHERE m.req_id = requirements_orders.req_id
+                  AND ISNULL(b.status, '') <> 'Completed'
+            )
+        """
+        self.cursor.execute(query, (bundle_id,))
+        return sorted(row[0] for row in self.cursor.fetchall())
+    
+    def order_requests_for_bundle(self, bundle_id):
+        """
+        Mark Ordered every request in this bundle whose bundles are now all Ordered or Completed,
+        in one set-based UPDATE (runs in the caller's transaction, no commit).
+        Returns the req_ids that changed to Ordered (for the 'ordered' notifications).
+        """
+        query = """
+        UPDATE requirements_orders
+        SET status = 'Ordered'
+        OUTPUT inserted.req_id
+        WHERE req_id IN (
+                SELECT req_id FROM requirements_bundle_mapping WHERE bundle_id = ?
+            )
+          AND ISNULL(status, '') NOT IN ('Ordered', 'Completed')
+          AND NOT EXISTS (
+                SELECT 1
+                FROM requirements_bundle_mapping m
+                JOIN requirements_bundles b ON b.bundle_id = m.bundle_id
+                WHERE m.req_id = requirements_orders.req_id
+                  AND ISNULL(b.status, '') NOT IN ('Ordered', 'Completed')
+            )
+        """
+        self.cursor.execute(query, (bundle_id,))
+        return sorted(row[0] for row in self.cursor.fetchall())
+    
+    def upsert_vendor_costs(self, vendor_id, item_costs, updated_at):
+        """
+        Set ItemVendorMap.cost for many items of one vendor: one lookup of the existing
+        mappings, then one batched UPDATE and one batched INSERT (no commit).
+        item_costs: dict {item_id: cost}
+        """
+        if not item_costs:
+            return
+        
+        existing = set()
+        item_ids = list(item_costs)
+        for start in range(0, len(item_ids), 1000):
+            chunk = item_ids[start:start + 1000]
+            placeholders = ','.join('?' for _ in chunk)
+            self.cursor.execute(
+                f"SELECT item_id FROM ItemVendorMap WHERE vendor_id = ? AND item_id IN ({placeholders})",
+                [vendor_id] + chunk
+            )
+            existing.update(row[0] for row in self.cursor.fetchall())
+        
+        self.execute_many("""
+            UPDATE ItemVendorMap
+            SET cost = ?,
+                last_cost_update = ?
+            WHERE item_id = ? AND vendor_id = ?
+        """, [(cost, updated_at, item_id, vendor_id)
+              for item_id, cost in item_costs.items() if item_id in existing])
+        
+        self.execute_many("""
+            INSERT INTO ItemVendorMap (item_id, vendor_id, cost, last_cost_update)
+            VALUES (?, ?, ?, ?)
+        """, [(item_id, vendor_id, cost, updated_at)
+              for item_id, cost in item_costs.items() if item_id not in existing])
     
+    def get_bundles_for_requests(self, req_ids):
+        """Bundles for many requests in one query: {req_id: [bundle, ...]} (same columns as get_bundles_for_request)"""
+        req_ids = list(dict.fromkeys(req_ids))
+        bundles_by_request = {req_id: [] for req_id in req_ids}
+        for start in range(0, len(req_ids), 1000):
+            chunk = req_ids[start:start + 1000]
+            placeholders = ','.join('?' for _ in chunk)
+            query = f"""
+            SELECT rbm.req_id, b.bundle_id, b.bundle_name, b.status, b.recommended_vendor_id,
+                   b.po_number, b.po_date, b.expected_delivery_date,
+                   b.packing_slip_code, b.actual_delivery_date
+            FROM requirements_bundles b
+            JOIN requirements_bundle_mapping rbm ON b.bundle_id = rbm.bundle_id
+            WHERE rbm.req_id IN ({placeholders})
+            ORDER BY rbm.req_id, b.bundle_id
+            """
+            for row in self.execute_query(query, tuple(chunk)):
+                bundles_by_request[row.pop('req_id')].append(row)
+        return bundles_by_request
+
     def get_bundle_requests_with_notes(self, bundle_id):
         """Get all requests in this bundle with their notes"""
         query = """
@@ -876,6 +1180,7 @@ class DatabaseConnector:
                 message += " (Original bundle was empty and removed)"
             
             self.conn.commit()
+            self._invalidate_bundle_duplicates(current_bundle_id, target_bundle_id)
             
             return {
                 'success': True,
@@ -946,80 +1251,18 @@ class DatabaseConnector:
             """
             self.execute_insert(update_bundle_query, (po_number, datetime.now(), expected_delivery_date, bundle_id))
             
-            # Step 3: Update costs in ItemVendorMap
-            for item_id, cost in item_costs.items():
-                # Check if mapping exists
-                check_query = """
-                SELECT map_id FROM ItemVendorMap 
-                WHERE item_id = ? AND vendor_id = ?
-                """
-                existing = self.execute_query(check_query, (item_id, vendor_id))
-                
-                if existing:
-                    # Update existing
-                    update_cost_query = """
-                    UPDATE ItemVendorMap
-                    SET cost = ?,
-                        last_cost_update = ?
-                    WHERE item_id = ? AND vendor_id = ?
-                    """
-                    self.execute_insert(update_cost_query, (cost, datetime.now(), item_id, vendor_id))
-                else:
-                    # Insert new mapping
-                    insert_cost_query = """
-                    INSERT INTO ItemVendorMap (item_id, vendor_id, cost, last_cost_update)
-                    VALUES (?, ?, ?, ?)
-                    """
-                    self.execute_insert(insert_cost_query, (item_id, vendor_id, cost, datetime.now()))
+            # Step 3: Update costs in ItemVendorMap (batched upsert)
+            self.upsert_vendor_costs(vendor_id, item_costs, datetime.now())
             
-            # Step 4: Update request status if all bundles are ordered
-            # Get all requests linked to this bundle
-            requests_query = """
-            SELECT DISTINCT req_id 
-            FROM requirements_bundle_mapping 
-            WHERE bundle_id = ?
-            """
-            requests = self.execute_query(requests_query, (bundle_id,))
+            # Step 4: Requests whose bundles are now ALL ordered/completed -> Ordered (one set-based UPDATE)
+            ordered_req_ids = self.order_requests_for_bundle(bundle_id)
             
-            for req in requests:
-                req_id = req['req_id']
-                
-                # Get all bundles for this request
-                all_bundles = self.get_bundles_for_request(req_id)
-                
-                # Check if ALL bundles are ordered or completed
-                all_ordered = all(b['status'] in ('Ordered', 'Completed') for b in all_bundles)
-                
-                if all_ordered:
-                    # All bundles ordered - update request status
-                    update_request_query = """
-                    UPDATE requirements_orders
-                    SET status = 'Ordered'
-                    WHERE req_id = ?
-                    """
-                    self.execute_insert(update_request_query, (req_id,))
-                    
-                    # Send email notification to user with ALL bundles data
-                    try:
-                        from user_notifications import send_user_notification
-                        # Get all ordered bundles with their details
-                        bundles_data = []
-                        for bundle in all_bundles:
-                            if bundle['status'] in ('Ordered', 'Completed'):
-                                bundles_data.append({
-                                    'bundle_id': bundle['bundle_id'],
-                                    'vendor_id': bundle['recommended_vendor_id'],
-                                    'po_number': bundle.get('po_number'),
-                                    'po_date': bundle.get('po_date'),
-                                    'expected_delivery_date': bundle.get('expected_delivery_date')
-                                })
-                        
-                        send_user_notification(self, req_id, 'ordered', {'bundles': bundles_data})
-                    except Exception as email_error:
-                        # Don't fail the whole operation if email fails
-                        print(f"[WARNING] Failed to send email notification: {str(email_error)}")
+            # Queue the 'ordered' emails in this transaction - sent after commit
+            notifications = enqueue_user_notifications(self, ordered_req_ids, 'ordered')
             
             self.conn.commit()
+            touch_reference_tables(self, 'ItemVendorMap')
+            deliver_notifications(self, notifications)
             
             return {
                 'success': True,
@@ -1055,13 +1298,8 @@ class DatabaseConnector:
         return self.execute_query(query, (bundle_id,))
     
     def get_all_projects(self):
-        """Get all projects from ProcoreProjectData for dropdown selection"""
-        query = """
-        SELECT ProjectNumber, ProjectName, ProjectType, ProjectManager, Customer
-        FROM ProcoreProjectData
-        ORDER BY ProjectName
-        """
-        return self.execute_query(query)
+        """Get all projects from ProcoreProjectData for dropdown selection (app-wide reference cache)"""
+        return list(get_reference_data(self, 'projects'))
     
     def get_request_items(self, req_id):
         """Get items for a specific request"""
@@ -1353,6 +1591,71 @@ class DatabaseConnector:
         """
         return self.execute_query(query)
     
+    def get_pending_requests_since(self, last_req_id, lookback_minutes=None):
+        """
+        Pending request lines newer than the bundling high-water mark (incremental bundling).
+        Also returns Pending lines created in the last lookback_minutes: IDENTITY values are
+        handed out at insert, so a lower req_id can commit after a higher one was bundled.
+        """
+        if lookback_minutes is None:
+            lookback_minutes = BUNDLING_LOOKBACK_MINUTES
+        query = """
+        SELECT ro.req_id, ro.req_number, ro.user_id, ro.req_date, ro.total_items,
+               roi.item_id, roi.quantity, roi.project_number, roi.parent_project_id, roi.sub_project_number, roi.date_needed,
+               i.item_name, i.sku, i.source_sheet,
+               u.full_name, u.username
+        FROM requirements_orders ro
+        JOIN requirements_order_items roi ON ro.req_id = roi.req_id
+        JOIN items i ON roi.item_id = i.item_id
+        LEFT JOIN requirements_users u ON ro.user_id = u.user_id
+        WHERE ro.status = 'Pending'
+          AND (ro.req_id > ? OR ro.created_at >= DATEADD(minute, -?, GETDATE()))
+        ORDER BY ro.req_date ASC
+        """
+        return self.execute_query(query, (last_req_id or 0, int(lookback_minutes)))
+    
+    def get_bundling_watermark(self, state_key='smart_bundling'):
+        """Last req_id / req_date folded into bundles ({'last_req_id': 0, ...} before the first run)"""
+        query = """
+        SELECT last_req_id, last_req_date, updated_at
+        FROM requirements_bundling_state
+        WHERE state_key = ?
+        """
+        results = self.execute_query(query, (state_key,))
+        if results:
+            return results[0]
+        return {'last_req_id': 0, 'last_req_date': None, 'updated_at': None}
+    
+    def set_bundling_watermark(self, last_req_id, last_req_date=None, state_key='smart_bundling'):
+        """Advance the bundling high-water mark (never moves it backwards)"""
+        try:
+            update_query = """
+            UPDATE requirements_bundling_state
+            SET last_req_id = ?, last_req_date = ?, updated_at = GETDATE()
+            WHERE state_key = ? AND last_req_id < ?
+            """
+            self.execute_insert(update_query, (last_req_id, last_req_date, state_key, last_req_id))
+            
+            if self.cursor.rowcount == 0:
+                exists = self.execute_query(
+                    "SELECT 1 AS found FROM requirements_bundling_state WHERE state_key = ?", (state_key,)
+                )
+                if not exists:
+                    insert_query = """
+                    INSERT INTO requirements_bundling_state (state_key, last_req_id, last_req_date)
+                    VALUES (?, ?, ?)
+                    """
+                    self.execute_insert(insert_query, (state_key, last_req_id, last_req_date))
+            
+            self.conn.commit()
+            return True
+            
+        except Exception as e:
+            if self.conn:
+                self.conn.rollback()
+            print(f"Error updating bundling watermark: {str(e)}")
+            return False
+    
     def update_requests_to_in_progress(self, req_ids):
         """Update multiple requests status to In Progress"""
         try:
@@ -1368,16 +1671,11 @@ class DatabaseConnector:
             """
             
             self.execute_insert(query, req_ids)
+            notifications = enqueue_user_notifications(self, req_ids, 'in_progress')
             self.conn.commit()
             
-            # Send email notifications to users
-            try:
-                from user_notifications import send_user_notification
-                for req_id in req_ids:
-                    send_user_notification(self, req_id, 'in_progress')
-            except Exception as email_error:
-                # Don't fail the whole operation if email fails
-                print(f"[WARNING] Failed to send email notification: {str(email_error)}")
+            # Emails go out after commit (background outbox drain, or inline without the outbox table)
+            deliver_notifications(self, notifications)
             
             return True
             
@@ -1386,78 +1684,105 @@ class DatabaseConnector:
                 self.conn.rollback()
             raise Exception(f"Failed to update request status: {str(e)}")
     
+    def get_table_columns(self, table_name):
+        """
+        Column names of a table, introspected once per process and backend.
+        Avoids an INFORMATION_SCHEMA round trip on every bundle insert.
+        """
+        cache_key = (getattr(self.backend, 'dialect', None), table_name.lower())
+        columns = _table_columns_cache.get(cache_key)
+        if columns is not None:
+            return columns
+        
+        if cache_key[0] == 'sqlite':
+            rows = self.execute_query_rows(f"PRAGMA table_info({table_name})")
+            columns = tuple(row.name for row in rows)
+        else:
+            rows = self.execute_query_rows("""
+            SELECT COLUMN_NAME 
+            FROM INFORMATION_SCHEMA.COLUMNS 
+            WHERE TABLE_NAME = ?
+            ORDER BY ORDINAL_POSITION
+            """, (table_name,))
+            columns = tuple(row.COLUMN_NAME for row in rows)
+        
+        if columns:
+            print(f"Available columns in {table_name}: {list(columns)}")
+            _table_columns_cache[cache_key] = columns
+        return columns
+    
+    def _insert_returning_id(self, table_name, columns, values, id_column):
+        """INSERT one row and return its identity in the same round trip (OUTPUT INSERTED / RETURNING)"""
+        column_list = ', '.join(columns)
+        placeholders = ', '.join('?' for _ in columns)
+        if getattr(self.backend, 'dialect', None) == 'sqlite':
+            query = f"INSERT INTO {table_name} ({column_list}) VALUES ({placeholders}) RETURNING {id_column}"
+        else:
+            query = f"INSERT INTO {table_name} ({column_list}) OUTPUT INSERTED.{id_column} VALUES ({placeholders})"
+        
+        self.cursor.execute(query, tuple(values))
+        row = self.cursor.fetchone()
+        return row[0] if row else None
+    
+    def _insert_bundle(self, bundle_data):
+        """Insert one bundle with its items and request mappings (no commit)"""
+        bundle_name = f"BUNDLE-{bundle_data['timestamp']}"
+        total_items = len(bundle_data['items'])
+        total_quantity = sum(item['quantity'] for item in bundle_data['items'])
+        
+        # Get the recommended vendor ID from the bundle data
+        recommended_vendor_id = None
+        if bundle_data.get('vendor_recommendations') and len(bundle_data['vendor_recommendations']) > 0:
+            recommended_vendor_id = bundle_data['vendor_recommendations'][0].get('vendor_id')
+        
+        bundle_id = self._insert_returning_id(
+            'requirements_bundles',
+            ('bundle_name', 'status', 'total_items', 'total_quantity', 'recommended_vendor_id'),
+            (bundle_name, 'Active', total_items, total_quantity, recommended_vendor_id),
+            'bundle_id'
+        )
+        
+        if not bundle_id:
+            raise Exception("Failed to get bundle ID")
+        
+        # Bundle items - one batch
+        item_columns = ['bundle_id', 'item_id', 'total_quantity', 'user_breakdown']
+        include_size = 'size_details' in self.get_table_columns('requirements_bundle_items') and \
+            any(item.get('size_details') for item in bundle_data['items'])
+        if include_size:
+            item_columns.append('size_details')
+        
+        item_rows = []
+        for item in bundle_data['items']:
+            row = [
+                bundle_id,
+                item['item_id'],
+                item['quantity'],
+                json.dumps(item['user_breakdown'], ensure_ascii=True)
+            ]
+            if include_size:
+                row.append(item.get('size_details'))
+            item_rows.append(row)
+        
+        self.execute_many(f"""
+        INSERT INTO requirements_bundle_items 
+        ({', '.join(item_columns)})
+        VALUES ({', '.join('?' for _ in item_columns)})
+        """, item_rows)
+        
+        # Bundle-request mappings - one batch
+        self.execute_many("""
+        INSERT INTO requirements_bundle_mapping 
+        (bundle_id, req_id)
+        VALUES (?, ?)
+        """, [(bundle_id, req_id) for req_id in dict.fromkeys(bundle_data['request_ids'])])
+        
+        return bundle_id
+    
     def create_bundle(self, bundle_data):
         """Create a new bundle in the database"""
         try:
-            # First, let's check what columns exist in requirements_bundles table
-            check_columns_query = """
-            SELECT COLUMN_NAME 
-            FROM INFORMATION_SCHEMA.COLUMNS 
-            WHERE TABLE_NAME = 'requirements_bundles'
-            """
-            columns_result = self.execute_query(check_columns_query)
-            available_columns = [col['COLUMN_NAME'] for col in columns_result] if columns_result else []
-            print(f"Available columns in requirements_bundles: {available_columns}")
-            
-            # Insert main bundle record with available columns including recommended_vendor_id
-            bundle_query = """
-            INSERT INTO requirements_bundles 
-            (bundle_name, status, total_items, total_quantity, recommended_vendor_id)
-            VALUES (?, 'Active', ?, ?, ?)
-            """
-            
-            bundle_name = f"BUNDLE-{bundle_data['timestamp']}"
-            total_items = len(bundle_data['items'])
-            total_quantity = sum(item['quantity'] for item in bundle_data['items'])
-            
-            # Get the recommended vendor ID from the bundle data
-            recommended_vendor_id = None
-            if bundle_data.get('vendor_recommendations') and len(bundle_data['vendor_recommendations']) > 0:
-                recommended_vendor_id = bundle_data['vendor_recommendations'][0].get('vendor_id')
-            
-            self.execute_insert(bundle_query, (bundle_name, total_items, total_quantity, recommended_vendor_id))
-            
-            # Get the inserted bundle ID
-            bundle_id = self.get_last_insert_id()
-            
-            if not bundle_id:
-                raise Exception("Failed to get bundle ID")
-            
-            # Check bundle items table structure
-            check_items_columns_query = """
-            SELECT COLUMN_NAME 
-            FROM INFORMATION_SCHEMA.COLUMNS 
-            WHERE TABLE_NAME = 'requirements_bundle_items'
-            """
-            items_columns_result = self.execute_query(check_items_columns_query)
-            available_items_columns = [col['COLUMN_NAME'] for col in items_columns_result] if items_columns_result else []
-            print(f"Available columns in requirements_bundle_items: {available_items_columns}")
-            
-            # Insert bundle items with available columns
-            for item in bundle_data['items']:
-                item_query = """
-                INSERT INTO requirements_bundle_items 
-                (bundle_id, item_id, total_quantity, user_breakdown)
-                VALUES (?, ?, ?, ?)
-                """
-                
-                user_breakdown = json.dumps(item['user_breakdown'], ensure_ascii=True)
-                self.execute_insert(item_query, (
-                    bundle_id,
-                    item['item_id'],
-                    item['quantity'],
-                    user_breakdown
-                ))
-            
-            # Insert bundle-request mappings
-            for req_id in bundle_data['request_ids']:
-                mapping_query = """
-                INSERT INTO requirements_bundle_mapping 
-                (bundle_id, req_id)
-                VALUES (?, ?)
-                """
-                self.execute_insert(mapping_query, (bundle_id, req_id))
-            
+            bundle_id = self._insert_bundle(bundle_data)
             self.conn.commit()
             return bundle_id
             
@@ -1466,29 +1791,38 @@ class DatabaseConnector:
                 self.conn.rollback()
             raise Exception(f"Failed to create bundle: {str(e)}")
     
+    def create_bundles(self, bundles_data):
+        """
+        Create several bundles in a single transaction (all or nothing).
+        Used by the bundling cron so one run commits once instead of once per vendor.
+        
+        Returns:
+            list: Created bundle IDs, in the same order as bundles_data
+        """
+        if not bundles_data:
+            return []
+        
+        try:
+            bundle_ids = [self._insert_bundle(bundle_data) for bundle_data in bundles_data]
+            self.conn.commit()
+            return bundle_ids
+            
+        except Exception as e:
+            if self.conn:
+                self.conn.rollback()
+            raise Exception(f"Failed to create bundles: {str(e)}")
+    
     def get_item_vendors(self, item_ids):
-        """Get vendors for specific items using Phase 2's item_vendor_mapping"""
+        """Get vendors for specific items using Phase 2's item_vendor_mapping (app-wide reference cache)"""
         try:
             if not item_ids:
                 print("No item IDs provided to get_item_vendors")
                 return []
             
-            print(f"Looking up vendors for item IDs: {item_ids}")
-            
-            placeholders = ','.join(['?' for _ in item_ids])
-            query = f"""
-            SELECT ivm.item_id, ivm.vendor_id, v.vendor_name, v.vendor_email as contact_email, 
-                   v.vendor_phone as contact_phone, i.item_name
-            FROM ItemVendorMap ivm
-            JOIN Vendors v ON ivm.vendor_id = v.vendor_id
-            JOIN Items i ON ivm.item_id = i.item_id
-            WHERE ivm.item_id IN ({placeholders})
-            ORDER BY ivm.item_id, v.vendor_name
-            """
-            
-            print(f"Executing vendor query: {query}")
-            result = self.execute_query(query, item_ids)
-            print(f"Vendor query returned {len(result) if result else 0} results")
+            # Rows are ordered by item_id, vendor_name like the old per-call query
+            wanted = set(item_ids)
+            result = [row for row in get_reference_data(self, 'item_vendors') if row['item_id'] in wanted]
+            print(f"Vendor query returned {len(result)} results")
             
             return result
             
@@ -1548,11 +1882,27 @@ class DatabaseConnector:
             return False, self.connection_error or "No connection", error_details, {"error": self.connection_error}
     
     def close_connection(self):
-        """Close database connection"""
-        if self.cursor:
-            self.cursor.close()
-        if self.conn:
-            self.conn.close()
+        """Return the connection to the backend pool (safe to call more than once)"""
+        conn, self.conn = self.conn, None
+        cursor, self.cursor = self.cursor, None
+        if cursor:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        if conn:
+            if self.backend:
+                self.backend.release(conn)
+            else:
+                conn.close()
+    
+    def __del__(self):
+        # Streamlit reruns can exit via st.stop()/st.rerun() before close_connection() runs;
+        # make sure the pooled connection still goes back when the connector is dropped
+        try:
+            self.close_connection()
+        except Exception:
+            pass
 
     # ------------------------------
     # Admin: requirements_users CRUD
@@ -1587,6 +1937,7 @@ class DatabaseConnector:
             """
             self.execute_insert(query, (username, password, full_name, email, department, user_role, is_active))
             self.conn.commit()
+            invalidate_recipient_directory()
             return {"success": True}
         except Exception as e:
             if self.conn:
@@ -1602,6 +1953,7 @@ class DatabaseConnector:
             """
             self.execute_insert(query, (full_name, email, department, user_id))
             self.conn.commit()
+            invalidate_recipient_directory()
             return True
         except Exception:
             if self.conn:
@@ -1615,6 +1967,7 @@ class DatabaseConnector:
             """
             self.execute_insert(query, (role, user_id))
             self.conn.commit()
+            invalidate_recipient_directory()
             return True
         except Exception:
             if self.conn:
@@ -1628,6 +1981,7 @@ class DatabaseConnector:
             """
             self.execute_insert(query, (1 if is_active else 0, user_id))
             self.conn.commit()
+            invalidate_recipient_directory()
             return True
         except Exception:
             if self.conn:
@@ -1655,6 +2009,7 @@ class DatabaseConnector:
             """
             self.execute_insert(query, (user_id,))
             self.conn.commit()
+            invalidate_recipient_directory()
             return True
         except Exception:
             if self.conn:
@@ -1684,15 +2039,11 @@ class DatabaseConnector:
             # Log to history with actual reviewer name
             self.log_bundle_action(bundle_id, 'Reviewed', reviewer_name)
             
-            self.conn.commit()
+            # Operation Team notification is queued with the status change, sent after commit
+            notifications = enqueue_bundle_notification(self, bundle_id, 'bundle_reviewed')
             
-            # Send notification to Operation Team
-            try:
-                from operation_team_notifications import send_bundle_reviewed_notification
-                send_bundle_reviewed_notification(self, bundle_id)
-            except Exception as notify_error:
-                # Don't fail the whole operation if notification fails
-                print(f"Warning: Failed to send Operation Team notification: {str(notify_error)}")
+            self.conn.commit()
+            deliver_notifications(self, notifications)
             
             return True
         except Exception as e:
@@ -1796,14 +2147,11 @@ class DatabaseConnector:
             # Log to history with actual username
             self.log_bundle_action(bundle_id, 'Approved', username)
             
-            self.conn.commit()
+            # Operator notification is queued with the status change, sent after commit
+            notifications = enqueue_bundle_notification(self, bundle_id, 'bundle_approved')
             
-            # Send notification to operator
-            try:
-                from operator_notifications import send_bundle_approved_notification
-                send_bundle_approved_notification(self, bundle_id)
-            except Exception as notify_error:
-                print(f"Warning: Failed to send operator notification: {str(notify_error)}")
+            self.conn.commit()
+            deliver_notifications(self, notifications)
             
             return {'success': True}
         except Exception as e:
@@ -1844,14 +2192,11 @@ class DatabaseConnector:
             # Log to history with rejection reason and actual username
             self.log_bundle_action(bundle_id, 'Rejected', username, rejection_reason)
             
-            self.conn.commit()
+            # Operator notification is queued with the status change, sent after commit
+            notifications = enqueue_bundle_notification(self, bundle_id, 'bundle_rejected')
             
-            # Send notification to operator
-            try:
-                from operator_notifications import send_bundle_rejected_notification
-                send_bundle_rejected_notification(self, bundle_id)
-            except Exception as notify_error:
-                print(f"Warning: Failed to send operator notification: {str(notify_error)}")
+            self.conn.commit()
+            deliver_notifications(self, notifications)
             
             return {'success': True}
         except Exception as e:
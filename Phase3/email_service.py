@@ -14,11 +14,23 @@ Required envs (in GitHub Actions -> repository secrets):
 Optional envs:
   EMAIL_CC                  (comma-separated list)
   EMAIL_REPLY_TO
+  EMAIL_MAX_RETRIES         (default 3 - retries for transient SMTP failures)
+  EMAIL_RETRY_BACKOFF       (default 1.0 - seconds, doubled on every retry)
+  EMAIL_MAX_PER_RUN         (default 0 = unlimited - messages per BatchMailer session)
+  EMAIL_RATE_PER_SECOND     (default 0 = unlimited - send throttle)
+  BREVO_SMTP_STARTTLS       (default 1 - set 0 only for a local SMTP stand-in)
+
+Bulk senders should wrap their loop in `with batch_mailer():` - every
+send_email_via_brevo call inside the block (same thread) reuses one SMTP
+session instead of connecting, STARTTLS-ing and logging in per message.
 """
 from __future__ import annotations
 import os
+import time
 import smtplib
 import logging
+import threading
+from contextlib import contextmanager
 from typing import Optional
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -60,55 +72,44 @@ def _env_configured() -> bool:
     return True
 
 
-def send_email_via_brevo(subject: str, body_text: str, html_body: Optional[str] = None, recipients: Optional[list] = None) -> bool:
-    """
-    Send email via Brevo SMTP.
-    
-    Args:
-        subject: Email subject
-        body_text: Plain text body
-        html_body: HTML body (optional)
-        recipients: List of recipient emails (optional). If not provided, uses EMAIL_RECIPIENTS from secrets.
-    
-    Returns:
-        True on success, False on failure
-    """
-    server = _get_env('BREVO_SMTP_SERVER')
-    port_str = _get_env('BREVO_SMTP_PORT', '587')
-    login = _get_env('BREVO_SMTP_LOGIN')
-    password = _get_env('BREVO_SMTP_PASSWORD')
-    sender = _get_env('EMAIL_SENDER')
-    sender_name = _get_env('EMAIL_SENDER_NAME', 'Procurement Bot')
-    
-    # Use provided recipients or fall back to EMAIL_RECIPIENTS from secrets
-    if recipients:
-        recipients_list = recipients if isinstance(recipients, list) else [recipients]
-    else:
-        recipients_str = _get_env('EMAIL_RECIPIENTS')
-        if not recipients_str:
-            logger.info("No recipients provided and EMAIL_RECIPIENTS not configured; skipping email send.")
-            return False
-        recipients_list = [r.strip() for r in recipients_str.split(',') if r.strip()]
-    
-    cc_str = _get_env('EMAIL_CC', '')
-    reply_to = _get_env('EMAIL_REPLY_TO')
-
-    if not all([server, port_str, login, password, sender]):
-        logger.info("Email SMTP credentials not fully configured; skipping email send.")
-        return False
+def _smtp_settings() -> Optional[dict]:
+    """SMTP connection settings, or None when not fully configured"""
+    settings = {
+        'server': _get_env('BREVO_SMTP_SERVER'),
+        'port': _get_env('BREVO_SMTP_PORT', '587'),
+        'login': _get_env('BREVO_SMTP_LOGIN'),
+        'password': _get_env('BREVO_SMTP_PASSWORD'),
+        'sender': _get_env('EMAIL_SENDER'),
+        'sender_name': _get_env('EMAIL_SENDER_NAME', 'Procurement Bot'),
+        'cc': _get_env('EMAIL_CC', ''),
+        'reply_to': _get_env('EMAIL_REPLY_TO'),
+        'starttls': (_get_env('BREVO_SMTP_STARTTLS', '1') or '1').strip().lower() not in ('0', 'false', 'no'),
+    }
+    if not all([settings['server'], settings['port'], settings['login'], settings['password'], settings['sender']]):
+        return None
 
     try:
-        port = int(port_str)
+        settings['port'] = int(settings['port'])
     except Exception:
-        port = 587
+        settings['port'] = 587
+    return settings
+
+
+def _resolve_recipients(recipients) -> list:
+    """Provided recipients, or EMAIL_RECIPIENTS from secrets/env"""
+    if recipients:
+        return recipients if isinstance(recipients, list) else [recipients]
+    recipients_str = _get_env('EMAIL_RECIPIENTS')
+    if not recipients_str:
+        return []
+    return [r.strip() for r in recipients_str.split(',') if r.strip()]
+
 
-    cc_list = [c.strip() for c in (cc_str or '').split(',') if c.strip()]
+def _build_message(settings: dict, subject: str, body_text: str, html_body: Optional[str], recipients_list: list):
+    """Build the MIME message; returns (message string, envelope recipients)"""
+    cc_list = [c.strip() for c in (settings['cc'] or '').split(',') if c.strip()]
     all_rcpts = recipients_list + cc_list
-    if not recipients_list:
-        logger.info("No recipients configured; skipping email send.")
-        return False
 
-    # Build message
     msg = MIMEMultipart('alternative')
     safe_text = (body_text or "").replace('—', '-').replace('·', '-')
     msg.attach(MIMEText(safe_text, 'plain', 'utf-8'))
@@ -118,21 +119,207 @@ def send_email_via_brevo(subject: str, body_text: str, html_body: Optional[str]
         msg.attach(MIMEText(safe_text, 'plain', 'utf-8'))
 
     msg['Subject'] = subject
-    msg['From'] = f"{sender_name} <{sender}>"
+    msg['From'] = f"{settings['sender_name']} <{settings['sender']}>"
     msg['To'] = ", ".join(recipients_list)
     if cc_list:
         msg['Cc'] = ", ".join(cc_list)
-    if reply_to:
-        msg['Reply-To'] = reply_to
+    if settings['reply_to']:
+        msg['Reply-To'] = settings['reply_to']
 
+    return msg.as_string(), all_rcpts
+
+
+def _env_number(name: str, default: float) -> float:
     try:
-        smtp = smtplib.SMTP(server, port)
-        smtp.starttls()
-        smtp.login(login, password)
-        smtp.sendmail(sender, all_rcpts if all_rcpts else recipients_list, msg.as_string())
-        smtp.quit()
-        logger.info(f"Email sent to: {', '.join(all_rcpts if all_rcpts else recipients_list)}")
-        return True
-    except Exception as e:
-        logger.error(f"Failed to send email via Brevo: {e}")
+        return float(_get_env(name, str(default)))
+    except (TypeError, ValueError):
+        return default
+
+
+class BatchMailer:
+    """
+    One SMTP session reused for many messages
+    - Connects (STARTTLS + login) lazily on the first send, reconnects if the server drops the session
+    - Retries transient failures (disconnects, 4xx replies, socket errors) with exponential backoff
+    - Per-run cap (max_messages) and throttle (rate_per_second) to stay inside Brevo's sending limits
+    """
+
+    def __init__(self, max_retries: Optional[int] = None, backoff_seconds: Optional[float] = None,
+                 max_messages: Optional[int] = None, rate_per_second: Optional[float] = None):
+        self.max_retries = int(max_retries if max_retries is not None else _env_number('EMAIL_MAX_RETRIES', 3))
+        self.backoff_seconds = backoff_seconds if backoff_seconds is not None else _env_number('EMAIL_RETRY_BACKOFF', 1.0)
+        self.max_messages = int(max_messages if max_messages is not None else _env_number('EMAIL_MAX_PER_RUN', 0))
+        rate = rate_per_second if rate_per_second is not None else _env_number('EMAIL_RATE_PER_SECOND', 0)
+        self.min_interval = 1.0 / rate if rate else 0.0
+
+        self.settings = _smtp_settings()
+        self.smtp = None
+        self.sent = 0
+        self.failed = 0
+        self.skipped = 0
+        self._last_send_at = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
         return False
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.settings['server'], self.settings['port'], timeout=30)
+        try:
+            if self.settings['starttls']:
+                smtp.starttls()
+            smtp.ehlo_or_helo_if_needed()
+            # Brevo always advertises AUTH after STARTTLS; a local stand-in may not
+            if smtp.has_extn('auth'):
+                smtp.login(self.settings['login'], self.settings['password'])
+        except Exception:
+            self._quit(smtp)
+            raise
+        self.smtp = smtp
+
+    @staticmethod
+    def _quit(smtp):
+        try:
+            smtp.quit()
+        except Exception:
+            try:
+                smtp.close()
+            except Exception:
+                pass
+
+    def close(self):
+        """End the SMTP session (safe to call more than once)"""
+        if self.smtp is not None:
+            self._quit(self.smtp)
+            self.smtp = None
+
+    @staticmethod
+    def _is_transient(error: Exception) -> bool:
+        if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, smtplib.SMTPHeloError)):
+            return True
+        if isinstance(error, smtplib.SMTPAuthenticationError):
+            return False
+        if isinstance(error, smtplib.SMTPResponseException):
+            return 400 <= error.smtp_code < 500
+        if isinstance(error, smtplib.SMTPRecipientsRefused):
+            return False
+        # Every other SMTPException (SMTPNotSupportedError, SMTPDataError without a 4xx code, ...)
+        # is permanent - checked before OSError, which all SMTPExceptions subclass
+        if isinstance(error, smtplib.SMTPException):
+            return False
+        return isinstance(error, OSError)
+
+    def _throttle(self):
+        if self.min_interval:
+            wait = self._last_send_at + self.min_interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+        self._last_send_at = time.monotonic()
+
+    def send(self, subject: str, body_text: str, html_body: Optional[str] = None, recipients: Optional[list] = None) -> bool:
+        """Send one message on the shared session. Returns True on success, False on failure/skip."""
+        if not self.settings:
+            logger.info("Email SMTP credentials not fully configured; skipping email send.")
+            self.skipped += 1
+            return False
+
+        recipients_list = _resolve_recipients(recipients)
+        if not recipients_list:
+            logger.info("No recipients provided and EMAIL_RECIPIENTS not configured; skipping email send.")
+            self.skipped += 1
+            return False
+
+        if self.max_messages and self.sent >= self.max_messages:
+            logger.warning(f"Email rate limit reached ({self.max_messages} per run); not sending '{subject}'")
+            self.skipped += 1
+            return False
+
+        message, all_rcpts = _build_message(self.settings, subject, body_text, html_body, recipients_list)
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                if self.smtp is None:
+                    self._connect()
+                self._throttle()
+                self.smtp.sendmail(self.settings['sender'], all_rcpts, message)
+                self.sent += 1
+                logger.info(f"Email sent to: {', '.join(all_rcpts)}")
+                return True
+            except Exception as e:
+                # The session may be half-open after any failure - start the next try from scratch
+                self.close()
+                if attempt < self.max_retries and self._is_transient(e):
+                    delay = self.backoff_seconds * (2 ** attempt)
+                    logger.warning(f"Transient SMTP error ({e}); retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                    time.sleep(delay)
+                    continue
+                logger.error(f"Failed to send email via Brevo: {e}")
+                self.failed += 1
+                return False
+
+        return False
+
+    def send_many(self, messages) -> int:
+        """
+        Send several messages on one session.
+
+        Args:
+            messages: Iterable of dicts with subject, body_text and optional html_body / recipients
+
+        Returns:
+            Number of messages sent
+        """
+        sent = 0
+        for message in messages:
+            if self.send(message['subject'], message['body_text'],
+                         html_body=message.get('html_body'), recipients=message.get('recipients')):
+                sent += 1
+        return sent
+
+
+_active = threading.local()
+
+
+@contextmanager
+def batch_mailer(**kwargs):
+    """
+    Make a BatchMailer the active mailer for this thread for the duration of the block.
+    Nested blocks reuse the outer session.
+    """
+    mailer = getattr(_active, 'mailer', None)
+    if mailer is not None:
+        yield mailer
+        return
+
+    mailer = BatchMailer(**kwargs)
+    _active.mailer = mailer
+    try:
+        yield mailer
+    finally:
+        _active.mailer = None
+        mailer.close()
+
+
+def send_email_via_brevo(subject: str, body_text: str, html_body: Optional[str] = None, recipients: Optional[list] = None) -> bool:
+    """
+    Send email via Brevo SMTP.
+    Uses the thread's active batch_mailer() session when there is one, otherwise a one-message session.
+    
+    Args:
+        subject: Email subject
+        body_text: Plain text body
+        html_body: HTML body (optional)
+        recipients: List of recipient emails (optional). If not provided, uses EMAIL_RECIPIENTS from secrets.
+    
+    Returns:
+        True on success, False on failure
+    """
+    mailer = getattr(_active, 'mailer', None)
+    if mailer is not None:
+        return mailer.send(subject, body_text, html_body=html_body, recipients=recipients)
+
+    with BatchMailer() as mailer:
+        return mailer.send(subject, body_text, html_body=html_body, recipients=recipients)
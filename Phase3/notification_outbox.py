@@ -0,0 +1,443 @@
+"""
+Notification outbox for Phase 3
+- Write paths queue their emails in requirements_notification_outbox inside their own
+  transaction (enqueue_* before commit, deliver() after commit)
+- deliver() wakes a background thread that drains the outbox in batches over one SMTP session,
+  so SMTP latency never lands on the operator's click; it stays up (without holding a
+  connection) until rows held for a digest window or a retry are due
+- The cron (or `python notification_outbox.py`) drains whatever is left
+- Duplicates are collapsed by dedupe key; a user is emailed once per request status
+  (replaces the old last_notified_status single-slot check)
+- Digest mode (USER_NOTIFICATION_DIGEST=1) sends one email per user for every status change
+  drained together; USER_NOTIFICATION_DIGEST_WINDOW holds user emails for N minutes to batch more
+- If the outbox table hasn't been created yet, deliver() sends inline like before
+
+Usage in a write path:
+    notifications = enqueue_user_notifications(db, req_ids, 'in_progress')
+    db.conn.commit()
+    deliver(db, notifications)
+"""
+
+import os
+import sys
+import uuid
+import threading
+from datetime import datetime, timedelta
+
+from email_service import batch_mailer
+
+OUTBOX_TABLE = 'requirements_notification_outbox'
+
+USER_NOTIFICATION_TYPES = ('in_progress', 'ordered', 'completed')
+BUNDLE_EVENTS = ('bundle_reviewed', 'bundle_approved', 'bundle_rejected')
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_MAX_ATTEMPTS = 5
+CLAIM_TIMEOUT_MINUTES = 10   # 'Sending' rows older than this (crashed worker) are picked up again
+RETRY_DELAY_MINUTES = 1      # A failed send goes out again no sooner than this
+
+
+def digest_enabled():
+    """USER_NOTIFICATION_DIGEST=1: one email per user for all status changes sent together"""
+    return os.getenv('USER_NOTIFICATION_DIGEST', '').strip().lower() in ('1', 'true', 'yes')
+
+
+def digest_window_minutes():
+    """
+    USER_NOTIFICATION_DIGEST_WINDOW (minutes, digest mode only): user emails wait this long
+    in the outbox so changes made within the window go out in one digest
+    """
+    if not digest_enabled():
+        return 0
+    try:
+        return max(0, int(os.getenv('USER_NOTIFICATION_DIGEST_WINDOW', '0')))
+    except ValueError:
+        return 0
+
+
+class PendingNotifications:
+    """Notifications created by one write path: queued in the outbox, or held for inline sending"""
+
+    def __init__(self, entries, queued):
+        self.entries = entries  # [(notification_type, req_id, bundle_id), ...]
+        self.queued = queued
+
+    def __bool__(self):
+        return bool(self.entries)
+
+
+def outbox_available(db):
+    """True when the outbox table exists (column lookup is cached once it does)"""
+    return bool(db.get_table_columns(OUTBOX_TABLE))
+
+
+def _dedupe_key(notification_type, req_id, bundle_id):
+    if notification_type in USER_NOTIFICATION_TYPES:
+        return f"user:{req_id}:{notification_type}"
+    return f"{notification_type}:{bundle_id}"
+
+
+def _enqueue(db, entries):
+    """Insert outbox rows in the caller's open transaction (no commit)"""
+    entries = list(dict.fromkeys(entries))
+    if not entries or not outbox_available(db):
+        return PendingNotifications(entries, queued=False)
+
+    db.execute_many(f"""
+    INSERT INTO {OUTBOX_TABLE} (notification_type, req_id, bundle_id, dedupe_key)
+    VALUES (?, ?, ?, ?)
+    """, [(notification_type, req_id, bundle_id, _dedupe_key(notification_type, req_id, bundle_id))
+          for notification_type, req_id, bundle_id in entries])
+    return PendingNotifications(entries, queued=True)
+
+
+def enqueue_user_notifications(db, req_ids, notification_type):
+    """Queue request status emails ('in_progress', 'ordered', 'completed') for several requests"""
+    if notification_type not in USER_NOTIFICATION_TYPES:
+        raise ValueError(f"Invalid notification type: {notification_type}")
+    return _enqueue(db, [(notification_type, req_id, None) for req_id in req_ids])
+
+
+def enqueue_bundle_notification(db, bundle_id, event):
+    """Queue a bundle event email ('bundle_reviewed', 'bundle_approved', 'bundle_rejected')"""
+    if event not in BUNDLE_EVENTS:
+        raise ValueError(f"Invalid bundle event: {event}")
+    return _enqueue(db, [(event, None, bundle_id)])
+
+
+def _bundles_data(bundles, notification_type):
+    """Bundle details shown in 'ordered' / 'completed' emails (read at send time)"""
+    bundles_data = []
+    for bundle in bundles:
+        if notification_type == 'ordered' and bundle['status'] in ('Ordered', 'Completed'):
+            bundles_data.append({
+                'bundle_id': bundle['bundle_id'],
+                'vendor_id': bundle['recommended_vendor_id'],
+                'po_number': bundle.get('po_number'),
+                'po_date': bundle.get('po_date'),
+                'expected_delivery_date': bundle.get('expected_delivery_date')
+            })
+        elif notification_type == 'completed' and bundle['status'] == 'Completed':
+            bundles_data.append({
+                'bundle_id': bundle['bundle_id'],
+                'vendor_id': bundle['recommended_vendor_id'],
+                'packing_slip_code': bundle.get('packing_slip_code'),
+                'actual_delivery_date': bundle.get('actual_delivery_date'),
+                'po_number': bundle.get('po_number')
+            })
+    return {'bundles': bundles_data}
+
+
+def _send_bundle_event(db, notification_type, bundle_id):
+    if notification_type == 'bundle_reviewed':
+        from operation_team_notifications import send_bundle_reviewed_notification
+        return send_bundle_reviewed_notification(db, bundle_id)
+    if notification_type == 'bundle_approved':
+        from operator_notifications import send_bundle_approved_notification
+        return send_bundle_approved_notification(db, bundle_id)
+    if notification_type == 'bundle_rejected':
+        from operator_notifications import send_bundle_rejected_notification
+        return send_bundle_rejected_notification(db, bundle_id)
+    raise ValueError(f"Unknown notification type: {notification_type}")
+
+
+def _send_batch(db, entries, check_last_notified=False):
+    """
+    Send notifications with the existing email builders.
+    User emails share one prefetched context (set-based queries for the whole batch) and,
+    in digest mode, are combined into one email per user.
+
+    Returns:
+        list: (sent, error) per entry, in entry order
+    """
+    from user_notifications import send_status_notifications, prefetch_notification_context
+
+    outcomes = [(False, None)] * len(entries)
+    user_positions = {}  # (req_id, notification_type) -> [positions]
+    for position, (notification_type, req_id, bundle_id) in enumerate(entries):
+        if notification_type in USER_NOTIFICATION_TYPES:
+            user_positions.setdefault((req_id, notification_type), []).append(position)
+            continue
+        try:
+            outcomes[position] = (bool(_send_bundle_event(db, notification_type, bundle_id)), None)
+        except Exception as e:
+            outcomes[position] = (False, str(e)[:500])
+
+    if not user_positions:
+        return outcomes
+
+    try:
+        context = prefetch_notification_context(db, {req_id for req_id, _ in user_positions})
+        needs_bundles = [req_id for req_id, notification_type in user_positions if notification_type != 'in_progress']
+        bundles_by_request = db.get_bundles_for_requests(needs_bundles) if needs_bundles else {}
+    except Exception as e:
+        error = f"Context prefetch failed: {str(e)}"[:500]
+        for positions in user_positions.values():
+            for position in positions:
+                outcomes[position] = (False, error)
+        return outcomes
+
+    bundle_data = {
+        (req_id, notification_type): _bundles_data(bundles_by_request.get(req_id, []), notification_type)
+        for req_id, notification_type in user_positions if notification_type != 'in_progress'
+    }
+    results = send_status_notifications(db, list(user_positions), bundle_data,
+                                        check_last_notified=check_last_notified, context=context,
+                                        digest=digest_enabled())
+    for key, positions in user_positions.items():
+        for position in positions:
+            outcomes[position] = (results.get(key, False), None)
+    return outcomes
+
+
+def deliver(db, pending):
+    """
+    Call after commit. Queued notifications go to the background worker; without an outbox
+    table they are sent inline (old behaviour, still one SMTP session per call).
+    """
+    if not pending:
+        return
+    if pending.queued:
+        start_background_drain(db.backend)
+        return
+
+    with batch_mailer():
+        try:
+            _send_batch(db, pending.entries, check_last_notified=True)
+        except Exception as e:
+            print(f"[WARNING] Failed to send notifications: {str(e)}")
+
+
+# ========== Draining ==========
+
+def _claim_batch(db, batch_size):
+    """Mark up to batch_size rows as Sending under a fresh claim token and return them"""
+    claim_token = uuid.uuid4().hex
+    claimable = f"""
+    ((status = 'Pending'
+      AND (claimed_at IS NULL OR claimed_at <= DATEADD(minute, -{RETRY_DELAY_MINUTES}, GETDATE())))
+     OR (status = 'Sending' AND claimed_at < DATEADD(minute, -{CLAIM_TIMEOUT_MINUTES}, GETDATE())))
+    """
+    window = digest_window_minutes()
+    if window:
+        # User emails younger than the digest window stay queued for a later drain
+        user_types = ','.join(f"'{t}'" for t in USER_NOTIFICATION_TYPES)
+        claimable = f"""
+        ({claimable}
+         AND (notification_type NOT IN ({user_types})
+              OR created_at <= DATEADD(minute, -{window}, GETDATE())))
+        """
+    db.execute_insert(f"""
+    UPDATE {OUTBOX_TABLE}
+    SET status = 'Sending', claim_token = ?, claimed_at = GETDATE(), attempts = attempts + 1
+    WHERE outbox_id IN (
+        SELECT TOP {int(batch_size)} outbox_id FROM {OUTBOX_TABLE}
+        WHERE {claimable}
+        ORDER BY outbox_id
+    )
+    AND {claimable}
+    """, (claim_token,))
+    db.conn.commit()
+
+    return db.execute_query_rows(f"""
+    SELECT outbox_id, notification_type, req_id, bundle_id, dedupe_key, attempts
+    FROM {OUTBOX_TABLE}
+    WHERE claim_token = ?
+    ORDER BY outbox_id
+    """, (claim_token,))
+
+
+def _as_datetime(value):
+    # SQLite returns computed datetime columns (GETDATE(), MIN(...)) as text
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+def seconds_until_due(db):
+    """
+    Seconds until the earliest Pending row can be claimed (0 if one is due now), or None when
+    nothing is waiting. Held rows are user emails inside the digest window and failed sends
+    waiting out RETRY_DELAY_MINUTES. Measured on the database clock, like the claim query.
+    """
+    user_types = ','.join(f"'{t}'" for t in USER_NOTIFICATION_TYPES)
+    rows = db.execute_query(f"""
+    SELECT
+        GETDATE() AS db_now,
+        MIN(claimed_at) AS last_failed_at,
+        MIN(CASE WHEN claimed_at IS NULL AND notification_type IN ({user_types}) THEN created_at END) AS oldest_user_row,
+        SUM(CASE WHEN claimed_at IS NULL AND notification_type NOT IN ({user_types}) THEN 1 ELSE 0 END) AS ready_rows
+    FROM {OUTBOX_TABLE}
+    WHERE status = 'Pending'
+    """)
+    if not rows:
+        return None
+    row = rows[0]
+    now = _as_datetime(row['db_now'])
+
+    due = []
+    if row['ready_rows']:
+        due.append(now)
+    if row['last_failed_at'] is not None:
+        due.append(_as_datetime(row['last_failed_at']) + timedelta(minutes=RETRY_DELAY_MINUTES))
+    if row['oldest_user_row'] is not None:
+        due.append(_as_datetime(row['oldest_user_row']) + timedelta(minutes=digest_window_minutes()))
+    if not due:
+        return None
+    return max(0.0, (min(due) - now).total_seconds())
+
+
+def _already_sent_keys(db, keys):
+    """Dedupe keys of user notifications that were sent in an earlier batch"""
+    keys = [key for key in keys if key.startswith('user:')]
+    if not keys:
+        return set()
+    placeholders = ','.join('?' for _ in keys)
+    rows = db.execute_query_rows(f"""
+    SELECT DISTINCT dedupe_key FROM {OUTBOX_TABLE}
+    WHERE status = 'Sent' AND dedupe_key IN ({placeholders})
+    """, keys)
+    return {row.dedupe_key for row in rows}
+
+
+def drain_outbox(db, batch_size=DEFAULT_BATCH_SIZE, max_attempts=DEFAULT_MAX_ATTEMPTS, max_batches=None):
+    """
+    Send queued notifications in batches (one SMTP session for the whole drain).
+    Failed sends go back to Pending until max_attempts, then stay Failed.
+
+    Returns:
+        dict: {'claimed', 'sent', 'skipped', 'failed', 'retry'}
+    """
+    stats = {'claimed': 0, 'sent': 0, 'skipped': 0, 'failed': 0, 'retry': 0}
+    if not db.conn or not outbox_available(db):
+        return stats
+
+    batches = 0
+    with batch_mailer():
+        while max_batches is None or batches < max_batches:
+            rows = _claim_batch(db, batch_size)
+            if not rows:
+                break
+            batches += 1
+            stats['claimed'] += len(rows)
+
+            seen = _already_sent_keys(db, {row.dedupe_key for row in rows})
+            sent_ids = []
+            other_updates = []  # (status, last_error, outbox_id)
+            to_send = []
+            for row in rows:
+                if row.dedupe_key in seen:
+                    other_updates.append(('Skipped', 'Duplicate notification', row.outbox_id))
+                    stats['skipped'] += 1
+                    continue
+                seen.add(row.dedupe_key)
+                to_send.append(row)
+
+            outcomes = _send_batch(db, [(row.notification_type, row.req_id, row.bundle_id) for row in to_send])
+            for row, (ok, error) in zip(to_send, outcomes):
+                if not ok and error is None:
+                    error = 'Not sent (no recipient, skipped type or SMTP failure)'
+
+                if ok:
+                    sent_ids.append((row.outbox_id,))
+                    stats['sent'] += 1
+                elif row.attempts >= max_attempts:
+                    other_updates.append(('Failed', error, row.outbox_id))
+                    stats['failed'] += 1
+                else:
+                    other_updates.append(('Pending', error, row.outbox_id))
+                    stats['retry'] += 1
+
+            db.execute_many(f"""
+            UPDATE {OUTBOX_TABLE}
+            SET status = 'Sent', sent_at = GETDATE(), claim_token = NULL, last_error = NULL
+            WHERE outbox_id = ?
+            """, sent_ids)
+            db.execute_many(f"""
+            UPDATE {OUTBOX_TABLE}
+            SET status = ?, last_error = ?, claim_token = NULL
+            WHERE outbox_id = ?
+            """, other_updates)
+            db.conn.commit()
+
+            # Failed rows wait out RETRY_DELAY_MINUTES instead of spinning on the same rows
+            if len(rows) < batch_size or stats['retry']:
+                break
+
+    return stats
+
+
+# ========== Background worker ==========
+
+_drain_lock = threading.Lock()
+_drain_requested = threading.Event()
+_background_enabled = True
+
+
+def set_background_drain(enabled):
+    """Turn the background worker off for processes that drain synchronously (cron scripts)"""
+    global _background_enabled
+    _background_enabled = enabled
+
+
+def _drain_once(backend):
+    """One drain on a fresh pooled connection; returns seconds_until_due afterwards"""
+    from db_connector import DatabaseConnector
+    db = DatabaseConnector(backend=backend)
+    try:
+        drain_outbox(db)
+        return seconds_until_due(db)
+    finally:
+        db.close_connection()
+
+
+def _background_drain(backend):
+    try:
+        while True:
+            _drain_requested.clear()
+            wait = _drain_once(backend)
+            if _drain_requested.is_set():
+                continue
+            if wait is None:
+                break
+            # Held digests / retries: sleep until the earliest is due (a new write wakes us early)
+            _drain_requested.wait(timeout=max(wait, 1.0))
+    except Exception as e:
+        print(f"[WARNING] Notification outbox drain failed: {str(e)}")
+    finally:
+        _drain_lock.release()
+
+    # A write that landed between the last drain and releasing the lock
+    if _drain_requested.is_set():
+        start_background_drain(backend)
+
+
+def start_background_drain(backend=None):
+    """Drain the outbox on a daemon thread (at most one per process; later calls request another pass)"""
+    if not _background_enabled:
+        return False
+    _drain_requested.set()
+    if not _drain_lock.acquire(blocking=False):
+        return True
+    threading.Thread(target=_background_drain, args=(backend,), name='notification-outbox', daemon=True).start()
+    return True
+
+
+def main():
+    """Cron step: drain everything that is due"""
+    from db_connector import DatabaseConnector
+
+    db = DatabaseConnector()
+    if not db.conn:
+        print(f"ERROR: Database connection failed: {db.connection_error}")
+        return 1
+    try:
+        stats = drain_outbox(db)
+        print(f"Notification outbox drained: {stats}")
+        return 0
+    finally:
+        db.close_connection()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
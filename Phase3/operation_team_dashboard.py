@@ -15,36 +15,39 @@ def main(db=None):
     st.caption("Bundle Approval Management")
     
     # Use passed db connection or create new one
-    if db is None:
+    owns_db = db is None
+    if owns_db:
         db = DatabaseConnector()
     
-    # Sidebar info - Show actual username if available
-    username = st.session_state.get('username', 'Operation Team')
-    st.sidebar.title(f"👤 {username}")
-    st.sidebar.info("You can approve or reject reviewed bundles.")
-    
-    # View selector
-    st.sidebar.markdown("---")
-    view_mode = st.sidebar.radio(
-        "📂 View",
-        ["📋 Reviewed Bundles", "📜 History"],
-        index=0
-    )
-    
-    st.sidebar.markdown("---")
-    if st.sidebar.button("🚪 Logout"):
-        for key in list(st.session_state.keys()):
-            del st.session_state[key]
-        st.rerun()
-    
-    # Main content - Display based on selected view
-    if view_mode == "📋 Reviewed Bundles":
-        display_reviewed_bundles(db)
-    else:  # History
-        display_history(db)
-    
-    # Don't close connection if it was passed from app.py
-    # db.close_connection()
+    try:
+        # Sidebar info - Show actual username if available
+        username = st.session_state.get('username', 'Operation Team')
+        st.sidebar.title(f"👤 {username}")
+        st.sidebar.info("You can approve or reject reviewed bundles.")
+        
+        # View selector
+        st.sidebar.markdown("---")
+        view_mode = st.sidebar.radio(
+            "📂 View",
+            ["📋 Reviewed Bundles", "📜 History"],
+            index=0
+        )
+        
+        st.sidebar.markdown("---")
+        if st.sidebar.button("🚪 Logout"):
+            for key in list(st.session_state.keys()):
+                del st.session_state[key]
+            st.rerun()
+        
+        # Main content - Display based on selected view
+        if view_mode == "📋 Reviewed Bundles":
+            display_reviewed_bundles(db)
+        else:  # History
+            display_history(db)
+    finally:
+        # Return the pooled connection opened above - a passed-in db belongs to the caller
+        if owns_db:
+            db.close_connection()
 
 def display_reviewed_bundles(db):
     """Display all reviewed bundles for approval/rejection - matches operator dashboard style"""
@@ -63,15 +66,18 @@ def display_reviewed_bundles(db):
         st.success(f"**{len(bundles)} bundle(s) awaiting your approval**")
         st.markdown("---")
         
+        # One query for the item/project breakdown of every bundle on the page
+        project_breakdowns = db.get_bundle_project_breakdowns([b['bundle_id'] for b in bundles])
+        
         # Display each bundle
         for bundle in bundles:
-            display_bundle_card(db, bundle)
+            display_bundle_card(db, bundle, project_breakdowns)
             st.markdown("---")
     
     except Exception as e:
         st.error(f"Error loading bundles: {str(e)}")
 
-def display_bundle_card(db, bundle):
+def display_bundle_card(db, bundle, project_breakdowns=None):
     """Display a single bundle card - matches operator dashboard style"""
     
     # Format dates
@@ -131,7 +137,7 @@ def display_bundle_card(db, bundle):
     
     # Expandable section for detailed items (same as operator dashboard)
     with st.expander("📋 View Bundle Items", expanded=False):
-        display_bundle_items_table(db, bundle['bundle_id'])
+        display_bundle_items_table(db, bundle['bundle_id'], project_breakdowns)
     
     # Action buttons
     st.markdown("")
@@ -149,8 +155,11 @@ def display_bundle_card(db, bundle):
     if st.session_state.get(f'show_reject_dialog_{bundle["bundle_id"]}', False):
         show_rejection_dialog(db, bundle)
 
-def display_bundle_items_table(db, bundle_id):
-    """Display HTML table with per-project breakdown - EXACT copy from operator dashboard"""
+def display_bundle_items_table(db, bundle_id, project_breakdowns=None):
+    """
+    Display HTML table with per-project breakdown - EXACT copy from operator dashboard
+    project_breakdowns: prefetched db.get_bundle_project_breakdowns() result (fetched here if not given)
+    """
     try:
         import json
         
@@ -175,6 +184,9 @@ def display_bundle_items_table(db, bundle_id):
             st.info("No items found in this bundle.")
             return
         
+        if project_breakdowns is None:
+            project_breakdowns = db.get_bundle_project_breakdowns([bundle_id])
+        
         # Get user names for display
         user_ids_set = set()
         for it in items:
@@ -278,7 +290,7 @@ def display_bundle_items_table(db, bundle_id):
             
             if breakdown:
                 # Get project breakdown for this item
-                project_breakdown = db.get_bundle_item_project_breakdown(bundle_id, it['item_id'])
+                project_breakdown = project_breakdowns.get((bundle_id, it['item_id']), [])
                 project_map = {}
                 date_map = {}
                 for pb in project_breakdown or []:
@@ -487,15 +499,18 @@ def display_history(db):
         st.success(f"**Found {len(history)} bundle(s)**")
         st.markdown("---")
         
+        # One query for the item/project breakdown of every bundle on the page
+        project_breakdowns = db.get_bundle_project_breakdowns([b['bundle_id'] for b in history])
+        
         # Display each bundle
         for bundle in history:
-            display_history_bundle(db, bundle)
+            display_history_bundle(db, bundle, project_breakdowns)
             st.markdown("---")
     
     except Exception as e:
         st.error(f"Error loading history: {str(e)}")
 
-def display_history_bundle(db, bundle):
+def display_history_bundle(db, bundle, project_breakdowns=None):
     """Display a single bundle from history with full details"""
     
     # Determine action type and timestamp
@@ -610,7 +625,7 @@ def display_history_bundle(db, bundle):
     # Show items in expandable section
     st.markdown("")
     with st.expander("📋 View Bundle Items", expanded=False):
-        display_bundle_items_table(db, bundle['bundle_id'])
+        display_bundle_items_table(db, bundle['bundle_id'], project_breakdowns)
 
 if __name__ == "__main__":
     main()
@@ -12,6 +12,8 @@ import os
 import logging
 from datetime import datetime, date
 from email_service import send_email_via_brevo
+from email_templates import EmailTemplate
+from recipient_directory import get_recipient_directory
 
 logger = logging.getLogger("operation_team_notifications")
 if not logger.handlers:
@@ -29,7 +31,7 @@ def format_project_display(project_number, sub_project_number=None):
 
 def get_operation_team_emails(db):
     """
-    Get all active Operation Team member emails
+    Get all active Operation Team member emails (cached recipient directory)
     
     Args:
         db: DatabaseConnector instance
@@ -37,28 +39,17 @@ def get_operation_team_emails(db):
     Returns:
         list: List of email addresses
     """
-    try:
-        query = """
-        SELECT email, full_name
-        FROM requirements_users
-        WHERE user_role = 'Operation' 
-          AND is_active = 1 
-          AND email IS NOT NULL
-        ORDER BY full_name
-        """
-        results = db.execute_query(query)
-        
-        if not results:
-            logger.warning("No active Operation Team members found with email addresses")
-            return []
-        
-        emails = [r['email'] for r in results if r.get('email')]
-        logger.info(f"Found {len(emails)} Operation Team member(s) to notify")
-        return emails
-        
-    except Exception as e:
-        logger.error(f"Error getting Operation Team emails: {str(e)}")
+    directory = get_recipient_directory(db)
+    if directory is None:
+        return []
+    
+    emails = directory.emails_for_role('Operation')
+    if not emails:
+        logger.warning("No active Operation Team members found with email addresses")
         return []
+    
+    logger.info(f"Found {len(emails)} Operation Team member(s) to notify")
+    return emails
 
 
 def send_bundle_reviewed_notification(db, bundle_id):
@@ -244,33 +235,19 @@ def _calculate_urgency(date_needed):
         return None
 
 
-def _build_bundle_reviewed_email(bundle_data, items, requests):
-    """
-    Build email content for bundle reviewed notification
-    
-    Returns:
-        tuple: (subject, body_text, html_body)
-    """
-    bundle_name = bundle_data['bundle_name']
-    vendor_name = bundle_data.get('vendor_name', 'Unknown Vendor')
-    vendor_email = bundle_data.get('vendor_email', 'N/A')
-    vendor_phone = bundle_data.get('vendor_phone', 'N/A')
-    reviewed_at = _format_datetime(bundle_data.get('reviewed_at'))
-    reviewed_by = bundle_data.get('reviewed_by', 'Operator')
-    
-    # Subject
-    subject = f"🟢 Bundle Reviewed - Awaiting Approval: {bundle_name}"
-    
-    # Count urgent items
-    urgent_count = 0
-    for req in requests:
-        if req.get('earliest_date_needed'):
-            days = _calculate_urgency(req['earliest_date_needed'])
-            if days is not None and days <= 5:
-                urgent_count += 1
-    
-    # Build plain text body
-    body_text = f"""Hello Operation Team,
+# ========== Email templates (built once per process) ==========
+
+_ITEM_TEXT = EmailTemplate("• {item_name}{size_str} - {total_quantity} pcs\n")
+_ITEM_HTML = EmailTemplate("<li>{item_name}{size_str} - <strong>{total_quantity} pcs</strong></li>")
+
+_REQUEST_TEXT = EmailTemplate("• {req_number} ({user_name}) - {item_count} item(s) total in request\n{project_text}{notes_text}{date_text}\n")
+_REQUEST_HTML = EmailTemplate(
+    "<div style='margin-bottom: 15px; padding: 10px; background-color: #f9f9f9; border-left: 3px solid #2196F3;'>"
+    "<strong>{req_number}</strong> ({user_name}) - {item_count} item(s) total in request<br>"
+    "{project_html}{notes_html}{date_html}</div>"
+)
+
+_REVIEWED_TEXT = EmailTemplate("""Hello Operation Team,
 
 A bundle has been reviewed by the operator and is ready for your approval.
 
@@ -285,63 +262,16 @@ Reviewed at: {reviewed_at}
 
 ITEMS:
 ------
-"""
-    
-    for item in items:
-        size = item.get('size_details', '')
-        size_str = f" ({size})" if size else ""
-        body_text += f"• {item['item_name']}{size_str} - {item['total_quantity']} pcs\n"
-    
-    body_text += f"\nTotal: {len(items)} item(s), {bundle_data['total_quantity']} pieces\n"
-    body_text += "\nℹ️ These are the items in THIS bundle for this vendor.\n"
-    
-    # User requests section
-    body_text += "\nUSER REQUESTS:\n--------------\n"
-    body_text += "(Note: If a request has more items than shown above, the remaining items are in other bundles for different vendors)\n\n"
-    
-    for req in requests:
-        user_name = req.get('full_name') or req.get('username', 'Unknown User')
-        body_text += f"• {req['req_number']} ({user_name}) - {req['item_count']} item(s) total in request\n"
-        
-        if req.get('project_number'):
-            formatted_project = format_project_display(req['project_number'], req.get('sub_project_number'))
-            body_text += f"  📋 Project: {formatted_project}\n"
-        
-        if req.get('user_notes'):
-            body_text += f"  📝 Notes: \"{req['user_notes']}\"\n"
-        
-        if req.get('earliest_date_needed'):
-            date_str = _format_date(req['earliest_date_needed'])
-            days = _calculate_urgency(req['earliest_date_needed'])
-            if days is not None and days <= 5:
-                body_text += f"  📅 Date Needed: {date_str} (⚠️ {days} days!)\n"
-            else:
-                body_text += f"  📅 Date Needed: {date_str}\n"
-        
-        body_text += "\n"
-    
-    # Bundle history section
-    if bundle_data.get('merge_count') or bundle_data.get('rejection_reason'):
-        body_text += "BUNDLE HISTORY:\n---------------\n"
-        body_text += f"✅ Created: {_format_datetime(bundle_data.get('created_at'))}\n"
-        
-        if bundle_data.get('merge_count'):
-            body_text += f"🔄 Updated {bundle_data['merge_count']} time(s) - Last: {_format_datetime(bundle_data.get('last_merged_at'))}\n"
-            if bundle_data.get('merge_reason'):
-                body_text += f"   Merge Reason: {bundle_data['merge_reason']}\n"
-        
-        if bundle_data.get('rejection_reason'):
-            body_text += f"\n⚠️ Previously Rejected: {_format_datetime(bundle_data.get('rejected_at'))}\n"
-            body_text += f"   Reason: \"{bundle_data['rejection_reason']}\"\n"
-        
-        body_text += "\n"
-    
-    # Urgency indicator
-    if urgent_count > 0:
-        body_text += f"URGENCY:\n--------\n⚠️ {urgent_count} item(s) needed within 5 days!\n\n"
-    
-    # Action required
-    body_text += """ACTION REQUIRED:
+{items_text}
+Total: {item_count} item(s), {total_quantity} pieces
+
+ℹ️ These are the items in THIS bundle for this vendor.
+
+USER REQUESTS:
+--------------
+(Note: If a request has more items than shown above, the remaining items are in other bundles for different vendors)
+
+{requests_text}{history_text}{urgency_text}ACTION REQUIRED:
 ----------------
 Please log in to the system to approve or reject this bundle.
 
@@ -349,10 +279,9 @@ Dashboard: https://item-requirement-app-sdgny.streamlit.app/
 
 ---
 This is an automated notification from the Procurement System.
-"""
-    
-    # Build HTML body (simple styled version)
-    html_body = f"""
+""")
+
+_REVIEWED_HTML = EmailTemplate("""
     <html>
     <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
         <h2 style="color: #4CAF50;">🟢 Bundle Reviewed - Awaiting Approval</h2>
@@ -367,77 +296,126 @@ This is an automated notification from the Procurement System.
             <strong>Reviewed at:</strong> {reviewed_at}</p>
         </div>
         
-        <h3>Items ({len(items)} items, {bundle_data['total_quantity']} pieces)</h3>
+        <h3>Items ({item_count} items, {total_quantity} pieces)</h3>
         <ul>
+    {items_html}</ul><p style='background-color: #e3f2fd; padding: 10px; border-radius: 5px; margin: 10px 0;'>ℹ️ <strong>Note:</strong> The items listed above are in THIS bundle for this vendor.</p><h3>User Requests</h3><p style='color: #666; font-size: 0.9em; margin-bottom: 15px;'><em>If a request has more items than shown in the bundle above, the remaining items are in other bundles for different vendors.</em></p>{requests_html}{history_html}{urgency_html}
+        <div style="background-color: #e3f2fd; padding: 15px; border-radius: 5px; margin: 20px 0;">
+            <h3 style="margin-top: 0;">Action Required</h3>
+            <p>Please log in to the system to approve or reject this bundle.</p>
+            <p><a href="https://item-requirement-app-sdgny.streamlit.app/" style="background-color: #2196F3; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px; display: inline-block;">Go to Dashboard</a></p>
+        </div>
+        
+        <p style="color: #999; font-size: 12px; margin-top: 30px;">This is an automated notification from the Procurement System.</p>
+    </body>
+    </html>
+    """)
+
+
+def _build_bundle_reviewed_email(bundle_data, items, requests):
     """
+    Build email content for bundle reviewed notification
     
-    for item in items:
-        size = item.get('size_details', '')
-        size_str = f" ({size})" if size else ""
-        html_body += f"<li>{item['item_name']}{size_str} - <strong>{item['total_quantity']} pcs</strong></li>"
+    Returns:
+        tuple: (subject, body_text, html_body)
+    """
+    bundle_name = bundle_data['bundle_name']
     
-    html_body += "</ul>"
-    html_body += "<p style='background-color: #e3f2fd; padding: 10px; border-radius: 5px; margin: 10px 0;'>"
-    html_body += "ℹ️ <strong>Note:</strong> The items listed above are in THIS bundle for this vendor."
-    html_body += "</p>"
+    # Subject
+    subject = f"🟢 Bundle Reviewed - Awaiting Approval: {bundle_name}"
     
-    html_body += "<h3>User Requests</h3>"
-    html_body += "<p style='color: #666; font-size: 0.9em; margin-bottom: 15px;'>"
-    html_body += "<em>If a request has more items than shown in the bundle above, the remaining items are in other bundles for different vendors.</em>"
-    html_body += "</p>"
+    item_rows = []
+    for item in items:
+        size = item.get('size_details', '')
+        item_rows.append({
+            'item_name': item['item_name'],
+            'size_str': f" ({size})" if size else "",
+            'total_quantity': item['total_quantity']
+        })
     
+    # User requests (urgent = needed within 5 days)
+    urgent_count = 0
+    request_rows = []
     for req in requests:
         user_name = req.get('full_name') or req.get('username', 'Unknown User')
-        html_body += f"<div style='margin-bottom: 15px; padding: 10px; background-color: #f9f9f9; border-left: 3px solid #2196F3;'>"
-        html_body += f"<strong>{req['req_number']}</strong> ({user_name}) - {req['item_count']} item(s) total in request<br>"
+        row = {
+            'req_number': req['req_number'],
+            'user_name': user_name,
+            'item_count': req['item_count'],
+            'project_text': '', 'project_html': '',
+            'notes_text': '', 'notes_html': '',
+            'date_text': '', 'date_html': ''
+        }
         
         if req.get('project_number'):
             formatted_project = format_project_display(req['project_number'], req.get('sub_project_number'))
-            html_body += f"📋 Project: {formatted_project}<br>"
+            row['project_text'] = f"  📋 Project: {formatted_project}\n"
+            row['project_html'] = f"📋 Project: {formatted_project}<br>"
         
         if req.get('user_notes'):
-            html_body += f"<em>📝 {req['user_notes']}</em><br>"
+            row['notes_text'] = f"  📝 Notes: \"{req['user_notes']}\"\n"
+            row['notes_html'] = f"<em>📝 {req['user_notes']}</em><br>"
         
         if req.get('earliest_date_needed'):
             date_str = _format_date(req['earliest_date_needed'])
             days = _calculate_urgency(req['earliest_date_needed'])
             if days is not None and days <= 5:
-                html_body += f"<span style='color: #f44336;'>📅 Date Needed: {date_str} (⚠️ {days} days!)</span>"
+                urgent_count += 1
+                row['date_text'] = f"  📅 Date Needed: {date_str} (⚠️ {days} days!)\n"
+                row['date_html'] = f"<span style='color: #f44336;'>📅 Date Needed: {date_str} (⚠️ {days} days!)</span>"
             else:
-                html_body += f"📅 Date Needed: {date_str}"
+                row['date_text'] = f"  📅 Date Needed: {date_str}\n"
+                row['date_html'] = f"📅 Date Needed: {date_str}"
         
-        html_body += "</div>"
+        request_rows.append(row)
     
-    # Bundle history
+    # Bundle history section
+    history_text = []
+    history_html = []
     if bundle_data.get('merge_count') or bundle_data.get('rejection_reason'):
-        html_body += "<h3>Bundle History</h3><ul>"
-        html_body += f"<li>✅ Created: {_format_datetime(bundle_data.get('created_at'))}</li>"
+        created = _format_datetime(bundle_data.get('created_at'))
+        history_text.append(f"BUNDLE HISTORY:\n---------------\n✅ Created: {created}\n")
+        history_html.append(f"<h3>Bundle History</h3><ul><li>✅ Created: {created}</li>")
         
         if bundle_data.get('merge_count'):
-            html_body += f"<li>🔄 Updated {bundle_data['merge_count']} time(s) - Last: {_format_datetime(bundle_data.get('last_merged_at'))}</li>"
+            last_merged = _format_datetime(bundle_data.get('last_merged_at'))
+            history_text.append(f"🔄 Updated {bundle_data['merge_count']} time(s) - Last: {last_merged}\n")
+            history_html.append(f"<li>🔄 Updated {bundle_data['merge_count']} time(s) - Last: {last_merged}</li>")
+            if bundle_data.get('merge_reason'):
+                history_text.append(f"   Merge Reason: {bundle_data['merge_reason']}\n")
         
         if bundle_data.get('rejection_reason'):
-            html_body += f"<li style='color: #f44336;'>⚠️ Previously Rejected: {_format_datetime(bundle_data.get('rejected_at'))}<br>"
-            html_body += f"Reason: \"{bundle_data['rejection_reason']}\"</li>"
+            rejected_at = _format_datetime(bundle_data.get('rejected_at'))
+            history_text.append(f"\n⚠️ Previously Rejected: {rejected_at}\n   Reason: \"{bundle_data['rejection_reason']}\"\n")
+            history_html.append(f"<li style='color: #f44336;'>⚠️ Previously Rejected: {rejected_at}<br>"
+                                f"Reason: \"{bundle_data['rejection_reason']}\"</li>")
         
-        html_body += "</ul>"
+        history_text.append("\n")
+        history_html.append("</ul>")
     
-    # Urgency
+    # Urgency indicator
+    urgency_text = ""
+    urgency_html = ""
     if urgent_count > 0:
-        html_body += f"<div style='background-color: #fff3cd; padding: 15px; border-radius: 5px; border-left: 4px solid #ff9800; margin: 20px 0;'>"
-        html_body += f"<strong>⚠️ URGENCY:</strong> {urgent_count} item(s) needed within 5 days!"
-        html_body += "</div>"
-    
-    html_body += """
-        <div style="background-color: #e3f2fd; padding: 15px; border-radius: 5px; margin: 20px 0;">
-            <h3 style="margin-top: 0;">Action Required</h3>
-            <p>Please log in to the system to approve or reject this bundle.</p>
-            <p><a href="https://item-requirement-app-sdgny.streamlit.app/" style="background-color: #2196F3; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px; display: inline-block;">Go to Dashboard</a></p>
-        </div>
-        
-        <p style="color: #999; font-size: 12px; margin-top: 30px;">This is an automated notification from the Procurement System.</p>
-    </body>
-    </html>
-    """
+        urgency_text = f"URGENCY:\n--------\n⚠️ {urgent_count} item(s) needed within 5 days!\n\n"
+        urgency_html = ("<div style='background-color: #fff3cd; padding: 15px; border-radius: 5px; border-left: 4px solid #ff9800; margin: 20px 0;'>"
+                        f"<strong>⚠️ URGENCY:</strong> {urgent_count} item(s) needed within 5 days!</div>")
     
-    return subject, body_text, html_body
+    values = {
+        'bundle_name': bundle_name,
+        'vendor_name': bundle_data.get('vendor_name', 'Unknown Vendor'),
+        'vendor_email': bundle_data.get('vendor_email', 'N/A'),
+        'vendor_phone': bundle_data.get('vendor_phone', 'N/A'),
+        'reviewed_by': bundle_data.get('reviewed_by', 'Operator'),
+        'reviewed_at': _format_datetime(bundle_data.get('reviewed_at')),
+        'item_count': len(items),
+        'total_quantity': bundle_data['total_quantity'],
+        'items_text': _ITEM_TEXT.render_rows(item_rows),
+        'items_html': _ITEM_HTML.render_rows(item_rows),
+        'requests_text': _REQUEST_TEXT.render_rows(request_rows),
+        'requests_html': _REQUEST_HTML.render_rows(request_rows),
+        'history_text': ''.join(history_text),
+        'history_html': ''.join(history_html),
+        'urgency_text': urgency_text,
+        'urgency_html': urgency_html
+    }
+    return subject, _REVIEWED_TEXT.render(values), _REVIEWED_HTML.render(values)
@@ -8,6 +8,8 @@ Operator Email Notifications
 
 import logging
 from email_service import send_email_via_brevo
+from email_templates import EmailTemplate
+from recipient_directory import get_recipient_directory
 
 logger = logging.getLogger("operator_notifications")
 if not logger.handlers:
@@ -16,7 +18,7 @@ if not logger.handlers:
 
 def get_operator_emails(db):
     """
-    Get email addresses of all active operators from database.
+    Get email addresses of all active operators (cached recipient directory).
     
     Args:
         db: DatabaseConnector instance
@@ -29,38 +31,23 @@ def get_operator_emails(db):
         >>> print(emails)
         ['rex@sdgny.com', 'joivel@sdgny.com', 'miguel@sdgny.com']
     """
-    query = """
-    SELECT 
-        email,
-        full_name,
-        username
-    FROM requirements_users
-    WHERE user_role = 'Operator'
-      AND is_active = 1
-      AND email IS NOT NULL
-      AND email != ''
-    ORDER BY full_name
-    """
+    directory = get_recipient_directory(db)
+    if directory is None:
+        return []
     
-    try:
-        results = db.execute_query(query)
-        
-        if not results:
-            logger.info("No active operators found in database")
-            return []
-        
-        # Extract emails and log operator names for transparency
-        emails = [r['email'] for r in results]
-        names = [r.get('full_name') or r.get('username', 'Unknown') for r in results]
-        
-        logger.info(f"Found {len(results)} active operator(s): {', '.join(names)}")
-        logger.info(f"Operator emails: {', '.join(emails)}")
-        
-        return emails
-        
-    except Exception as e:
-        logger.error(f"Error querying operator emails from database: {str(e)}")
+    results = directory.members('Operator')
+    if not results:
+        logger.info("No active operators found in database")
         return []
+    
+    # Extract emails and log operator names for transparency
+    emails = [r['email'] for r in results]
+    names = [r.get('full_name') or r.get('username', 'Unknown') for r in results]
+    
+    logger.info(f"Found {len(results)} active operator(s): {', '.join(names)}")
+    logger.info(f"Operator emails: {', '.join(emails)}")
+    
+    return emails
 
 
 # ========== Bundle Decision Notifications ==========
@@ -97,25 +84,14 @@ def _get_operator_email_by_name(db, full_name):
     if not full_name or full_name == 'Operator':
         return None
     
-    query = """
-    SELECT email, full_name
-    FROM requirements_users
-    WHERE full_name = ?
-      AND user_role = 'Operator'
-      AND is_active = 1
-      AND email IS NOT NULL
-      AND email != ''
-    """
-    try:
-        results = db.execute_query(query, (full_name,))
-        if results:
-            return results[0]['email']
-        else:
-            logger.warning(f"No active operator found with name: {full_name}")
-            return None
-    except Exception as e:
-        logger.error(f"Error getting operator email: {str(e)}")
+    directory = get_recipient_directory(db)
+    if directory is None:
         return None
+    
+    email = directory.email_for_name('Operator', full_name)
+    if not email:
+        logger.warning(f"No active operator found with name: {full_name}")
+    return email
 
 
 def _format_datetime(datetime_value):
@@ -127,45 +103,9 @@ def _format_datetime(datetime_value):
     return str(datetime_value)
 
 
-def send_bundle_approved_notification(db, bundle_id):
-    """
-    Send email to operator when Operation Team approves their bundle
-    
-    Args:
-        db: DatabaseConnector instance
-        bundle_id: ID of approved bundle
-    
-    Returns:
-        bool: True if email sent successfully, False otherwise
-    """
-    try:
-        # Get bundle details
-        bundle = _get_bundle_details_for_operator(db, bundle_id)
-        if not bundle:
-            logger.error(f"Bundle {bundle_id} not found")
-            return False
-        
-        # Get operator email
-        reviewed_by = bundle.get('reviewed_by')
-        if not reviewed_by or reviewed_by == 'Operator':
-            logger.info(f"Bundle {bundle_id} has no specific reviewer; skipping operator notification")
-            return False
-        
-        operator_email = _get_operator_email_by_name(db, reviewed_by)
-        if not operator_email:
-            logger.warning(f"No email found for operator '{reviewed_by}'; skipping notification")
-            return False
-        
-        # Build email content
-        bundle_name = bundle['bundle_name']
-        vendor_name = bundle.get('vendor_name', 'Unknown Vendor')
-        approved_at = _format_datetime(bundle.get('approved_at'))
-        
-        # Subject
-        subject = f"✅ Bundle Approved: {bundle_name}"
-        
-        # Plain text body
-        body_text = f"""Hello {reviewed_by},
+# ========== Email templates (built once per process) ==========
+
+_APPROVED_TEXT = EmailTemplate("""Hello {reviewed_by},
 
 Good news! Your bundle has been approved by the Operation Team.
 
@@ -173,7 +113,7 @@ BUNDLE DETAILS:
 ---------------
 Bundle ID: {bundle_name}
 Vendor: {vendor_name}
-Items: {bundle.get('total_items', 0)} item(s), {bundle.get('total_quantity', 0)} pieces
+Items: {total_items} item(s), {total_quantity} pieces
 Reviewed by: {reviewed_by} (you)
 Approved at: {approved_at}
 
@@ -185,10 +125,10 @@ Dashboard: https://item-requirement-app-sdgny.streamlit.app/
 
 ---
 This is an automated notification from the Procurement System.
-"""
-        
-        # HTML body
-        html_body = f"""
+""")
+
+
+_APPROVED_HTML = EmailTemplate("""
 <html>
 <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
     <h2 style="color: #4CAF50;">✅ Bundle Approved</h2>
@@ -202,7 +142,7 @@ This is an automated notification from the Procurement System.
         <p>
             <strong>Bundle ID:</strong> {bundle_name}<br>
             <strong>Vendor:</strong> {vendor_name}<br>
-            <strong>Items:</strong> {bundle.get('total_items', 0)} item(s), {bundle.get('total_quantity', 0)} pieces<br>
+            <strong>Items:</strong> {total_items} item(s), {total_quantity} pieces<br>
             <strong>Reviewed by:</strong> {reviewed_by} (you)<br>
             <strong>Approved at:</strong> {approved_at}
         </p>
@@ -219,63 +159,10 @@ This is an automated notification from the Procurement System.
     <p style="color: #666; font-size: 0.9em;">This is an automated notification from the Procurement System.</p>
 </body>
 </html>
-"""
-        
-        # Send email
-        sent = send_email_via_brevo(subject, body_text, html_body=html_body, recipients=[operator_email])
-        
-        if sent:
-            logger.info(f"Bundle approved notification sent to {reviewed_by} ({operator_email})")
-            return True
-        else:
-            logger.warning(f"Failed to send bundle approved notification to {operator_email}")
-            return False
-            
-    except Exception as e:
-        logger.error(f"Error sending bundle approved notification: {str(e)}")
-        return False
+""")
 
 
-def send_bundle_rejected_notification(db, bundle_id):
-    """
-    Send email to operator when Operation Team rejects their bundle
-    
-    Args:
-        db: DatabaseConnector instance
-        bundle_id: ID of rejected bundle
-    
-    Returns:
-        bool: True if email sent successfully, False otherwise
-    """
-    try:
-        # Get bundle details
-        bundle = _get_bundle_details_for_operator(db, bundle_id)
-        if not bundle:
-            logger.error(f"Bundle {bundle_id} not found")
-            return False
-        
-        # Get operator email
-        reviewed_by = bundle.get('reviewed_by')
-        if not reviewed_by or reviewed_by == 'Operator':
-            logger.info(f"Bundle {bundle_id} has no specific reviewer; skipping operator notification")
-            return False
-        
-        operator_email = _get_operator_email_by_name(db, reviewed_by)
-        if not operator_email:
-            logger.warning(f"No email found for operator '{reviewed_by}'; skipping notification")
-            return False
-        
-        # Build email content
-        bundle_name = bundle['bundle_name']
-        vendor_name = bundle.get('vendor_name', 'Unknown Vendor')
-        rejected_at = _format_datetime(bundle.get('rejected_at'))
-        rejection_reason = bundle.get('rejection_reason', 'No reason provided')
-        
-        # Subject
-        subject = f"❌ Bundle Rejected: {bundle_name}"
-        
-        # Plain text body
-        body_text = f"""Hello {reviewed_by},
+_REJECTED_TEXT = EmailTemplate("""Hello {reviewed_by},
 
 Your bundle has been rejected by the Operation Team and needs your attention.
 
@@ -283,7 +170,7 @@ BUNDLE DETAILS:
 ---------------
 Bundle ID: {bundle_name}
 Vendor: {vendor_name}
-Items: {bundle.get('total_items', 0)} item(s), {bundle.get('total_quantity', 0)} pieces
+Items: {total_items} item(s), {total_quantity} pieces
 Reviewed by: {reviewed_by} (you)
 Rejected at: {rejected_at}
 
@@ -299,10 +186,10 @@ Dashboard: https://item-requirement-app-sdgny.streamlit.app/
 
 ---
 This is an automated notification from the Procurement System.
-"""
-        
-        # HTML body
-        html_body = f"""
+""")
+
+
+_REJECTED_HTML = EmailTemplate("""
 <html>
 <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
     <h2 style="color: #f44336;">❌ Bundle Rejected</h2>
@@ -316,7 +203,7 @@ This is an automated notification from the Procurement System.
         <p>
             <strong>Bundle ID:</strong> {bundle_name}<br>
             <strong>Vendor:</strong> {vendor_name}<br>
-            <strong>Items:</strong> {bundle.get('total_items', 0)} item(s), {bundle.get('total_quantity', 0)} pieces<br>
+            <strong>Items:</strong> {total_items} item(s), {total_quantity} pieces<br>
             <strong>Reviewed by:</strong> {reviewed_by} (you)<br>
             <strong>Rejected at:</strong> {rejected_at}
         </p>
@@ -338,7 +225,129 @@ This is an automated notification from the Procurement System.
     <p style="color: #666; font-size: 0.9em;">This is an automated notification from the Procurement System.</p>
 </body>
 </html>
-"""
+""")
+
+
+def send_bundle_approved_notification(db, bundle_id):
+    """
+    Send email to operator when Operation Team approves their bundle
+    
+    Args:
+        db: DatabaseConnector instance
+        bundle_id: ID of approved bundle
+    
+    Returns:
+        bool: True if email sent successfully, False otherwise
+    """
+    try:
+        # Get bundle details
+        bundle = _get_bundle_details_for_operator(db, bundle_id)
+        if not bundle:
+            logger.error(f"Bundle {bundle_id} not found")
+            return False
+        
+        # Get operator email
+        reviewed_by = bundle.get('reviewed_by')
+        if not reviewed_by or reviewed_by == 'Operator':
+            logger.info(f"Bundle {bundle_id} has no specific reviewer; skipping operator notification")
+            return False
+        
+        operator_email = _get_operator_email_by_name(db, reviewed_by)
+        if not operator_email:
+            logger.warning(f"No email found for operator '{reviewed_by}'; skipping notification")
+            return False
+        
+        # Build email content
+        bundle_name = bundle['bundle_name']
+        vendor_name = bundle.get('vendor_name', 'Unknown Vendor')
+        approved_at = _format_datetime(bundle.get('approved_at'))
+        
+        values = {
+            'reviewed_by': reviewed_by,
+            'bundle_name': bundle_name,
+            'vendor_name': vendor_name,
+            'total_items': bundle.get('total_items', 0),
+            'total_quantity': bundle.get('total_quantity', 0),
+            'approved_at': approved_at
+        }
+        
+        # Subject
+        subject = f"✅ Bundle Approved: {bundle_name}"
+        
+        # Plain text body
+        body_text = _APPROVED_TEXT.render(values)
+        
+        # HTML body
+        html_body = _APPROVED_HTML.render(values)
+        
+        # Send email
+        sent = send_email_via_brevo(subject, body_text, html_body=html_body, recipients=[operator_email])
+        
+        if sent:
+            logger.info(f"Bundle approved notification sent to {reviewed_by} ({operator_email})")
+            return True
+        else:
+            logger.warning(f"Failed to send bundle approved notification to {operator_email}")
+            return False
+            
+    except Exception as e:
+        logger.error(f"Error sending bundle approved notification: {str(e)}")
+        return False
+
+
+def send_bundle_rejected_notification(db, bundle_id):
+    """
+    Send email to operator when Operation Team rejects their bundle
+    
+    Args:
+        db: DatabaseConnector instance
+        bundle_id: ID of rejected bundle
+    
+    Returns:
+        bool: True if email sent successfully, False otherwise
+    """
+    try:
+        # Get bundle details
+        bundle = _get_bundle_details_for_operator(db, bundle_id)
+        if not bundle:
+            logger.error(f"Bundle {bundle_id} not found")
+            return False
+        
+        # Get operator email
+        reviewed_by = bundle.get('reviewed_by')
+        if not reviewed_by or reviewed_by == 'Operator':
+            logger.info(f"Bundle {bundle_id} has no specific reviewer; skipping operator notification")
+            return False
+        
+        operator_email = _get_operator_email_by_name(db, reviewed_by)
+        if not operator_email:
+            logger.warning(f"No email found for operator '{reviewed_by}'; skipping notification")
+            return False
+        
+        # Build email content
+        bundle_name = bundle['bundle_name']
+        vendor_name = bundle.get('vendor_name', 'Unknown Vendor')
+        rejected_at = _format_datetime(bundle.get('rejected_at'))
+        rejection_reason = bundle.get('rejection_reason', 'No reason provided')
+        
+        values = {
+            'reviewed_by': reviewed_by,
+            'bundle_name': bundle_name,
+            'vendor_name': vendor_name,
+            'total_items': bundle.get('total_items', 0),
+            'total_quantity': bundle.get('total_quantity', 0),
+            'rejected_at': rejected_at,
+            'rejection_reason': rejection_reason
+        }
+        
+        # Subject
+        subject = f"❌ Bundle Rejected: {bundle_name}"
+        
+        # Plain text body
+        body_text = _REJECTED_TEXT.render(values)
+        
+        # HTML body
+        html_body = _REJECTED_HTML.render(values)
         
         # Send email
         sent = send_email_via_brevo(subject, body_text, html_body=html_body, recipients=[operator_email])
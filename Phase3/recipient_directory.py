@@ -0,0 +1,116 @@
+"""
+Recipient directory for Phase 3 notifications
+- One query loads every active Operator / Operation user with an email address
+- Cached per process for RECIPIENT_DIRECTORY_TTL seconds (default 300, 0 disables the cache);
+  an empty directory isn't cached (execute_query also returns [] on errors)
+- The user admin write paths in db_connector call invalidate_recipient_directory() after commit,
+  so role/email/active changes made in this process are picked up on the next notification;
+  other processes (the cron) see them once the TTL expires
+
+Usage:
+    directory = get_recipient_directory(db)
+    if directory is not None:
+        emails = directory.emails_for_role('Operator')
+"""
+
+import os
+import time
+import logging
+import threading
+
+logger = logging.getLogger("recipient_directory")
+
+NOTIFICATION_ROLES = ('Operator', 'Operation')
+DEFAULT_TTL_SECONDS = 300
+
+_lock = threading.Lock()
+_cached = None        # RecipientDirectory
+_cached_at = 0.0      # time.monotonic() when _cached was loaded
+_generation = 0       # bumped on every invalidation so an in-flight load can't overwrite it
+
+
+def directory_ttl_seconds():
+    """RECIPIENT_DIRECTORY_TTL (seconds) - how long a loaded directory is reused"""
+    try:
+        return max(0, int(os.getenv('RECIPIENT_DIRECTORY_TTL', str(DEFAULT_TTL_SECONDS))))
+    except ValueError:
+        return DEFAULT_TTL_SECONDS
+
+
+class RecipientDirectory:
+    """Active notification recipients grouped by role (rows ordered by full_name)"""
+
+    def __init__(self, rows):
+        self._by_role = {}
+        self._by_name = {}
+        self._count = 0
+        for row in rows:
+            email = row.get('email')
+            if not email:
+                continue
+            self._count += 1
+            role = row.get('user_role')
+            self._by_role.setdefault(role, []).append(row)
+            # First match wins, like the old per-name lookup's results[0]
+            self._by_name.setdefault((role, row.get('full_name')), email)
+
+    def __len__(self):
+        return self._count
+
+    def members(self, role):
+        """Rows ({'email', 'full_name', 'username', ...}) for a role"""
+        return list(self._by_role.get(role, []))
+
+    def emails_for_role(self, role):
+        return [row['email'] for row in self._by_role.get(role, [])]
+
+    def email_for_name(self, role, full_name):
+        return self._by_name.get((role, full_name))
+
+
+def _load_directory(db):
+    placeholders = ', '.join('?' for _ in NOTIFICATION_ROLES)
+    query = f"""
+    SELECT user_id, username, full_name, email, user_role
+    FROM requirements_users
+    WHERE user_role IN ({placeholders})
+      AND is_active = 1
+      AND email IS NOT NULL
+      AND email != ''
+    ORDER BY full_name, user_id
+    """
+    return RecipientDirectory(db.execute_query(query, NOTIFICATION_ROLES))
+
+
+def get_recipient_directory(db):
+    """Cached directory, reloaded when stale or invalidated. Returns None if the lookup fails."""
+    global _cached, _cached_at
+    ttl = directory_ttl_seconds()
+    with _lock:
+        if _cached is not None and ttl and time.monotonic() - _cached_at < ttl:
+            return _cached
+        generation = _generation
+
+    try:
+        directory = _load_directory(db)
+    except Exception as e:
+        logger.error(f"Error loading notification recipients: {str(e)}")
+        return None
+
+    if not len(directory):
+        # Empty results aren't cached, so a failed lookup doesn't silence notifications for the TTL
+        return directory
+
+    with _lock:
+        if generation == _generation:
+            _cached = directory
+            _cached_at = time.monotonic()
+    return directory
+
+
+def invalidate_recipient_directory():
+    """Drop the cached directory (call after committing a change to requirements_users)"""
+    global _cached, _generation
+    with _lock:
+        _cached = None
+        _generation += 1
@@ -0,0 +1,227 @@
+"""
+App-wide reference data cache for Phase 3 (Items, Vendors, ItemVendorMap, ProcoreProjectData)
+- One copy per process, shared by every Streamlit session (replaces the per-session item caches)
+- Phase 2 (and Phase 3's own cost updates) bump ReferenceDataVersions when items, vendors or
+  mappings change; the cache reads that table at most every REFERENCE_VERSION_CHECK seconds
+  (default 15) and reloads only the datasets whose tables changed
+- Every dataset is also reloaded after REFERENCE_CACHE_TTL seconds (default 300), which covers
+  changes made outside those apps (Phase 1 imports, manual SQL) and databases without the
+  versions table
+- Cached rows are shared between sessions: callers must treat them as read-only
+- Lookup structures derived from a dataset (e.g. ItemSelectionIndex) are built once per load
+  and dropped with it
+
+Usage:
+    items = get_reference_data(db, 'items')
+    index = get_reference_index(db, 'items', ('selection', 'BoxHero'), build_fn)
+    invalidate_reference_data('ItemVendorMap')   # after a write in this process
+"""
+
+import os
+import time
+import threading
+
+VERSIONS_TABLE = 'ReferenceDataVersions'
+
+# dataset name -> (source tables, query)
+DATASETS = {
+    'items': (('Items',), """
+        SELECT * FROM Items
+    """),
+    'item_vendors': (('ItemVendorMap', 'Vendors', 'Items'), """
+        SELECT ivm.item_id, ivm.vendor_id, v.vendor_name, v.vendor_email as contact_email,
+               v.vendor_phone as contact_phone, i.item_name, ivm.cost
+        FROM ItemVendorMap ivm
+        JOIN Vendors v ON ivm.vendor_id = v.vendor_id
+        JOIN Items i ON ivm.item_id = i.item_id
+        ORDER BY ivm.item_id, v.vendor_name
+    """),
+    'projects': (('ProcoreProjectData',), """
+        SELECT ProjectNumber, ProjectName, ProjectType, ProjectManager, Customer
+        FROM ProcoreProjectData
+        ORDER BY ProjectName
+    """),
+}
+
+_cache_lock = threading.Lock()
+_load_lock = threading.Lock()   # one loader at a time, so 40 sessions don't all reload together
+_cache = {}                     # (dialect, dataset) -> {'rows', 'versions', 'loaded_at'}
+_versions = {}                  # dialect -> ({table: version} or None, checked_at)
+
+
+def _env_seconds(name, default):
+    try:
+        return max(0, int(os.getenv(name, str(default))))
+    except ValueError:
+        return default
+
+
+def cache_ttl_seconds():
+    return _env_seconds('REFERENCE_CACHE_TTL', 300)
+
+
+def version_check_seconds():
+    return _env_seconds('REFERENCE_VERSION_CHECK', 15)
+
+
+def _dialect(db):
+    return getattr(getattr(db, 'backend', None), 'dialect', None)
+
+
+def _table_versions(db):
+    """{table: version} from ReferenceDataVersions (None when the table doesn't exist), rate limited"""
+    dialect = _dialect(db)
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _versions.get(dialect)
+        if cached is not None and now - cached[1] < version_check_seconds():
+            return cached[0]
+
+    versions = None
+    if db.get_table_columns(VERSIONS_TABLE):
+        rows = db.execute_query(f"SELECT table_name, version FROM {VERSIONS_TABLE}")
+        versions = {row['table_name']: row['version'] for row in rows}
+
+    with _cache_lock:
+        _versions[dialect] = (versions, now)
+    return versions
+
+
+def _dataset_versions(versions, tables):
+    if versions is None:
+        return None
+    return tuple(versions.get(table, 0) for table in tables)
+
+
+def _is_fresh(entry, current_versions, now):
+    if entry is None:
+        return False
+    if now - entry['loaded_at'] >= cache_ttl_seconds():
+        return False
+    return current_versions is None or entry['versions'] == current_versions
+
+
+def get_reference_data(db, name):
+    """Rows of a reference dataset (see DATASETS), loaded once per process and shared read-only"""
+    tables, query = DATASETS[name]
+    key = (_dialect(db), name)
+    current_versions = _dataset_versions(_table_versions(db), tables)
+
+    with _cache_lock:
+        entry = _cache.get(key)
+    if _is_fresh(entry, current_versions, time.monotonic()):
+        return entry['rows']
+
+    with _load_lock:
+        # Another session may have reloaded it while we waited
+        with _cache_lock:
+            entry = _cache.get(key)
+        if _is_fresh(entry, current_versions, time.monotonic()):
+            return entry['rows']
+
+        rows = db.execute_query(query)
+        if rows:
+            # Empty results aren't cached (execute_query also returns [] on errors)
+            with _cache_lock:
+                _cache[key] = {'rows': rows, 'versions': current_versions, 'loaded_at': time.monotonic()}
+        return rows
+
+
+def get_reference_index(db, name, key, build):
+    """
+    build(rows) for a dataset, computed once per load and shared like the rows
+    (rebuilt automatically after the dataset reloads)
+    """
+    rows = get_reference_data(db, name)
+    with _cache_lock:
+        entry = _cache.get((_dialect(db), name))
+        if entry is None or entry['rows'] is not rows:
+            entry = None   # not cached (empty result) - build without keeping it
+        elif key in entry.setdefault('indexes', {}):
+            return entry['indexes'][key]
+
+    index = build(rows)
+    if entry is not None:
+        with _cache_lock:
+            entry['indexes'][key] = index
+    return index
+
+
+class ItemSelectionIndex:
+    """
+    Items of one source grouped for the step-by-step selection flows:
+    type -> sorted names, (type, name) -> variants (dimension rows in catalog order)
+    """
+
+    def __init__(self, items):
+        names_by_type = {}
+        variants = {}
+        for item in items:
+            item_type = item.get('item_type')
+            if not item_type:
+                continue
+            item_name = item.get('item_name')
+            if item_name:
+                names_by_type.setdefault(item_type, set()).add(item_name)
+            variants.setdefault((item_type, item_name), []).append(item)
+
+        self.types = sorted({item_type for item_type, _ in variants})
+        self._type_positions = {t: i for i, t in enumerate(self.types)}
+        self._names = {t: sorted(names) for t, names in names_by_type.items()}
+        self._name_positions = {t: {n: i for i, n in enumerate(names)} for t, names in self._names.items()}
+        self._variants = variants
+
+    def type_position(self, item_type):
+        """Position of a type in .types (None if it's no longer in the catalog)"""
+        return self._type_positions.get(item_type)
+
+    def names(self, item_type):
+        return self._names.get(item_type, [])
+
+    def name_position(self, item_type, item_name):
+        return self._name_positions.get(item_type, {}).get(item_name)
+
+    def variants(self, item_type, item_name):
+        """All items with this type and name (different dimensions), in catalog order"""
+        return self._variants.get((item_type, item_name), [])
+
+    def first(self, item_type, item_name):
+        variants = self._variants.get((item_type, item_name))
+        return variants[0] if variants else None
+
+
+def invalidate_reference_data(*tables):
+    """Drop cached datasets built from any of `tables` (all datasets when none are given)"""
+    with _cache_lock:
+        for key in list(_cache):
+            if not tables or set(tables) & set(DATASETS[key[1]][0]):
+                del _cache[key]
+        _versions.clear()
+
+
+def touch_reference_tables(db, *tables):
+    """
+    Bump ReferenceDataVersions for `tables` (after the data change is committed) so every
+    process reloads them, and drop this process's copies right away.
+    """
+    invalidate_reference_data(*tables)
+    if not db.get_table_columns(VERSIONS_TABLE):
+        return
+    try:
+        for table in tables:
+            db.cursor.execute(
+                f"UPDATE {VERSIONS_TABLE} SET version = version + 1, updated_at = GETDATE() WHERE table_name = ?",
+                (table,)
+            )
+            if db.cursor.rowcount == 0:
+                db.cursor.execute(
+                    f"INSERT INTO {VERSIONS_TABLE} (table_name, version, updated_at) VALUES (?, 1, GETDATE())",
+                    (table,)
+                )
+        db.conn.commit()
+    except Exception as e:
+        print(f"Could not bump reference data versions: {str(e)}")
+        try:
+            db.conn.rollback()
+        except Exception:
+            pass
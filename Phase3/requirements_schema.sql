@@ -0,0 +1,155 @@
+-- Phase 3 Requirements System - Consolidated Schema
+-- Current shape of the requirements_* tables (original CREATE TABLEs plus every
+-- ALTER TABLE applied since, see PHASE3_REQUIREMENTS_PLAN.md).
+-- Requires the Phase 1 tables (Vendors, Items, ItemVendorMap) from
+-- "Phase1 (Data instertion to database)/database_setup.sql".
+-- Also loaded by sql_backend.SqliteBackend for offline runs.
+
+-- Phase 1 table additions used by Phase 3
+ALTER TABLE ItemVendorMap ADD last_cost_update DATETIME NULL;
+
+-- Project list (synced from Procore)
+CREATE TABLE ProcoreProjectData (
+    ProjectNumber NVARCHAR(50) PRIMARY KEY,
+    ProjectName NVARCHAR(255) NULL,
+    ProjectType NVARCHAR(100) NULL,
+    ProjectManager NVARCHAR(255) NULL,
+    Customer NVARCHAR(255) NULL
+);
+
+CREATE TABLE requirements_users (
+    user_id INT IDENTITY(1,1) PRIMARY KEY,
+    username NVARCHAR(50) UNIQUE NOT NULL,
+    password_hash NVARCHAR(255) NOT NULL,
+    full_name NVARCHAR(255) NOT NULL,
+    email NVARCHAR(255),
+    department NVARCHAR(100),
+    user_role NVARCHAR(20) DEFAULT 'User',
+    is_active BIT DEFAULT 1,
+    created_at DATETIME2 DEFAULT GETDATE(),
+    last_login DATETIME2
+);
+
+CREATE TABLE requirements_orders (
+    req_id INT IDENTITY(1,1) PRIMARY KEY,
+    user_id INT NOT NULL,
+    req_number NVARCHAR(50) UNIQUE NOT NULL,
+    req_date DATE NOT NULL,
+    status NVARCHAR(20) DEFAULT 'Pending',
+    total_items INT DEFAULT 0,
+    notes NVARCHAR(MAX),
+    bundle_id INT NULL,
+    created_at DATETIME2 DEFAULT GETDATE(),
+    updated_at DATETIME2 DEFAULT GETDATE(),
+    user_notes NVARCHAR(1000) NULL,
+    last_notified_status NVARCHAR(20) NULL,
+    source_type VARCHAR(20) DEFAULT 'User',
+    FOREIGN KEY (user_id) REFERENCES requirements_users(user_id)
+);
+
+CREATE TABLE requirements_order_items (
+    req_item_id INT IDENTITY(1,1) PRIMARY KEY,
+    req_id INT NOT NULL,
+    item_id INT NOT NULL,
+    quantity INT NOT NULL,
+    item_notes NVARCHAR(500),
+    created_at DATETIME2 DEFAULT GETDATE(),
+    project_number VARCHAR(50) NULL,
+    parent_project_id VARCHAR(50) NULL,
+    sub_project_number VARCHAR(50) NULL,
+    date_needed DATE NULL,
+    FOREIGN KEY (req_id) REFERENCES requirements_orders(req_id) ON DELETE CASCADE,
+    FOREIGN KEY (item_id) REFERENCES Items(item_id)
+);
+
+CREATE TABLE requirements_bundles (
+    bundle_id INT IDENTITY(1,1) PRIMARY KEY,
+    bundle_name NVARCHAR(50) NOT NULL,
+    recommended_vendor_id INT NULL,
+    total_items INT DEFAULT 0,
+    total_quantity INT DEFAULT 0,
+    status NVARCHAR(20) DEFAULT 'Active',
+    created_at DATETIME2 DEFAULT GETDATE(),
+    completed_at DATETIME2 NULL,
+    completed_by NVARCHAR(100) NULL,
+    duplicates_reviewed BIT DEFAULT 0,
+    merge_count INT DEFAULT 0,
+    last_merged_at DATETIME NULL,
+    merge_reason NVARCHAR(500) NULL,
+    reviewed_at DATETIME NULL,
+    reviewed_by NVARCHAR(100) NULL,
+    approved_at DATETIME NULL,
+    rejection_reason NVARCHAR(500) NULL,
+    rejected_at DATETIME NULL,
+    rejected_by NVARCHAR(100) NULL,
+    operation_notified_at DATETIME2 NULL,
+    po_number VARCHAR(50) NULL,
+    po_date DATETIME NULL,
+    expected_delivery_date DATE NULL,
+    actual_delivery_date DATE NULL,
+    packing_slip_code VARCHAR(100) NULL,
+    FOREIGN KEY (recommended_vendor_id) REFERENCES Vendors(vendor_id)
+);
+
+-- Status-filtered, keyset-paginated bundle lists, newest first (operator dashboard)
+CREATE INDEX IX_requirements_bundles_status ON requirements_bundles (status, bundle_id DESC);
+
+CREATE TABLE requirements_bundle_items (
+    bundle_item_id INT IDENTITY(1,1) PRIMARY KEY,
+    bundle_id INT NOT NULL,
+    item_id INT NOT NULL,
+    total_quantity INT NOT NULL,
+    user_breakdown NVARCHAR(MAX),
+    size_details NVARCHAR(255) NULL,
+    created_at DATETIME2 DEFAULT GETDATE(),
+    FOREIGN KEY (bundle_id) REFERENCES requirements_bundles(bundle_id) ON DELETE CASCADE,
+    FOREIGN KEY (item_id) REFERENCES Items(item_id)
+);
+
+CREATE TABLE requirements_bundle_mapping (
+    mapping_id INT IDENTITY(1,1) PRIMARY KEY,
+    bundle_id INT NOT NULL,
+    req_id INT NOT NULL,
+    created_at DATETIME2 DEFAULT GETDATE(),
+    FOREIGN KEY (bundle_id) REFERENCES requirements_bundles(bundle_id),
+    FOREIGN KEY (req_id) REFERENCES requirements_orders(req_id),
+    UNIQUE(bundle_id, req_id)
+);
+
+CREATE TABLE requirements_bundle_history (
+    history_id INT IDENTITY(1,1) PRIMARY KEY,
+    bundle_id INT NOT NULL,
+    action NVARCHAR(20) NOT NULL,
+    action_by NVARCHAR(100) NOT NULL,
+    action_at DATETIME2 DEFAULT GETDATE(),
+    notes NVARCHAR(500) NULL,
+    FOREIGN KEY (bundle_id) REFERENCES requirements_bundles(bundle_id)
+);
+
+-- Incremental bundling high-water mark (see SmartBundlingEngine.run_bundling_process(incremental=True))
+CREATE TABLE requirements_bundling_state (
+    state_key NVARCHAR(50) PRIMARY KEY,
+    last_req_id INT NOT NULL DEFAULT 0,
+    last_req_date DATE NULL,
+    updated_at DATETIME2 DEFAULT GETDATE()
+);
+
+-- Notification outbox: emails queued in the same transaction as the status change,
+-- sent afterwards by notification_outbox.drain_outbox (background thread / cron)
+CREATE TABLE requirements_notification_outbox (
+    outbox_id INT IDENTITY(1,1) PRIMARY KEY,
+    notification_type NVARCHAR(30) NOT NULL,
+    req_id INT NULL,
+    bundle_id INT NULL,
+    dedupe_key NVARCHAR(100) NOT NULL,
+    status NVARCHAR(20) DEFAULT 'Pending',
+    attempts INT DEFAULT 0,
+    claim_token NVARCHAR(50) NULL,
+    claimed_at DATETIME2 NULL,
+    last_error NVARCHAR(500) NULL,
+    created_at DATETIME2 DEFAULT GETDATE(),
+    sent_at DATETIME2 NULL
+);
+
+CREATE INDEX IX_notification_outbox_status ON requirements_notification_outbox (status, outbox_id);
+CREATE INDEX IX_notification_outbox_dedupe ON requirements_notification_outbox (dedupe_key, status);
@@ -11,10 +11,12 @@ Exit codes:
 import os
 import sys
 import json
+from contextlib import ExitStack
 from datetime import datetime
 
 # Email service (Brevo SMTP via env vars)
-from email_service import send_email_via_brevo
+from email_service import send_email_via_brevo, batch_mailer
+from email_templates import EmailTemplate
 
 # Operator notifications (dynamic email list from database)
 from operator_notifications import get_operator_emails
@@ -25,7 +27,8 @@ if SCRIPT_DIR not in sys.path:
     sys.path.insert(0, SCRIPT_DIR)
 
 from db_connector import DatabaseConnector
-from bundling_engine import SmartBundlingEngine
+from bundling_engine import SmartBundlingEngine, VERBOSITY_NORMAL
+from notification_outbox import drain_outbox, set_background_drain
 
 
 def log(msg: str):
@@ -60,23 +63,93 @@ def _get_item_dimensions_map(db: DatabaseConnector, result: dict) -> dict:
         return {}
 
 
+# ========== Operator summary email templates (built once per process) ==========
+
+_VENDOR_HEADER_HTML = EmailTemplate("<div style='font-weight:600;margin:12px 0 6px;font-size:16px;'>{vendor}</div>")
+_VENDOR_SUMMARY_HTML = EmailTemplate("<div style='color:#555;margin:0 0 10px;'>Items: {items_count} | Pieces: {total_qty}{contact}</div>")
+_ITEM_ROW_HTML = EmailTemplate(
+    "<tr>"
+    "<td style='padding:6px 8px;border-bottom:1px solid #eee;'>{item_name}</td>"
+    "<td style='padding:6px 8px;border-bottom:1px solid #eee;color:#555;'>{dims}</td>"
+    "<td style='padding:6px 8px;border-bottom:1px solid #eee;text-align:right;'>{quantity}</td>"
+    "</tr>"
+)
+_ITEMS_TABLE_HTML = EmailTemplate(
+    "<table style=\"border-collapse:collapse;width:100%;max-width:900px;\">"
+    "<thead>\n<tr style=\"background:#f6f7f9;\">"
+    "<th style=\"text-align:left;padding:6px 8px;\">Item</th>"
+    "<th style=\"text-align:left;padding:6px 8px;\">Dimensions</th>"
+    "<th style=\"text-align:right;padding:6px 8px;\">Qty</th>"
+    "</tr>\n</thead>"
+    "<tbody>{rows}</tbody>"
+    "</table>"
+)
+_MERGED_BLOCK_HTML = EmailTemplate("""
+            <div style='margin:16px 0;padding:12px;background:#fff3cd;border-left:4px solid #ffc107;'>
+                <div style='font-weight:600;font-size:16px;'>{vendor_name}</div>
+                <div style='color:#666;margin:4px 0;font-size:13px;'>Bundle: {bundle_name}</div>
+                <div style='margin:6px 0;'>
+                    <span style='color:#28a745;font-weight:500;'>Added: {items_added} items</span> | 
+                    <span style='color:#007bff;font-weight:500;'>Updated: {items_updated} items</span>
+                </div>
+                {status_badge}
+            </div>
+            """)
+_MERGED_SECTION_HTML = EmailTemplate("""
+        <h3 style='margin:20px 0 10px;color:#856404;'>Updated Bundles</h3>
+        {blocks}
+        """)
+_NEW_SECTION_HTML = EmailTemplate("""
+        <h3 style='margin:20px 0 10px;color:#004085;'>New Bundles</h3>
+        {blocks}
+        """)
+_SUMMARY_HTML = EmailTemplate("""
+    <div style="font-family:Segoe UI, Arial, sans-serif; font-size:14px; color:#222;">
+      <h2 style="margin:0 0 8px;">Smart Bundling Summary</h2>
+      <div style="margin:6px 0;">New Bundles Created: <strong>{created_count}</strong></div>
+      <div style="margin:6px 0;">Existing Bundles Updated: <strong>{merged_count}</strong></div>
+      <div style="margin:6px 0;">Total Bundles: <strong>{total_bundles}</strong></div>
+      <div style="margin:6px 0;">Requests Processed: {total_requests}</div>
+      <div style="margin:6px 0;">Distinct Items: {distinct_items}</div>
+      <div style="margin:6px 0;">Total Pieces: {pieces_sum}</div>
+      <div style="margin:6px 0 16px;">Coverage: {coverage}%</div>
+      
+      {merged_section_html}
+      {new_bundles_html}
+    </div>
+    """)
+_REVERTED_BADGE_HTML = "<div style='color:#ff6b00;font-weight:600;margin-top:6px;'>⚠️ Reverted to Active for re-review</div>"
+
+
+def _fmt_dim(v):
+    """Format a dimension like the UI does (remove trailing zeros)"""
+    if v is None:
+        return ''
+    s = str(v).strip()
+    if s == '':
+        return ''
+    try:
+        from decimal import Decimal
+        d = Decimal(s)
+        s = format(d.normalize(), 'f')
+    except Exception:
+        pass
+    if '.' in s:
+        s = s.rstrip('0').rstrip('.')
+    return s
+
+
+def _dims_text(dims_map, item_id):
+    """'H x W x T' for an item, '' when unknown"""
+    if not dims_map or item_id not in dims_map:
+        return ''
+    d = dims_map[item_id]
+    parts = [_fmt_dim(d.get('height')), _fmt_dim(d.get('width')), _fmt_dim(d.get('thickness'))]
+    parts = [p for p in parts if p and p.lower() not in ('n/a', 'none', 'null')]
+    return ' x '.join(parts)
+
+
 def _build_email_bodies(result: dict, dims_map: dict | None = None) -> tuple[str, str]:
-    # Local formatter to match UI behavior (remove trailing zeros)
-    def _fmt_dim(v):
-        if v is None:
-            return ''
-        s = str(v).strip()
-        if s == '':
-            return ''
-        try:
-            from decimal import Decimal
-            d = Decimal(s)
-            s = format(d.normalize(), 'f')
-        except Exception:
-            pass
-        if '.' in s:
-            s = s.rstrip('0').rstrip('.')
-        return s
     """Return (plain_text, html) summaries for operator email."""
     total_bundles = result.get("total_bundles", 0)
     total_requests = result.get("total_requests", 0)
@@ -125,126 +198,67 @@ def _build_email_bodies(result: dict, dims_map: dict | None = None) -> tuple[str
     if created_bundles:
         lines.append("NEW BUNDLES:")
     
+    # One pass per bundle builds both the text lines and the HTML block (dimensions formatted once per item)
+    vendor_blocks = []
     for b in bundles:
         vendor = b.get('vendor_name', 'Unknown Vendor')
         items_count = b.get('items_count', len(b.get('items_list') or []))
         total_qty = b.get('total_quantity', 0)
         email = b.get('contact_email') or ''
         phone = b.get('contact_phone') or ''
+        sep = " | " if email and phone else ""
         lines.append(f"- Vendor: {vendor} | Items: {items_count} | Pieces: {total_qty}")
         if email or phone:
-            lines.append(f"  Contact: {email}{' | ' if email and phone else ''}{phone}")
+            lines.append(f"  Contact: {email}{sep}{phone}")
+        
+        rows = []
         for it in b.get('items_list') or []:
-            dims_txt = ""
-            if dims_map and it.get('item_id') in dims_map:
-                d = dims_map[it['item_id']]
-                parts = [_fmt_dim(d.get('height')), _fmt_dim(d.get('width')), _fmt_dim(d.get('thickness'))]
-                parts = [p for p in parts if p and p.lower() not in ('n/a', 'none', 'null')]
-                if parts:
-                    dims_txt = f" ({' x '.join(parts)})"
-            lines.append(f"  • {it.get('item_name', 'Item')}{dims_txt} — {it.get('quantity', 0)} pcs")
+            dims = _dims_text(dims_map, it.get('item_id'))
+            lines.append(f"  • {it.get('item_name', 'Item')}{f' ({dims})' if dims else ''} — {it.get('quantity', 0)} pcs")
+            rows.append({'item_name': it.get('item_name', 'Item'), 'dims': dims, 'quantity': it.get('quantity', 0)})
         lines.append("")
-    plain_text = "\n".join(lines)
-
-    # HTML
-    vendor_blocks = []
-    for b in bundles:
-        vendor = b.get('vendor_name', 'Unknown Vendor')
-        items_count = b.get('items_count', len(b.get('items_list') or []))
-        total_qty = b.get('total_quantity', 0)
-        email = b.get('contact_email') or ''
-        phone = b.get('contact_phone') or ''
-        header = f"<div style='font-weight:600;margin:12px 0 6px;font-size:16px;'>{vendor}</div>"
-        contact = ""
-        if email or phone:
-            sep = " | " if email and phone else ""
-            contact = f"<div style='color:#555;margin:0 0 10px;'>Items: {items_count} | Pieces: {total_qty} | Contact: {email}{sep}{phone}</div>"
-        else:
-            contact = f"<div style='color:#555;margin:0 0 10px;'>Items: {items_count} | Pieces: {total_qty}</div>"
-
+        
         # Build a table per vendor: Item | Dimensions | Quantity
-        row_html = []
-        for it in (b.get('items_list') or []):
-            dims_txt = ''
-            if dims_map and it.get('item_id') in dims_map:
-                d = dims_map[it['item_id']]
-                parts = [_fmt_dim(d.get('height')), _fmt_dim(d.get('width')), _fmt_dim(d.get('thickness'))]
-                parts = [p for p in parts if p and p.lower() not in ('n/a','none','null')]
-                if parts:
-                    dims_txt = ' x '.join(parts)
-            row_html.append(
-                f"<tr>"
-                f"<td style='padding:6px 8px;border-bottom:1px solid #eee;'>{it.get('item_name','Item')}</td>"
-                f"<td style='padding:6px 8px;border-bottom:1px solid #eee;color:#555;'>{dims_txt}</td>"
-                f"<td style='padding:6px 8px;border-bottom:1px solid #eee;text-align:right;'>{it.get('quantity',0)}</td>"
-                f"</tr>"
-            )
-
-        table = (
-            "<table style=\"border-collapse:collapse;width:100%;max-width:900px;\">"
-            "<thead>\n<tr style=\"background:#f6f7f9;\">"
-            "<th style=\"text-align:left;padding:6px 8px;\">Item</th>"
-            "<th style=\"text-align:left;padding:6px 8px;\">Dimensions</th>"
-            "<th style=\"text-align:right;padding:6px 8px;\">Qty</th>"
-            "</tr>\n</thead>"
-            f"<tbody>{''.join(row_html)}</tbody>"
-            "</table>"
-        )
-        vendor_blocks.append(header + contact + table)
+        vendor_blocks.append(''.join([
+            _VENDOR_HEADER_HTML.render(vendor=vendor),
+            _VENDOR_SUMMARY_HTML.render(items_count=items_count, total_qty=total_qty,
+                                        contact=f" | Contact: {email}{sep}{phone}" if email or phone else ""),
+            _ITEMS_TABLE_HTML.render(rows=_ITEM_ROW_HTML.render_rows(rows))
+        ]))
+    plain_text = "\n".join(lines)
 
     # Build merged bundles HTML section
     merged_section_html = ""
     if merged_bundles:
-        merged_blocks = []
-        for merged in merged_bundles:
-            status_badge = ""
-            if merged.get('status_changed'):
-                status_badge = "<div style='color:#ff6b00;font-weight:600;margin-top:6px;'>⚠️ Reverted to Active for re-review</div>"
-            
-            merged_block = f"""
-            <div style='margin:16px 0;padding:12px;background:#fff3cd;border-left:4px solid #ffc107;'>
-                <div style='font-weight:600;font-size:16px;'>{merged['vendor_name']}</div>
-                <div style='color:#666;margin:4px 0;font-size:13px;'>Bundle: {merged['bundle_name']}</div>
-                <div style='margin:6px 0;'>
-                    <span style='color:#28a745;font-weight:500;'>Added: {merged['items_added']} items</span> | 
-                    <span style='color:#007bff;font-weight:500;'>Updated: {merged['items_updated']} items</span>
-                </div>
-                {status_badge}
-            </div>
-            """
-            merged_blocks.append(merged_block)
-        
-        merged_section_html = f"""
-        <h3 style='margin:20px 0 10px;color:#856404;'>Updated Bundles</h3>
-        {''.join(merged_blocks)}
-        """
+        merged_section_html = _MERGED_SECTION_HTML.render(blocks=_MERGED_BLOCK_HTML.render_rows({
+            'vendor_name': merged['vendor_name'],
+            'bundle_name': merged['bundle_name'],
+            'items_added': merged['items_added'],
+            'items_updated': merged['items_updated'],
+            'status_badge': _REVERTED_BADGE_HTML if merged.get('status_changed') else ""
+        } for merged in merged_bundles))
     
     # Build new bundles HTML section
     new_bundles_html = ""
     if created_bundles:
-        new_bundles_html = f"""
-        <h3 style='margin:20px 0 10px;color:#004085;'>New Bundles</h3>
-        {''.join(vendor_blocks) if vendor_blocks else '<div>No new bundles created.</div>'}
-        """
+        new_bundles_html = _NEW_SECTION_HTML.render(
+            blocks=''.join(vendor_blocks) if vendor_blocks else '<div>No new bundles created.</div>'
+        )
     elif vendor_blocks:
         # If no created_bundles list but we have vendor_blocks, show them without header
         new_bundles_html = ''.join(vendor_blocks)
     
-    html = f"""
-    <div style="font-family:Segoe UI, Arial, sans-serif; font-size:14px; color:#222;">
-      <h2 style="margin:0 0 8px;">Smart Bundling Summary</h2>
-      <div style="margin:6px 0;">New Bundles Created: <strong>{len(created_bundles)}</strong></div>
-      <div style="margin:6px 0;">Existing Bundles Updated: <strong>{len(merged_bundles)}</strong></div>
-      <div style="margin:6px 0;">Total Bundles: <strong>{total_bundles}</strong></div>
-      <div style="margin:6px 0;">Requests Processed: {total_requests}</div>
-      <div style="margin:6px 0;">Distinct Items: {distinct_items}</div>
-      <div style="margin:6px 0;">Total Pieces: {pieces_sum}</div>
-      <div style="margin:6px 0 16px;">Coverage: {coverage}%</div>
-      
-      {merged_section_html}
-      {new_bundles_html}
-    </div>
-    """
+    html = _SUMMARY_HTML.render(
+        created_count=len(created_bundles),
+        merged_count=len(merged_bundles),
+        total_bundles=total_bundles,
+        total_requests=total_requests,
+        distinct_items=distinct_items,
+        pieces_sum=pieces_sum,
+        coverage=coverage,
+        merged_section_html=merged_section_html,
+        new_bundles_html=new_bundles_html
+    )
     return plain_text, html
 
 
@@ -258,10 +272,23 @@ def main() -> int:
         return 1
     log("Database connection OK")
 
+    # Queued notifications are drained at the end of this run, not on a background thread
+    set_background_drain(False)
+    mailer_scope = ExitStack()
     try:
         # 2) Run the bundling engine
-        engine = SmartBundlingEngine()
-        result = engine.run_bundling_process()
+        # BUNDLING_VERBOSITY: 0 quiet, 1 summaries (default), 2 full debug analysis
+        # BUNDLING_LOG_PATH: optional JSON-lines event log (written at BUNDLING_LOG_LEVEL, default 1)
+        engine = SmartBundlingEngine(
+            verbosity=int(os.getenv('BUNDLING_VERBOSITY', VERBOSITY_NORMAL)),
+            log_path=os.getenv('BUNDLING_LOG_PATH') or None,
+            log_level=int(os.getenv('BUNDLING_LOG_LEVEL', VERBOSITY_NORMAL))
+        )
+        # User "in progress" notifications and the operator summary share one SMTP session
+        mailer = mailer_scope.enter_context(batch_mailer())
+        # BUNDLING_INCREMENTAL=1: only new Pending lines above the stored high-water mark
+        incremental = os.getenv('BUNDLING_INCREMENTAL', '').strip().lower() in ('1', 'true', 'yes')
+        result = engine.run_bundling_process(incremental=incremental)
 
         if not isinstance(result, dict):
             log("ERROR: Unexpected result type from bundling engine")
@@ -284,6 +311,11 @@ def main() -> int:
         log("Bundling completed successfully")
         log(f"Summary: bundles={total_bundles}, requests={total_requests}, distinct_items={distinct_items}, pieces={total_pieces}, coverage={coverage}%")
 
+        # Frequent incremental runs only email operators when something was bundled
+        if incremental and not total_bundles:
+            log("Incremental run bundled nothing - skipping operator email")
+            return 0
+
         # 4) Send operator summary email if SMTP envs are configured
         try:
             subject = f"Smart Bundling: {total_bundles} bundles | {coverage}% coverage"
@@ -322,6 +354,8 @@ def main() -> int:
         except Exception as e:
             log(f"Email step error: {e}")
 
+        log(f"Email session: sent={mailer.sent}, failed={mailer.failed}, skipped={mailer.skipped}")
+
         # 5) Optional verbose details for CI logs
         debug_info = result.get("debug_info") or {}
         if debug_info:
@@ -337,6 +371,14 @@ def main() -> int:
         log(f"ERROR: Exception during bundling: {e}")
         return 1
     finally:
+        # 6) Send queued notifications (user "in progress" emails etc.) in the same SMTP session
+        try:
+            outbox_stats = drain_outbox(db)
+            if outbox_stats['claimed']:
+                log(f"Notification outbox: {outbox_stats}")
+        except Exception as e:
+            log(f"Notification outbox error: {e}")
+        mailer_scope.close()
         try:
             db.close_connection()
         except Exception:
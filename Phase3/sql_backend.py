@@ -0,0 +1,341 @@
+"""
+SQL backends for DatabaseConnector
+- SqlServerBackend: Azure SQL through the process-wide pyodbc pool (production)
+- SqliteBackend: local stand-in for profiling/load tests without an Azure server
+
+Select with env DB_BACKEND=sqlserver (default) or DB_BACKEND=sqlite.
+SQLITE_DB_PATH sets the SQLite file (default: shared in-memory database).
+
+The SQLite backend loads the Phase 1 schema plus requirements_schema.sql and
+translates the T-SQL idioms used by the app (GETDATE(), DATEADD, TOP n,
+ISNULL, @@IDENTITY, OUTPUT inserted.col) so the existing queries run unchanged.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PHASE1_SCHEMA_PATH = os.path.join(BASE_DIR, '..', 'Phase1 (Data instertion to database)', 'database_setup.sql')
+PHASE3_SCHEMA_PATH = os.path.join(BASE_DIR, 'requirements_schema.sql')
+
+
+class SqlServerBackend:
+    """Azure SQL via pyodbc, connections come from the shared pool"""
+    dialect = 'mssql'
+
+    def __init__(self, server, database, username, password, driver):
+        from connection_pool import get_pool
+        self.pool = get_pool(server, database, username, password, driver)
+
+    def acquire(self):
+        return self.pool.acquire()
+
+    def release(self, conn):
+        self.pool.release(conn)
+
+    def discard(self, conn):
+        self.pool.discard(conn)
+
+
+# ========== T-SQL -> SQLite translation ==========
+
+_DATEADD_UNITS = {
+    'year': 'year', 'yy': 'year', 'yyyy': 'year',
+    'month': 'month', 'mm': 'month', 'm': 'month',
+    'day': 'day', 'dd': 'day', 'd': 'day',
+    'hour': 'hour', 'hh': 'hour',
+    'minute': 'minute', 'mi': 'minute', 'n': 'minute',
+    'second': 'second', 'ss': 'second', 's': 'second',
+}
+
+_TOP_RE = re.compile(r'\bSELECT(\s+DISTINCT)?\s+TOP\s*\(?\s*(\d+)\s*\)?', re.IGNORECASE)
+_DATEADD_RE = re.compile(r'\bDATEADD\s*\(', re.IGNORECASE)
+_SQLITE_NOW = "datetime('now', 'localtime')"
+_OUTPUT_RE = re.compile(r'\s+OUTPUT\s+(inserted\.\w+(?:\s*,\s*inserted\.\w+)*)', re.IGNORECASE)
+
+
+def _find_closing_paren(sql, open_index):
+    """Index of the ')' matching the '(' at open_index (quote-aware)"""
+    depth = 0
+    in_quote = False
+    for i in range(open_index, len(sql)):
+        ch = sql[i]
+        if ch == "'":
+            in_quote = not in_quote
+        elif in_quote:
+            continue
+        elif ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+            if depth == 0:
+                return i
+    raise ValueError(f"Unbalanced parentheses in SQL: {sql[open_index:open_index + 60]}")
+
+
+def _split_args(args_sql):
+    """Split a function argument list on top-level commas"""
+    args = []
+    depth = 0
+    in_quote = False
+    start = 0
+    for i, ch in enumerate(args_sql):
+        if ch == "'":
+            in_quote = not in_quote
+        elif in_quote:
+            continue
+        elif ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        elif ch == ',' and depth == 0:
+            args.append(args_sql[start:i].strip())
+            start = i + 1
+    args.append(args_sql[start:].strip())
+    return args
+
+
+def _scope_end(sql, start):
+    """End of the SELECT scope starting at `start`: first unmatched ')' or ';', else end of string"""
+    depth = 0
+    in_quote = False
+    for i in range(start, len(sql)):
+        ch = sql[i]
+        if ch == "'":
+            in_quote = not in_quote
+        elif in_quote:
+            continue
+        elif ch == '(':
+            depth += 1
+        elif ch == ')':
+            if depth == 0:
+                return i
+            depth -= 1
+        elif ch == ';' and depth == 0:
+            return i
+    return len(sql)
+
+
+def _translate_dateadd(sql):
+    while True:
+        match = _DATEADD_RE.search(sql)
+        if not match:
+            return sql
+        open_index = match.end() - 1
+        close_index = _find_closing_paren(sql, open_index)
+        unit, amount, base = _split_args(sql[open_index + 1:close_index])
+        unit = _DATEADD_UNITS.get(unit.lower(), unit.lower())
+        replacement = f"datetime({base}, ({amount}) || ' {unit}')"
+        sql = sql[:match.start()] + replacement + sql[close_index + 1:]
+
+
+def _translate_top(sql):
+    while True:
+        match = _TOP_RE.search(sql)
+        if not match:
+            return sql
+        limit = match.group(2)
+        head = 'SELECT' + (match.group(1) or '') + ' '
+        sql = sql[:match.start()] + head + sql[match.end():]
+        end = _scope_end(sql, match.start() + len(head))
+        sql = sql[:end].rstrip() + f" LIMIT {limit}" + ('\n' if end < len(sql) else '') + sql[end:]
+
+
+def _translate_output(sql):
+    # UPDATE ... SET ... OUTPUT inserted.a, inserted.b WHERE ...  ->  UPDATE ... WHERE ... RETURNING a, b
+    match = _OUTPUT_RE.search(sql)
+    if not match:
+        return sql
+    columns = re.sub(r'inserted\.', '', match.group(1), flags=re.IGNORECASE)
+    sql = sql[:match.start()] + sql[match.end():]
+    return sql.rstrip().rstrip(';') + f" RETURNING {columns}"
+
+
+@lru_cache(maxsize=1024)
+def translate_tsql(sql):
+    """Translate the T-SQL idioms used by the app into SQLite SQL"""
+    sql = re.sub(r'@@IDENTITY|SCOPE_IDENTITY\(\)', 'last_insert_rowid()', sql, flags=re.IGNORECASE)
+    sql = re.sub(r'\bGETDATE\(\)', _SQLITE_NOW, sql, flags=re.IGNORECASE)
+    sql = re.sub(r'\bISNULL\s*\(', 'IFNULL(', sql, flags=re.IGNORECASE)
+    sql = re.sub(r'\bLEN\s*\(', 'LENGTH(', sql, flags=re.IGNORECASE)
+    sql = _translate_dateadd(sql)
+    sql = _translate_top(sql)
+    sql = _translate_output(sql)
+    return sql
+
+
+def translate_ddl(sql):
+    """Translate a T-SQL schema script into SQLite statements"""
+    sql = '\n'.join(line.split('--', 1)[0] for line in sql.splitlines())
+    sql = re.sub(r'\bINT\s+(?:PRIMARY\s+KEY\s+IDENTITY\s*\(\s*1\s*,\s*1\s*\)|IDENTITY\s*\(\s*1\s*,\s*1\s*\)\s+PRIMARY\s+KEY)',
+                 'INTEGER PRIMARY KEY AUTOINCREMENT', sql, flags=re.IGNORECASE)
+    sql = re.sub(r'\(\s*MAX\s*\)', '', sql, flags=re.IGNORECASE)
+    sql = re.sub(r'\bDEFAULT\s+GETDATE\(\)', f"DEFAULT ({_SQLITE_NOW})", sql, flags=re.IGNORECASE)
+    return [stmt.strip() for stmt in sql.split(';') if stmt.strip()]
+
+
+# ========== SQLite type mapping (match pyodbc return types) ==========
+
+def _convert_datetime(value):
+    text = value.decode()
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return text
+
+
+def _convert_date(value):
+    text = value.decode()
+    try:
+        return date.fromisoformat(text[:10])
+    except ValueError:
+        return text
+
+
+def _convert_decimal(value):
+    return Decimal(value.decode())
+
+
+sqlite3.register_adapter(datetime, lambda v: v.isoformat(sep=' '))
+sqlite3.register_adapter(date, lambda v: v.isoformat())
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_converter('DATETIME', _convert_datetime)
+sqlite3.register_converter('DATETIME2', _convert_datetime)
+sqlite3.register_converter('DATE', _convert_date)
+sqlite3.register_converter('DECIMAL', _convert_decimal)
+
+
+class _SqliteCursor:
+    """pyodbc-style cursor over sqlite3 that translates T-SQL on the way in"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.fast_executemany = False  # Accepted for pyodbc compatibility, no effect on SQLite
+
+    @staticmethod
+    def _params(params):
+        # pyodbc accepts execute(sql, (a, b)), execute(sql, [a, b]) and execute(sql, a, b)
+        if len(params) == 1 and isinstance(params[0], (list, tuple)):
+            return tuple(params[0])
+        return tuple(params)
+
+    def execute(self, sql, *params):
+        self._cursor.execute(translate_tsql(sql), self._params(params))
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._cursor.executemany(translate_tsql(sql), [tuple(p) for p in seq_of_params])
+        return self
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=None):
+        return self._cursor.fetchmany(size) if size else self._cursor.fetchmany()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+
+class _SqliteConnection:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self):
+        return _SqliteCursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+
+class SqliteBackend:
+    """SQLite stand-in loaded with the production schema (for offline profiling and load tests)"""
+    dialect = 'sqlite'
+
+    def __init__(self, path=':memory:', schema_files=None):
+        if path == ':memory:':
+            # Named shared-cache database so every connector in the process sees the same data
+            self.uri = f"file:phase3_{id(self)}?mode=memory&cache=shared"
+        else:
+            self.uri = f"file:{os.path.abspath(path)}"
+        self.schema_files = schema_files or [PHASE1_SCHEMA_PATH, PHASE3_SCHEMA_PATH]
+
+        # Keeps the in-memory database alive for the life of the backend
+        self._anchor = self._connect()
+        if not self._schema_loaded():
+            for schema_file in self.schema_files:
+                self.load_sql_file(schema_file)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.uri, uri=True, detect_types=sqlite3.PARSE_DECLTYPES,
+                               check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    def _schema_loaded(self):
+        row = self._anchor.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'requirements_bundles'"
+        ).fetchone()
+        return row[0] > 0
+
+    def load_sql_file(self, path):
+        """Run a T-SQL DDL/seed script against the SQLite database"""
+        with open(path, encoding='utf-8') as f:
+            statements = translate_ddl(f.read())
+        for statement in statements:
+            self._anchor.execute(translate_tsql(statement))
+        self._anchor.commit()
+
+    def acquire(self):
+        return _SqliteConnection(self._connect())
+
+    def release(self, conn):
+        conn.rollback()
+        conn.close()
+
+    def discard(self, conn):
+        conn.close()
+
+
+_sqlite_backends = {}
+_sqlite_lock = threading.Lock()
+
+
+def get_sqlite_backend(path=':memory:'):
+    """Process-wide SQLite backend per path (all connectors share one database)"""
+    with _sqlite_lock:
+        backend = _sqlite_backends.get(path)
+        if backend is None:
+            backend = SqliteBackend(path)
+            _sqlite_backends[path] = backend
+        return backend
+
+
+def create_backend(server, database, username, password, driver):
+    """Pick the backend from DB_BACKEND (sqlserver by default)"""
+    backend_name = os.getenv('DB_BACKEND', 'sqlserver').strip().lower()
+    if backend_name == 'sqlite':
+        return get_sqlite_backend(os.getenv('SQLITE_DB_PATH', ':memory:'))
+    return SqlServerBackend(server, database, username, password, driver)
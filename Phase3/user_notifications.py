@@ -14,6 +14,7 @@ import os
 import logging
 from datetime import datetime
 from email_service import send_email_via_brevo
+from email_templates import EmailTemplate
 
 logger = logging.getLogger("user_notifications")
 
@@ -29,7 +30,11 @@ if not logger.handlers:
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 
-def send_user_notification(db, req_id, notification_type, bundle_data=None):
+# SQL Server allows at most 2100 parameters per statement
+IN_CHUNK_SIZE = 1000
+
+
+def send_user_notification(db, req_id, notification_type, bundle_data=None, check_last_notified=True):
     """
     Send email notification to user about request status change
     
@@ -38,117 +43,262 @@ def send_user_notification(db, req_id, notification_type, bundle_data=None):
         req_id: Request ID
         notification_type: 'in_progress', 'ordered', or 'completed'
         bundle_data: Optional dict with bundle info (for ordered/completed emails)
+        check_last_notified: Skip if last_notified_status already matches (the notification
+            outbox passes False - it dedupes by its own key)
     
     Returns:
         bool: True if email sent successfully, False otherwise
     """
+    return send_user_notifications(
+        db, [req_id], notification_type,
+        bundle_data_by_request={req_id: bundle_data},
+        check_last_notified=check_last_notified
+    ).get(req_id, False)
+
+
+def send_user_notifications(db, req_ids, notification_type, bundle_data_by_request=None,
+                            check_last_notified=True, context=None, digest=False):
+    """
+    Send status emails for many requests, rendered from a prefetched snapshot
+    (three IN (...) queries for the whole batch instead of three queries per request)
+    
+    Args:
+        db: DatabaseConnector instance
+        req_ids: Request IDs
+        notification_type: 'in_progress', 'ordered', or 'completed'
+        bundle_data_by_request: Optional {req_id: bundle_data} for ordered/completed emails
+        check_last_notified: Skip requests whose last_notified_status already matches
+        context: Optional result of prefetch_notification_context (loaded here if omitted)
+        digest: One email per user covering all of their requests
+    
+    Returns:
+        dict: {req_id: True if email sent}
+    """
+    req_ids = list(dict.fromkeys(req_ids))
+    bundle_data_by_request = bundle_data_by_request or {}
+    results = send_status_notifications(
+        db, [(req_id, notification_type) for req_id in req_ids],
+        bundle_data={(req_id, notification_type): data for req_id, data in bundle_data_by_request.items()},
+        check_last_notified=check_last_notified, context=context, digest=digest
+    )
+    return {req_id: results[(req_id, notification_type)] for req_id in req_ids}
+
+
+def send_status_notifications(db, notifications, bundle_data=None, check_last_notified=True,
+                              context=None, digest=False):
+    """
+    Send status emails for (req_id, notification_type) pairs, possibly of several types
+    
+    With digest=True a user with several status changes gets one email made of the
+    regular per-request sections instead of one email per request.
+    
+    Args:
+        notifications: [(req_id, notification_type), ...]
+        bundle_data: Optional {(req_id, notification_type): bundle_data}
+    
+    Returns:
+        dict: {(req_id, notification_type): True if email sent}
+    """
+    notifications = list(dict.fromkeys(notifications))
+    results = dict.fromkeys(notifications, False)
+    if not notifications:
+        return results
+    
+    try:
+        if context is None:
+            context = prefetch_notification_context(db, {req_id for req_id, _ in notifications})
+    except Exception as e:
+        logger.error(f"Error loading notification context for {len(notifications)} notification(s): {str(e)}")
+        return results
+    
+    bundle_data = bundle_data or {}
+    prepared = []  # (key, user, request, section)
+    for key in notifications:
+        req_id, notification_type = key
+        email = _prepare_email(context, req_id, notification_type, bundle_data.get(key), check_last_notified)
+        if email:
+            prepared.append((key, *email))
+    
+    if digest:
+        by_user = {}
+        for entry in prepared:
+            by_user.setdefault(entry[1]['user_id'], []).append(entry)
+        batches = list(by_user.values())
+    else:
+        batches = [[entry] for entry in prepared]
+    
+    for batch in batches:
+        user = batch[0][1]
+        if len(batch) == 1:
+            subject, body_text, html_body = _build_email(user, batch[0][3])
+        else:
+            subject, body_text, html_body = _build_digest_email(user, [entry[3] for entry in batch])
+        
+        try:
+            # Send email via Brevo to user's email address
+            email_sent = send_email_via_brevo(subject, body_text, html_body, recipients=[user['email']])
+        except Exception as e:
+            logger.error(f"Error sending notification to {user['email']}: {str(e)}")
+            email_sent = False
+        
+        req_numbers = ', '.join(f"{entry[2]['req_number']} ({entry[0][1]})" for entry in batch)
+        if email_sent:
+            for entry in batch:
+                results[entry[0]] = True
+            logger.info(f"✅ Email sent to {user['email']} for request {req_numbers}")
+        else:
+            logger.error(f"❌ Failed to send email for request {req_numbers}")
+    
+    notified_by_type = {}
+    for (req_id, notification_type), sent in results.items():
+        if sent:
+            notified_by_type.setdefault(notification_type, []).append(req_id)
+    try:
+        for notification_type, req_ids in notified_by_type.items():
+            _update_notification_statuses(db, req_ids, notification_type)
+    except Exception as e:
+        logger.error(f"Error updating last_notified_status: {str(e)}")
+    return results
+
+
+def _prepare_email(context, req_id, notification_type, bundle_data, check_last_notified):
+    """Build one request's email section from the prefetched snapshot: (user, request, section) or None"""
     try:
-        # Get request details
-        request = _get_request_details(db, req_id)
+        request = context['requests'].get(req_id)
         
         if not request:
             logger.warning(f"Request {req_id} not found")
-            return False
+            return None
         
         # Skip BoxHero requests (no user email)
         if request.get('source_type') == 'BoxHero':
             logger.info(f"Skipping notification for BoxHero request {req_id}")
-            return False
+            return None
         
         # Get user details
-        user = _get_user_details(db, request['user_id'])
+        user = context['users'].get(request['user_id'])
         
         if not user or not user.get('email'):
             logger.warning(f"User email not found for request {req_id}")
-            return False
+            return None
         
         # Check if already notified for this status
-        if request.get('last_notified_status') == notification_type:
+        if check_last_notified and request.get('last_notified_status') == notification_type:
             logger.info(f"User already notified for {notification_type} status (req_id: {req_id})")
-            return False
+            return None
         
         # Get request items
-        items = _get_request_items(db, req_id)
+        items = context['items'].get(req_id)
         
         if not items:
             logger.warning(f"No items found for request {req_id}")
-            return False
+            return None
         
         # Build email content based on notification type
         if notification_type == 'in_progress':
-            subject, body_text, html_body = _build_in_progress_email(user, request, items)
+            section = _build_in_progress_section(request, items)
         elif notification_type == 'ordered':
-            subject, body_text, html_body = _build_ordered_email(user, request, items, bundle_data)
+            section = _build_ordered_section(request, items, bundle_data)
         elif notification_type == 'completed':
-            subject, body_text, html_body = _build_completed_email(user, request, items, bundle_data)
+            section = _build_completed_section(request, items, bundle_data)
         else:
             logger.error(f"Invalid notification type: {notification_type}")
-            return False
-        
-        # Send email via Brevo to user's email address
-        email_sent = send_email_via_brevo(subject, body_text, html_body, recipients=[user['email']])
-        
-        if email_sent:
-            # Update last_notified_status
-            _update_notification_status(db, req_id, notification_type)
-            logger.info(f"✅ Email sent to {user['email']} for request {request['req_number']} ({notification_type})")
-            return True
-        else:
-            logger.error(f"❌ Failed to send email for request {req_id}")
-            return False
+            return None
+        return user, request, section
             
     except Exception as e:
-        logger.error(f"Error sending notification for request {req_id}: {str(e)}")
+        logger.error(f"Error building notification for request {req_id}: {str(e)}")
         import traceback
         traceback.print_exc()
-        return False
+        return None
 
 
-def _get_request_details(db, req_id):
-    """Get request details from database"""
-    query = """
-    SELECT req_id, user_id, req_number, req_date, status, 
-           source_type, last_notified_status, user_notes
-    FROM requirements_orders
-    WHERE req_id = ?
-    """
-    results = db.execute_query(query, (req_id,))
-    return results[0] if results else None
-
+# ========== Set-based context loading ==========
 
-def _get_user_details(db, user_id):
-    """Get user details including email"""
-    query = """
-    SELECT user_id, username, full_name, email, department
-    FROM requirements_users
-    WHERE user_id = ?
-    """
-    results = db.execute_query(query, (user_id,))
-    return results[0] if results else None
-
-
-def _get_request_items(db, req_id):
-    """Get items for a request"""
-    query = """
-    SELECT 
-        ri.quantity, ri.project_number, ri.sub_project_number, ri.date_needed,
-        i.item_name, i.sku
-    FROM requirements_order_items ri
-    JOIN items i ON ri.item_id = i.item_id
-    WHERE ri.req_id = ?
-    ORDER BY i.item_name
-    """
-    return db.execute_query(query, (req_id,))
+def _chunks(values, size=IN_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
 
 
-def _update_notification_status(db, req_id, notification_type):
-    """Update last_notified_status to prevent duplicate emails"""
-    query = """
-    UPDATE requirements_orders
-    SET last_notified_status = ?
-    WHERE req_id = ?
+def prefetch_notification_context(db, req_ids):
     """
-    db.execute_insert(query, (notification_type, req_id))
+    Load everything the status emails need for many requests at once
+    
+    Returns:
+        dict: {'requests': {req_id: request}, 'users': {user_id: user}, 'items': {req_id: [items]}}
+    """
+    requests = _get_requests_details(db, req_ids)
+    user_ids = {request['user_id'] for request in requests.values()}
+    return {
+        'requests': requests,
+        'users': _get_users_details(db, user_ids),
+        'items': _get_requests_items(db, requests.keys())
+    }
+
+
+def _get_requests_details(db, req_ids):
+    """Get request details from database, keyed by req_id"""
+    requests = {}
+    for chunk in _chunks(req_ids):
+        placeholders = ','.join('?' for _ in chunk)
+        query = f"""
+        SELECT req_id, user_id, req_number, req_date, status, 
+               source_type, last_notified_status, user_notes
+        FROM requirements_orders
+        WHERE req_id IN ({placeholders})
+        """
+        for row in db.execute_query(query, tuple(chunk)):
+            requests[row['req_id']] = row
+    return requests
+
+
+def _get_users_details(db, user_ids):
+    """Get user details including email, keyed by user_id"""
+    users = {}
+    for chunk in _chunks(user_ids):
+        placeholders = ','.join('?' for _ in chunk)
+        query = f"""
+        SELECT user_id, username, full_name, email, department
+        FROM requirements_users
+        WHERE user_id IN ({placeholders})
+        """
+        for row in db.execute_query(query, tuple(chunk)):
+            users[row['user_id']] = row
+    return users
+
+
+def _get_requests_items(db, req_ids):
+    """Get items for many requests, {req_id: [items]} ordered by item name"""
+    items = {}
+    for chunk in _chunks(req_ids):
+        placeholders = ','.join('?' for _ in chunk)
+        query = f"""
+        SELECT 
+            ri.req_id, ri.quantity, ri.project_number, ri.sub_project_number, ri.date_needed,
+            i.item_name, i.sku
+        FROM requirements_order_items ri
+        JOIN items i ON ri.item_id = i.item_id
+        WHERE ri.req_id IN ({placeholders})
+        ORDER BY ri.req_id, i.item_name
+        """
+        for row in db.execute_query(query, tuple(chunk)):
+            items.setdefault(row['req_id'], []).append(row)
+    return items
+
+
+def _update_notification_statuses(db, req_ids, notification_type):
+    """Update last_notified_status to prevent duplicate emails (one UPDATE per chunk)"""
+    if not req_ids:
+        return
+    for chunk in _chunks(req_ids):
+        placeholders = ','.join('?' for _ in chunk)
+        query = f"""
+        UPDATE requirements_orders
+        SET last_notified_status = ?
+        WHERE req_id IN ({placeholders})
+        """
+        db.execute_insert(query, (notification_type, *chunk))
     db.conn.commit()
 
 
@@ -166,102 +316,90 @@ def _format_date(date_value):
         return str(date_value)
 
 
-def _build_in_progress_email(user, request, items):
-    """Build email for 'In Progress' status"""
-    
-    subject = "Your Material Request is Being Processed"
-    
-    # Build items list
-    items_text = ""
-    items_html = ""
-    
-    for idx, item in enumerate(items, 1):
-        # Plain text version
-        items_text += f"\n{idx}. {item['item_name']}"
-        if item.get('sku'):
-            items_text += f" (SKU: {item['sku']})"
-        items_text += f"\n   Quantity: {item['quantity']} pieces"
-        
-        if item.get('project_number'):
-            formatted_project = format_project_display(item['project_number'], item.get('sub_project_number'))
-            items_text += f"\n   Project: {formatted_project}"
-        
-        if item.get('date_needed'):
-            items_text += f"\n   Needed by: {_format_date(item['date_needed'])}"
-        
-        items_text += "\n"
-        
-        # HTML version
-        items_html += f"""
+# ========== Email templates (built once per process) ==========
+
+_FOOTER_TEXT = """
+---
+This is an automated notification from the Requirements Management System.
+"""
+
+# Every status email is a body section inside this greeting and footer (the digest wraps
+# several sections in its own)
+_EMAIL_TEXT = EmailTemplate("""
+Hi {full_name},
+
+{body}
+""" + _FOOTER_TEXT)
+
+_EMAIL_HTML = EmailTemplate("""
+    <html>
+    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+        <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+            <h2 style="color: {title_color};">{title}</h2>
+            
+            <p>Hi {full_name},</p>
+            
+            {body}
+            
+            <hr style="border: none; border-top: 1px solid #ddd; margin: 30px 0;">
+            <p style="font-size: 12px; color: #666;">This is an automated notification from the Requirements Management System.</p>
+        </div>
+    </body>
+    </html>
+    """)
+
+_IN_PROGRESS_ITEM_TEXT = EmailTemplate("\n{idx}. {item_name}{sku_text}\n   Quantity: {quantity} pieces{project_text}{needed_text}\n")
+
+_IN_PROGRESS_ITEM_HTML = EmailTemplate("""
         <tr>
             <td style="padding: 8px; border-bottom: 1px solid #eee;">{idx}</td>
             <td style="padding: 8px; border-bottom: 1px solid #eee;">
-                <strong>{item['item_name']}</strong>
-                {f"<br><small style='color: #666;'>SKU: {item['sku']}</small>" if item.get('sku') else ""}
+                <strong>{item_name}</strong>
+                {sku_html}
             </td>
-            <td style="padding: 8px; border-bottom: 1px solid #eee;">{item['quantity']} pcs</td>
+            <td style="padding: 8px; border-bottom: 1px solid #eee;">{quantity} pcs</td>
             <td style="padding: 8px; border-bottom: 1px solid #eee;">
-                {format_project_display(item.get('project_number', '—'), item.get('sub_project_number'))}
+                {project}
             </td>
             <td style="padding: 8px; border-bottom: 1px solid #eee;">
-                {_format_date(item.get('date_needed'))}
+                {date_needed}
             </td>
         </tr>
-        """
-    
-    # Build notes section if exists
-    notes_text = ""
-    if request.get('user_notes') and request['user_notes'].strip():
-        notes_text = f"\n\nYOUR NOTES:\n{request['user_notes']}\n"
-    
-    # Plain text body
-    body_text = f"""
-Hi {user['full_name']},
+        """)
 
-Your material request has been received and is now being processed.
+_IN_PROGRESS_NOTES_HTML = EmailTemplate("""
+            <div style="background-color: #e3f2fd; padding: 15px; border-radius: 5px; margin: 20px 0; border-left: 4px solid #2c5aa0;">
+                <h3 style="margin-top: 0; color: #2c5aa0;">📝 Your Notes</h3>
+                <p style="margin: 5px 0; white-space: pre-wrap;">{user_notes}</p>
+            </div>
+            """)
+
+_IN_PROGRESS_TEXT = EmailTemplate("""Your material request has been received and is now being processed.
 
 REQUEST DETAILS:
-Request Number: {request['req_number']}
-Submitted: {_format_date(request['req_date'])}
+Request Number: {req_number}
+Submitted: {submitted}
 Status: In Progress
-Total Items: {len(items)}
+Total Items: {item_count}
 {notes_text}
 ITEMS REQUESTED:
 {items_text}
 
 We'll notify you when your items are ordered.
 
-If you have any questions, please contact the procurement team.
+If you have any questions, please contact the procurement team.""")
 
----
-This is an automated notification from the Requirements Management System.
-"""
-    
-    # HTML body
-    html_body = f"""
-    <html>
-    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-        <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-            <h2 style="color: #2c5aa0;">Your Material Request is Being Processed</h2>
-            
-            <p>Hi {user['full_name']},</p>
-            
-            <p>Your material request has been received and is now being processed.</p>
+_IN_PROGRESS_HTML = EmailTemplate("""<p>Your material request has been received and is now being processed.</p>
             
             <div style="background-color: #f5f5f5; padding: 15px; border-radius: 5px; margin: 20px 0;">
                 <h3 style="margin-top: 0; color: #2c5aa0;">Request Details</h3>
-                <p style="margin: 5px 0;"><strong>Request Number:</strong> {request['req_number']}</p>
-                <p style="margin: 5px 0;"><strong>Submitted:</strong> {_format_date(request['req_date'])}</p>
+                <p style="margin: 5px 0;"><strong>Request Number:</strong> {req_number}</p>
+                <p style="margin: 5px 0;"><strong>Submitted:</strong> {submitted}</p>
                 <p style="margin: 5px 0;"><strong>Status:</strong> <span style="color: #ff9800; font-weight: bold;">In Progress</span></p>
-                <p style="margin: 5px 0;"><strong>Total Items:</strong> {len(items)}</p>
+                <p style="margin: 5px 0;"><strong>Total Items:</strong> {item_count}</p>
             </div>
             
-            {f'''
-            <div style="background-color: #e3f2fd; padding: 15px; border-radius: 5px; margin: 20px 0; border-left: 4px solid #2c5aa0;">
-                <h3 style="margin-top: 0; color: #2c5aa0;">📝 Your Notes</h3>
-                <p style="margin: 5px 0; white-space: pre-wrap;">{request['user_notes']}</p>
-            </div>
-            ''' if request.get('user_notes') and request['user_notes'].strip() else ''}
+            {notes_html}
             
             <h3 style="color: #2c5aa0;">Items Requested</h3>
             <table style="width: 100%; border-collapse: collapse; margin: 20px 0;">
@@ -281,72 +419,31 @@ This is an automated notification from the Requirements Management System.
             
             <p style="margin-top: 30px;">We'll notify you when your items are ordered.</p>
             
-            <p>If you have any questions, please contact the procurement team.</p>
-            
-            <hr style="border: none; border-top: 1px solid #ddd; margin: 30px 0;">
-            <p style="font-size: 12px; color: #666;">This is an automated notification from the Requirements Management System.</p>
-        </div>
-    </body>
-    </html>
-    """
-    
-    return subject, body_text, html_body
+            <p>If you have any questions, please contact the procurement team.</p>""")
 
+# Item lines shared by the ordered and completed emails
+_SIMPLE_ITEM_TEXT = EmailTemplate("\n{idx}. {item_name} - {quantity} pieces")
 
-def _build_ordered_email(user, request, items, bundle_data):
-    """Build email for 'Ordered' status"""
-    
-    subject = "📦 Your Items Have Been Ordered"
-    
-    # Get bundles info (can be multiple bundles)
-    bundles = bundle_data.get('bundles', []) if bundle_data else []
-    
-    # If no bundles data (backward compatibility), use old format
-    if not bundles:
-        po_number = bundle_data.get('po_number', 'TBD') if bundle_data else 'TBD'
-        po_date = bundle_data.get('po_date') if bundle_data else None
-        expected_delivery = bundle_data.get('expected_delivery_date') if bundle_data else None
-        bundles = [{'po_number': po_number, 'po_date': po_date, 'expected_delivery_date': expected_delivery}]
-    
-    # Build items list (simpler for ordered email)
-    items_text = ""
-    items_html = ""
-    
-    for idx, item in enumerate(items, 1):
-        items_text += f"\n{idx}. {item['item_name']} - {item['quantity']} pieces"
-        
-        items_html += f"""
+_SIMPLE_ITEM_HTML = EmailTemplate("""
         <tr>
             <td style="padding: 8px; border-bottom: 1px solid #eee;">{idx}</td>
-            <td style="padding: 8px; border-bottom: 1px solid #eee;"><strong>{item['item_name']}</strong></td>
-            <td style="padding: 8px; border-bottom: 1px solid #eee;">{item['quantity']} pcs</td>
+            <td style="padding: 8px; border-bottom: 1px solid #eee;"><strong>{item_name}</strong></td>
+            <td style="padding: 8px; border-bottom: 1px solid #eee;">{quantity} pcs</td>
         </tr>
-        """
-    
-    # Build bundles info text
-    bundles_text = ""
-    if len(bundles) > 1:
-        bundles_text = f"\n\nYour items have been ordered from {len(bundles)} vendors:\n"
-        for idx, bundle in enumerate(bundles, 1):
-            bundles_text += f"\nOrder {idx}:"
-            bundles_text += f"\n  PO Number: {bundle.get('po_number', 'TBD')}"
-            if bundle.get('expected_delivery_date'):
-                bundles_text += f"\n  Expected Delivery: {_format_date(bundle['expected_delivery_date'])}"
-    else:
-        bundle = bundles[0] if bundles else {}
-        bundles_text = f"\n\nORDER INFORMATION:"
-        bundles_text += f"\nPO Number: {bundle.get('po_number', 'TBD')}"
-        if bundle.get('expected_delivery_date'):
-            bundles_text += f"\nExpected Delivery: {_format_date(bundle['expected_delivery_date'])}"
-    
-    # Plain text body
-    body_text = f"""
-Hi {user['full_name']},
+        """)
+
+_ORDERED_BUNDLE_HTML = EmailTemplate("""
+            <div style="background-color: #e8f5e9; padding: 15px; border-radius: 5px; margin: 20px 0; border-left: 4px solid #4CAF50;">
+                <h3 style="margin-top: 0; color: #2e7d32;">Order {label} Information</h3>
+                <p style="margin: 5px 0;"><strong>PO Number:</strong> {po_number}</p>
+                <p style="margin: 5px 0;"><strong>Expected Delivery:</strong> {expected_delivery}</p>
+            </div>
+            """)
 
-Great news! Your material request has been ordered.
+_ORDERED_TEXT = EmailTemplate("""Great news! Your material request has been ordered.
 
 REQUEST DETAILS:
-Request Number: {request['req_number']}
+Request Number: {req_number}
 Status: Ordered
 {bundles_text}
 
@@ -355,36 +452,17 @@ ITEMS ORDERED:
 
 We'll notify you when your items arrive.
 
-If you have any questions, please contact the procurement team.
+If you have any questions, please contact the procurement team.""")
 
----
-This is an automated notification from the Requirements Management System.
-"""
-    
-    # HTML body
-    html_body = f"""
-    <html>
-    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-        <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-            <h2 style="color: #4CAF50;">📦 Your Items Have Been Ordered</h2>
-            
-            <p>Hi {user['full_name']},</p>
-            
-            <p>Great news! Your material request has been ordered.</p>
+_ORDERED_HTML = EmailTemplate("""<p>Great news! Your material request has been ordered.</p>
             
             <div style="background-color: #f5f5f5; padding: 15px; border-radius: 5px; margin: 20px 0;">
                 <h3 style="margin-top: 0; color: #4CAF50;">Request Details</h3>
-                <p style="margin: 5px 0;"><strong>Request Number:</strong> {request['req_number']}</p>
+                <p style="margin: 5px 0;"><strong>Request Number:</strong> {req_number}</p>
                 <p style="margin: 5px 0;"><strong>Status:</strong> <span style="color: #4CAF50; font-weight: bold;">Ordered</span></p>
             </div>
             
-            {''.join([f'''
-            <div style="background-color: #e8f5e9; padding: 15px; border-radius: 5px; margin: 20px 0; border-left: 4px solid #4CAF50;">
-                <h3 style="margin-top: 0; color: #2e7d32;">Order {idx if len(bundles) > 1 else ""} Information</h3>
-                <p style="margin: 5px 0;"><strong>PO Number:</strong> {bundle.get('po_number', 'TBD')}</p>
-                <p style="margin: 5px 0;"><strong>Expected Delivery:</strong> {_format_date(bundle.get('expected_delivery_date')) if bundle.get('expected_delivery_date') else 'TBD'}</p>
-            </div>
-            ''' for idx, bundle in enumerate(bundles, 1)])}
+            {bundles_html}
             
             <h3 style="color: #4CAF50;">Items Ordered</h3>
             <table style="width: 100%; border-collapse: collapse; margin: 20px 0;">
@@ -402,73 +480,20 @@ This is an automated notification from the Requirements Management System.
             
             <p style="margin-top: 30px;">We'll notify you when your items arrive.</p>
             
-            <p>If you have any questions, please contact the procurement team.</p>
-            
-            <hr style="border: none; border-top: 1px solid #ddd; margin: 30px 0;">
-            <p style="font-size: 12px; color: #666;">This is an automated notification from the Requirements Management System.</p>
-        </div>
-    </body>
-    </html>
-    """
-    
-    return subject, body_text, html_body
-
+            <p>If you have any questions, please contact the procurement team.</p>""")
 
-def _build_completed_email(user, request, items, bundle_data):
-    """Build email for 'Completed' status"""
-    
-    subject = "✅ Your Items Are Ready for Pickup!"
-    
-    # Get bundles info (can be multiple bundles)
-    bundles = bundle_data.get('bundles', []) if bundle_data else []
-    
-    # If no bundles data (backward compatibility), use old format
-    if not bundles:
-        actual_delivery = bundle_data.get('actual_delivery_date') if bundle_data else None
-        packing_slip = bundle_data.get('packing_slip_code', 'N/A') if bundle_data else 'N/A'
-        bundles = [{'packing_slip_code': packing_slip, 'actual_delivery_date': actual_delivery}]
-    
-    # Build items list
-    items_text = ""
-    items_html = ""
-    
-    for idx, item in enumerate(items, 1):
-        items_text += f"\n{idx}. {item['item_name']} - {item['quantity']} pieces"
-        
-        items_html += f"""
-        <tr>
-            <td style="padding: 8px; border-bottom: 1px solid #eee;">{idx}</td>
-            <td style="padding: 8px; border-bottom: 1px solid #eee;"><strong>{item['item_name']}</strong></td>
-            <td style="padding: 8px; border-bottom: 1px solid #eee;">{item['quantity']} pcs</td>
-        </tr>
-        """
-    
-    # Build bundles info text
-    bundles_text = ""
-    if len(bundles) > 1:
-        bundles_text = f"\n\nYour items arrived in {len(bundles)} deliveries:\n"
-        for idx, bundle in enumerate(bundles, 1):
-            bundles_text += f"\nDelivery {idx}:"
-            if bundle.get('packing_slip_code'):
-                bundles_text += f"\n  Packing Slip: {bundle['packing_slip_code']}"
-            if bundle.get('actual_delivery_date'):
-                bundles_text += f"\n  Delivery Date: {_format_date(bundle['actual_delivery_date'])}"
-    else:
-        bundle = bundles[0] if bundles else {}
-        bundles_text = f"\n\nDELIVERY INFORMATION:"
-        if bundle.get('packing_slip_code'):
-            bundles_text += f"\nPacking Slip: {bundle['packing_slip_code']}"
-        if bundle.get('actual_delivery_date'):
-            bundles_text += f"\nDelivery Date: {_format_date(bundle['actual_delivery_date'])}"
-    
-    # Plain text body
-    body_text = f"""
-Hi {user['full_name']},
+_COMPLETED_BUNDLE_HTML = EmailTemplate("""
+            <div style="background-color: #e8f5e9; padding: 15px; border-radius: 5px; margin: 20px 0; border-left: 4px solid #4CAF50;">
+                <h3 style="margin-top: 0; color: #2e7d32;">Delivery {label} Information</h3>
+                <p style="margin: 5px 0;"><strong>Packing Slip:</strong> {packing_slip_code}</p>
+                <p style="margin: 5px 0;"><strong>Delivery Date:</strong> {delivery_date}</p>
+            </div>
+            """)
 
-Excellent news! Your material request is complete and ready for pickup.
+_COMPLETED_TEXT = EmailTemplate("""Excellent news! Your material request is complete and ready for pickup.
 
 REQUEST DETAILS:
-Request Number: {request['req_number']}
+Request Number: {req_number}
 Status: Completed
 {bundles_text}
 
@@ -477,36 +502,17 @@ ITEMS READY:
 
 Please collect your items from the procurement team at your earliest convenience.
 
-If you have any questions, please contact the procurement team.
+If you have any questions, please contact the procurement team.""")
 
----
-This is an automated notification from the Requirements Management System.
-"""
-    
-    # HTML body
-    html_body = f"""
-    <html>
-    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-        <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-            <h2 style="color: #4CAF50;">✅ Your Items Are Ready for Pickup!</h2>
-            
-            <p>Hi {user['full_name']},</p>
-            
-            <p>Excellent news! Your material request is complete and ready for pickup.</p>
+_COMPLETED_HTML = EmailTemplate("""<p>Excellent news! Your material request is complete and ready for pickup.</p>
             
             <div style="background-color: #f5f5f5; padding: 15px; border-radius: 5px; margin: 20px 0;">
                 <h3 style="margin-top: 0; color: #4CAF50;">Request Details</h3>
-                <p style="margin: 5px 0;"><strong>Request Number:</strong> {request['req_number']}</p>
+                <p style="margin: 5px 0;"><strong>Request Number:</strong> {req_number}</p>
                 <p style="margin: 5px 0;"><strong>Status:</strong> <span style="color: #4CAF50; font-weight: bold;">Completed</span></p>
             </div>
             
-            {''.join([f'''
-            <div style="background-color: #e8f5e9; padding: 15px; border-radius: 5px; margin: 20px 0; border-left: 4px solid #4CAF50;">
-                <h3 style="margin-top: 0; color: #2e7d32;">Delivery {idx if len(bundles) > 1 else ""} Information</h3>
-                <p style="margin: 5px 0;"><strong>Packing Slip:</strong> {bundle.get('packing_slip_code', 'N/A')}</p>
-                <p style="margin: 5px 0;"><strong>Delivery Date:</strong> {_format_date(bundle.get('actual_delivery_date')) if bundle.get('actual_delivery_date') else 'Today'}</p>
-            </div>
-            ''' for idx, bundle in enumerate(bundles, 1)])}
+            {bundles_html}
             
             <h3 style="color: #4CAF50;">Items Ready</h3>
             <table style="width: 100%; border-collapse: collapse; margin: 20px 0;">
@@ -526,13 +532,212 @@ This is an automated notification from the Requirements Management System.
                 <p style="margin: 0;"><strong>📍 Next Step:</strong> Please collect your items from the procurement team at your earliest convenience.</p>
             </div>
             
-            <p>If you have any questions, please contact the procurement team.</p>
+            <p>If you have any questions, please contact the procurement team.</p>""")
+
+
+def _simple_item_rows(items):
+    """Row values for the ordered / completed item lists"""
+    return [{'idx': idx, 'item_name': item['item_name'], 'quantity': item['quantity']}
+            for idx, item in enumerate(items, 1)]
+
+
+def _build_in_progress_section(request, items):
+    """Build the email section for 'In Progress' status"""
+    
+    subject = "Your Material Request is Being Processed"
+    
+    # Build items list
+    rows = []
+    for idx, item in enumerate(items, 1):
+        sku = item.get('sku')
+        # Project and date are formatted once and shared by the text and HTML rows
+        project = format_project_display(item.get('project_number', '—'), item.get('sub_project_number'))
+        date_needed = _format_date(item.get('date_needed'))
+        rows.append({
+            'idx': idx,
+            'item_name': item['item_name'],
+            'quantity': item['quantity'],
+            'sku_text': f" (SKU: {sku})" if sku else "",
+            'sku_html': f"<br><small style='color: #666;'>SKU: {sku}</small>" if sku else "",
+            'project_text': f"\n   Project: {project}" if item.get('project_number') else "",
+            'needed_text': f"\n   Needed by: {date_needed}" if item.get('date_needed') else "",
+            'project': project,
+            'date_needed': date_needed
+        })
+    
+    # Build notes section if exists
+    notes_text = ""
+    notes_html = ""
+    if request.get('user_notes') and request['user_notes'].strip():
+        notes_text = f"\n\nYOUR NOTES:\n{request['user_notes']}\n"
+        notes_html = _IN_PROGRESS_NOTES_HTML.render(user_notes=request['user_notes'])
+    
+    values = {
+        'req_number': request['req_number'],
+        'submitted': _format_date(request['req_date']),
+        'item_count': len(items),
+        'notes_text': notes_text,
+        'notes_html': notes_html,
+        'items_text': _IN_PROGRESS_ITEM_TEXT.render_rows(rows),
+        'items_html': _IN_PROGRESS_ITEM_HTML.render_rows(rows)
+    }
+    return subject, '#2c5aa0', _IN_PROGRESS_TEXT.render(values), _IN_PROGRESS_HTML.render(values)
+
+
+def _build_ordered_section(request, items, bundle_data):
+    """Build the email section for 'Ordered' status"""
+    
+    subject = "📦 Your Items Have Been Ordered"
+    
+    # Get bundles info (can be multiple bundles)
+    bundles = bundle_data.get('bundles', []) if bundle_data else []
+    
+    # If no bundles data (backward compatibility), use old format
+    if not bundles:
+        po_number = bundle_data.get('po_number', 'TBD') if bundle_data else 'TBD'
+        po_date = bundle_data.get('po_date') if bundle_data else None
+        expected_delivery = bundle_data.get('expected_delivery_date') if bundle_data else None
+        bundles = [{'po_number': po_number, 'po_date': po_date, 'expected_delivery_date': expected_delivery}]
+    
+    # Build bundles info text
+    if len(bundles) > 1:
+        lines = [f"\n\nYour items have been ordered from {len(bundles)} vendors:\n"]
+        for idx, bundle in enumerate(bundles, 1):
+            lines.append(f"\nOrder {idx}:")
+            lines.append(f"\n  PO Number: {bundle.get('po_number', 'TBD')}")
+            if bundle.get('expected_delivery_date'):
+                lines.append(f"\n  Expected Delivery: {_format_date(bundle['expected_delivery_date'])}")
+    else:
+        bundle = bundles[0] if bundles else {}
+        lines = ["\n\nORDER INFORMATION:", f"\nPO Number: {bundle.get('po_number', 'TBD')}"]
+        if bundle.get('expected_delivery_date'):
+            lines.append(f"\nExpected Delivery: {_format_date(bundle['expected_delivery_date'])}")
+    
+    bundles_html = _ORDERED_BUNDLE_HTML.render_rows({
+        'label': idx if len(bundles) > 1 else "",
+        'po_number': bundle.get('po_number', 'TBD'),
+        'expected_delivery': _format_date(bundle.get('expected_delivery_date')) if bundle.get('expected_delivery_date') else 'TBD'
+    } for idx, bundle in enumerate(bundles, 1))
+    
+    rows = _simple_item_rows(items)
+    values = {
+        'req_number': request['req_number'],
+        'bundles_text': ''.join(lines),
+        'bundles_html': bundles_html,
+        'items_text': _SIMPLE_ITEM_TEXT.render_rows(rows),
+        'items_html': _SIMPLE_ITEM_HTML.render_rows(rows)
+    }
+    return subject, '#4CAF50', _ORDERED_TEXT.render(values), _ORDERED_HTML.render(values)
+
+
+def _build_completed_section(request, items, bundle_data):
+    """Build the email section for 'Completed' status"""
+    
+    subject = "✅ Your Items Are Ready for Pickup!"
+    
+    # Get bundles info (can be multiple bundles)
+    bundles = bundle_data.get('bundles', []) if bundle_data else []
+    
+    # If no bundles data (backward compatibility), use old format
+    if not bundles:
+        actual_delivery = bundle_data.get('actual_delivery_date') if bundle_data else None
+        packing_slip = bundle_data.get('packing_slip_code', 'N/A') if bundle_data else 'N/A'
+        bundles = [{'packing_slip_code': packing_slip, 'actual_delivery_date': actual_delivery}]
+    
+    # Build bundles info text
+    if len(bundles) > 1:
+        lines = [f"\n\nYour items arrived in {len(bundles)} deliveries:\n"]
+        for idx, bundle in enumerate(bundles, 1):
+            lines.append(f"\nDelivery {idx}:")
+            if bundle.get('packing_slip_code'):
+                lines.append(f"\n  Packing Slip: {bundle['packing_slip_code']}")
+            if bundle.get('actual_delivery_date'):
+                lines.append(f"\n  Delivery Date: {_format_date(bundle['actual_delivery_date'])}")
+    else:
+        bundle = bundles[0] if bundles else {}
+        lines = ["\n\nDELIVERY INFORMATION:"]
+        if bundle.get('packing_slip_code'):
+            lines.append(f"\nPacking Slip: {bundle['packing_slip_code']}")
+        if bundle.get('actual_delivery_date'):
+            lines.append(f"\nDelivery Date: {_format_date(bundle['actual_delivery_date'])}")
+    
+    bundles_html = _COMPLETED_BUNDLE_HTML.render_rows({
+        'label': idx if len(bundles) > 1 else "",
+        'packing_slip_code': bundle.get('packing_slip_code', 'N/A'),
+        'delivery_date': _format_date(bundle.get('actual_delivery_date')) if bundle.get('actual_delivery_date') else 'Today'
+    } for idx, bundle in enumerate(bundles, 1))
+    
+    rows = _simple_item_rows(items)
+    values = {
+        'req_number': request['req_number'],
+        'bundles_text': ''.join(lines),
+        'bundles_html': bundles_html,
+        'items_text': _SIMPLE_ITEM_TEXT.render_rows(rows),
+        'items_html': _SIMPLE_ITEM_HTML.render_rows(rows)
+    }
+    return subject, '#4CAF50', _COMPLETED_TEXT.render(values), _COMPLETED_HTML.render(values)
+
+
+# The digest wraps one section per request in its own greeting and footer
+_DIGEST_SECTION_TEXT = EmailTemplate("\n===== {idx}. {subject} =====\n\n{body}\n")
+
+_DIGEST_SECTION_HTML = EmailTemplate("""
+            <div style="border: 1px solid #ddd; border-radius: 5px; padding: 15px; margin: 20px 0;">
+                <h2 style="color: #2c5aa0; margin-top: 0;">{subject}</h2>
+                {body}
+            </div>
+        """)
+
+_DIGEST_TEXT = EmailTemplate("""
+Hi {full_name},
+
+There are {count} updates on your material requests.
+{sections}""" + _FOOTER_TEXT)
+
+_DIGEST_HTML = EmailTemplate("""
+    <html>
+    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+        <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+            <h2 style="color: #2c5aa0;">{title}</h2>
+            
+            <p>Hi {full_name},</p>
             
+            <p>There are {count} updates on your material requests.</p>
+            {sections}
             <hr style="border: none; border-top: 1px solid #ddd; margin: 30px 0;">
             <p style="font-size: 12px; color: #666;">This is an automated notification from the Requirements Management System.</p>
         </div>
     </body>
     </html>
-    """
+    """)
+
+# ========== Email assembly ==========
+
+def _build_email(user, section):
+    """Wrap one (subject, title_color, text, html) section in the greeting and footer"""
+    subject, title_color, text, html = section
+    return (
+        subject,
+        _EMAIL_TEXT.render(full_name=user['full_name'], body=text),
+        _EMAIL_HTML.render(full_name=user['full_name'], title=subject, title_color=title_color, body=html)
+    )
+
+
+def _build_digest_email(user, sections):
+    """Combine several (subject, title_color, text, html) sections for one user into one email"""
+    
+    subject = f"Updates on {len(sections)} of your material requests"
+    
+    text_rows = []
+    html_rows = []
+    for idx, (section_subject, _, text, html) in enumerate(sections, 1):
+        text_rows.append({'idx': idx, 'subject': section_subject, 'body': text})
+        html_rows.append({'idx': idx, 'subject': section_subject, 'body': html})
     
-    return subject, body_text, html_body
+    return (
+        subject,
+        _DIGEST_TEXT.render(full_name=user['full_name'], count=len(sections),
+                            sections=_DIGEST_SECTION_TEXT.render_rows(text_rows)),
+        _DIGEST_HTML.render(full_name=user['full_name'], title=subject, count=len(sections),
+                            sections=_DIGEST_SECTION_HTML.render_rows(html_rows))
+    )
@@ -0,0 +1,285 @@
+"""
+Vendor selection optimizers for the Smart Bundling Engine
+- Every item is assigned to exactly one vendor that carries it (ItemVendorMap)
+- Objective: vendor_weight * vendors used (vendors with an open bundle are free to use)
+           + cost_weight * landed cost (ItemVendorMap.cost * quantity)
+           + minimum_weight * shortfall below per-vendor order minimums
+- ExactOptimizer: branch and bound over item -> vendor assignments, stops at the time budget
+- GreedyOptimizer: weighted greedy set cover (large catalogs, and the exact solver's starting point)
+- Vendor capabilities are integer bitsets over the item list (AND + popcount instead of set scans)
+- VendorOptimizer: picks exact for small instances, greedy otherwise
+"""
+
+import math
+import time
+
+# Defaults - one extra vendor (PO, shipment, receiving) is weighed like $100 of material cost
+DEFAULT_VENDOR_WEIGHT = 100.0
+DEFAULT_COST_WEIGHT = 1.0
+DEFAULT_MINIMUM_WEIGHT = 1.0
+DEFAULT_TIME_BUDGET = 2.0        # Seconds the exact solver may spend before returning its best answer
+DEFAULT_EXACT_MAX_ITEMS = 60     # Larger instances go straight to greedy
+DEFAULT_EXACT_MAX_VENDORS = 40
+
+
+class _TimeBudgetExceeded(Exception):
+    pass
+
+
+class SelectionProblem:
+    """
+    Normalized optimizer input
+
+    Args:
+        quantities: {item_id: total quantity}
+        offers: {item_id: {vendor_id: unit cost or None}}
+        vendor_minimums: Optional {vendor_id: minimum order value}
+        open_vendors: Optional vendor ids that already have an open bundle - new lines merge
+                      into it, so using them adds no vendor_weight
+    """
+
+    def __init__(self, quantities, offers, vendor_minimums=None, open_vendors=None):
+        self.quantities = quantities
+        self.vendor_minimums = vendor_minimums or {}
+        self.open_vendors = frozenset(open_vendors or ())
+
+        # Items nobody carries can't be covered - reported back, not optimized
+        self.item_ids = [item_id for item_id in quantities if offers.get(item_id)]
+        self.uncoverable = [item_id for item_id in quantities if not offers.get(item_id)]
+
+        # Line cost per (item, vendor). Unknown costs use the item's highest known cost so
+        # a vendor without a price is never preferred just because it has no price.
+        self.line_costs = {}
+        for item_id in self.item_ids:
+            known = [cost for cost in offers[item_id].values() if cost is not None]
+            fallback = max(known) if known else 0.0
+            quantity = quantities[item_id]
+            self.line_costs[item_id] = {
+                vendor_id: float(fallback if cost is None else cost) * quantity
+                for vendor_id, cost in offers[item_id].items()
+            }
+
+        self.vendor_ids = sorted({v for costs in self.line_costs.values() for v in costs})
+
+        # Capability matrix as integer bitsets: bit k of capability_bits[vendor] = vendor carries item_ids[k]
+        self.item_bit = {item_id: 1 << k for k, item_id in enumerate(self.item_ids)}
+        self.all_items_bits = (1 << len(self.item_ids)) - 1
+        self.capability_bits = dict.fromkeys(self.vendor_ids, 0)
+        for item_id, costs in self.line_costs.items():
+            bit = self.item_bit[item_id]
+            for vendor_id in costs:
+                self.capability_bits[vendor_id] |= bit
+
+    def items_in(self, bits):
+        """Item ids for the set bits of an item bitset"""
+        item_ids = self.item_ids
+        while bits:
+            low = bits & -bits
+            yield item_ids[low.bit_length() - 1]
+            bits ^= low
+
+
+class _Objective:
+    """Weighted objective shared by every optimizer"""
+
+    def __init__(self, vendor_weight, cost_weight, minimum_weight):
+        self.vendor_weight = vendor_weight
+        self.cost_weight = cost_weight
+        self.minimum_weight = minimum_weight
+
+    def evaluate(self, problem, assignment):
+        """Score a full {item_id: vendor_id} assignment"""
+        subtotals = {}
+        for item_id, vendor_id in assignment.items():
+            subtotals[vendor_id] = subtotals.get(vendor_id, 0.0) + problem.line_costs[item_id][vendor_id]
+
+        total_cost = sum(subtotals.values())
+        shortfall = sum(
+            max(0.0, float(problem.vendor_minimums.get(vendor_id, 0) or 0) - subtotal)
+            for vendor_id, subtotal in subtotals.items()
+        )
+        new_vendors = sum(1 for vendor_id in subtotals if vendor_id not in problem.open_vendors)
+        score = (self.vendor_weight * new_vendors
+                 + self.cost_weight * total_cost
+                 + self.minimum_weight * shortfall)
+        return score, total_cost, shortfall
+
+    @staticmethod
+    def cheapest_assignment(problem, vendor_ids):
+        """Assign each item to the cheapest chosen vendor that carries it"""
+        chosen = set(vendor_ids)
+        assignment = {}
+        for item_id in problem.item_ids:
+            candidates = [(cost, vendor_id) for vendor_id, cost in problem.line_costs[item_id].items()
+                          if vendor_id in chosen]
+            if candidates:
+                assignment[item_id] = min(candidates)[1]
+        return assignment
+
+
+class GreedyOptimizer(_Objective):
+    """Weighted greedy set cover: repeatedly take the vendor with the lowest cost per newly covered item"""
+    method = 'greedy'
+
+    def solve(self, problem):
+        started = time.monotonic()
+        line_costs = problem.line_costs
+        remaining = problem.all_items_bits
+        open_vendors = problem.open_vendors
+        chosen = []
+
+        # Per-vendor count and cost of the still-uncovered items it carries, kept up to date
+        # incrementally as items get covered (no rescans of the capability matrix)
+        cover_count = {v: bits.bit_count() for v, bits in problem.capability_bits.items()}
+        cover_cost = dict.fromkeys(problem.vendor_ids, 0.0)
+        for item_id, costs in line_costs.items():
+            for vendor_id, line_cost in costs.items():
+                cover_cost[vendor_id] += line_cost
+
+        while remaining:
+            best_vendor = None
+            best_ratio = None
+            best_cover = 0
+            for vendor_id, count in cover_count.items():
+                if not count:
+                    continue
+                opening_cost = 0.0 if vendor_id in open_vendors else self.vendor_weight
+                ratio = (opening_cost + self.cost_weight * cover_cost[vendor_id]) / count
+                # Ties go to the vendor covering more items (the original greedy rule)
+                if best_ratio is None or ratio < best_ratio or (ratio == best_ratio and count > best_cover):
+                    best_vendor, best_ratio, best_cover = vendor_id, ratio, count
+
+            chosen.append(best_vendor)
+            newly_covered = problem.capability_bits[best_vendor] & remaining
+            remaining &= ~newly_covered
+            for item_id in problem.items_in(newly_covered):
+                for vendor_id, line_cost in line_costs[item_id].items():
+                    cover_count[vendor_id] -= 1
+                    cover_cost[vendor_id] -= line_cost
+
+        assignment = self.cheapest_assignment(problem, chosen)
+        return self._result(problem, assignment, optimal=False, started=started)
+
+    def _result(self, problem, assignment, optimal, started, nodes=0):
+        score, total_cost, shortfall = self.evaluate(problem, assignment)
+        return {
+            'assignment': assignment,
+            'vendors': sorted(set(assignment.values())),
+            'objective': score,
+            'total_cost': total_cost,
+            'minimum_shortfall': shortfall,
+            'uncovered_items': list(problem.uncoverable),
+            'method': self.method,
+            'optimal': optimal,
+            'nodes_explored': nodes,
+            'elapsed_seconds': time.monotonic() - started
+        }
+
+
+class ExactOptimizer(GreedyOptimizer):
+    """
+    Branch and bound over item -> vendor assignments, seeded with the greedy answer.
+    Returns the best assignment found; 'optimal' is False if the time budget ran out first.
+    """
+    method = 'exact'
+
+    def __init__(self, vendor_weight, cost_weight, minimum_weight, time_budget=DEFAULT_TIME_BUDGET):
+        super().__init__(vendor_weight, cost_weight, minimum_weight)
+        self.time_budget = time_budget
+
+    def solve(self, problem):
+        started = time.monotonic()
+        deadline = started + self.time_budget
+
+        incumbent = GreedyOptimizer.solve(self, problem)
+        best = {'score': incumbent['objective'], 'assignment': incumbent['assignment']}
+
+        # Most constrained items first, each item's vendors cheapest first
+        items = sorted(problem.item_ids, key=lambda i: (len(problem.line_costs[i]), i))
+        options = {i: sorted(problem.line_costs[i].items(), key=lambda kv: (kv[1], kv[0])) for i in items}
+        min_line_cost = {i: options[i][0][1] for i in items}
+
+        # remaining_min_cost[k] = cheapest possible cost of items[k:]
+        remaining_min_cost = [0.0] * (len(items) + 1)
+        for k in range(len(items) - 1, -1, -1):
+            remaining_min_cost[k] = remaining_min_cost[k + 1] + min_line_cost[items[k]]
+
+        # suffix_bits[k] = bitset of items[k:]
+        suffix_bits = [0] * (len(items) + 1)
+        for k in range(len(items) - 1, -1, -1):
+            suffix_bits[k] = suffix_bits[k + 1] | problem.item_bit[items[k]]
+
+        capability_bits = problem.capability_bits
+        open_vendors = problem.open_vendors
+        max_capability = max((bits.bit_count() for bits in capability_bits.values()), default=1) or 1
+        open_served = 0
+        for vendor_id in open_vendors:
+            open_served |= capability_bits.get(vendor_id, 0)
+        assignment = {}
+        vendor_load = {}  # vendor_id -> items assigned so far
+        nodes = [0]
+
+        def lower_bound(k, cost_so_far):
+            # Items after k not carried by an already-used or open vendor need at least one more vendor per max_capability items
+            served = open_served
+            paid_vendors = 0
+            for vendor_id in vendor_load:
+                served |= capability_bits[vendor_id]
+                if vendor_id not in open_vendors:
+                    paid_vendors += 1
+            unserved = (suffix_bits[k] & ~served).bit_count()
+            extra_vendors = math.ceil(unserved / max_capability) if unserved else 0
+            return (self.vendor_weight * (paid_vendors + extra_vendors)
+                    + self.cost_weight * (cost_so_far + remaining_min_cost[k]))
+
+        def search(k, cost_so_far):
+            nodes[0] += 1
+            if nodes[0] % 512 == 0 and time.monotonic() > deadline:
+                raise _TimeBudgetExceeded()
+
+            if k == len(items):
+                score = self.evaluate(problem, assignment)[0]
+                if score < best['score']:
+                    best['score'] = score
+                    best['assignment'] = dict(assignment)
+                return
+
+            if lower_bound(k, cost_so_far) >= best['score']:
+                return
+
+            item_id = items[k]
+            # Vendors already in the solution or with an open bundle first - they add no vendor cost
+            ordered = sorted(options[item_id], key=lambda kv: (kv[0] not in vendor_load and kv[0] not in open_vendors, kv[1]))
+            for vendor_id, line_cost in ordered:
+                assignment[item_id] = vendor_id
+                vendor_load[vendor_id] = vendor_load.get(vendor_id, 0) + 1
+                search(k + 1, cost_so_far + line_cost)
+                vendor_load[vendor_id] -= 1
+                if not vendor_load[vendor_id]:
+                    del vendor_load[vendor_id]
+            del assignment[item_id]
+
+        optimal = True
+        try:
+            search(0, 0.0)
+        except _TimeBudgetExceeded:
+            optimal = False
+
+        return self._result(problem, best['assignment'], optimal=optimal, started=started, nodes=nodes[0])
+
+
+class VendorOptimizer:
+    """Pick the exact solver for small instances and greedy for large ones"""
+
+    def __init__(self, vendor_weight=DEFAULT_VENDOR_WEIGHT, cost_weight=DEFAULT_COST_WEIGHT,
+                 minimum_weight=DEFAULT_MINIMUM_WEIGHT, time_budget=DEFAULT_TIME_BUDGET,
+                 exact_max_items=DEFAULT_EXACT_MAX_ITEMS, exact_max_vendors=DEFAULT_EXACT_MAX_VENDORS):
+        self.exact = ExactOptimizer(vendor_weight, cost_weight, minimum_weight, time_budget)
+        self.greedy = GreedyOptimizer(vendor_weight, cost_weight, minimum_weight)
+        self.exact_max_items = exact_max_items
+        self.exact_max_vendors = exact_max_vendors
+
+    def solve(self, problem):
+        if len(problem.item_ids) <= self.exact_max_items and len(problem.vendor_ids) <= self.exact_max_vendors:
+            return self.exact.solve(problem)
+        return self.greedy.solve(problem)
@@ -0,0 +1,73 @@
+# Micro-benchmark for the notification email builders (no database or SMTP needed)
+# Usage: python benchmarks/benchmark_email_templates.py [lines] [repeat]
+import sys
+import os
+import timeit
+from datetime import date, datetime, timedelta
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Phase3'))
+
+from email_templates import EmailTemplate
+from user_notifications import (_build_email, _build_in_progress_section, _build_ordered_section,
+                                _build_completed_section, _IN_PROGRESS_HTML)
+from operation_team_notifications import _build_bundle_reviewed_email
+
+
+def _sample_data(lines):
+    """Synthetic request/bundle with `lines` item lines"""
+    today = date.today()
+    user = {'user_id': 1, 'full_name': 'Benchmark User', 'email': 'bench@example.com'}
+    request = {'req_number': 'REQ-BENCH-0001', 'req_date': today, 'user_notes': 'Deliver to bay 3'}
+    items = [{
+        'item_name': f'Galvanized Steel Sheet {i}',
+        'sku': f'SKU-{i:05d}' if i % 2 else None,
+        'quantity': i % 40 + 1,
+        'project_number': f'P-{i % 7}',
+        'sub_project_number': f'S-{i % 3}' if i % 3 else None,
+        'date_needed': today + timedelta(days=i % 30)
+    } for i in range(lines)]
+    bundle_data = {'bundles': [{
+        'bundle_id': b, 'vendor_id': b, 'po_number': f'PO-{b}', 'po_date': datetime.now(),
+        'expected_delivery_date': today, 'packing_slip_code': f'PS-{b}', 'actual_delivery_date': today
+    } for b in range(3)]}
+    bundle = {
+        'bundle_name': 'BUNDLE-BENCH', 'vendor_name': 'Bench Vendor', 'vendor_email': 'v@example.com',
+        'vendor_phone': '555-0100', 'reviewed_at': datetime.now(), 'reviewed_by': 'Operator',
+        'total_quantity': sum(item['quantity'] for item in items), 'merge_count': 2,
+        'created_at': datetime.now(), 'last_merged_at': datetime.now()
+    }
+    bundle_items = [{'item_name': item['item_name'], 'size_details': '4x8' if i % 2 else None,
+                     'total_quantity': item['quantity']} for i, item in enumerate(items)]
+    bundle_requests = [{
+        'req_number': f'REQ-{r:04d}', 'full_name': f'User {r}', 'item_count': 5, 'project_number': f'P-{r}',
+        'sub_project_number': None, 'user_notes': 'urgent' if r % 4 == 0 else '',
+        'earliest_date_needed': today + timedelta(days=r % 10)
+    } for r in range(max(1, lines // 5))]
+    return user, request, items, bundle_data, bundle, bundle_items, bundle_requests
+
+
+def run_benchmark(lines=500, repeat=200):
+    user, request, items, bundle_data, bundle, bundle_items, bundle_requests = _sample_data(lines)
+    cases = [
+        ('in_progress', lambda: _build_email(user, _build_in_progress_section(request, items))),
+        ('ordered', lambda: _build_email(user, _build_ordered_section(request, items, bundle_data))),
+        ('completed', lambda: _build_email(user, _build_completed_section(request, items, bundle_data))),
+        ('bundle_reviewed', lambda: _build_bundle_reviewed_email(bundle, bundle_items, bundle_requests)),
+    ]
+
+    print(f"EMAIL BUILDER BENCHMARK ({lines} item lines, best of 5 x {repeat} renders)")
+    print("=" * 60)
+    for name, build in cases:
+        best = min(timeit.repeat(build, number=repeat, repeat=5)) / repeat
+        _, body_text, html_body = build()
+        print(f"{name:<16} {best * 1000:8.3f} ms/email   text {len(body_text):>7} chars   html {len(html_body):>8} chars")
+
+    # Field validation happens once per process, when each template is defined
+    source = _IN_PROGRESS_HTML.source
+    check = min(timeit.repeat(lambda: EmailTemplate(source), number=repeat, repeat=5)) / repeat
+    print(f"{'(field check)':<16} {check * 1000:8.3f} ms/template (paid once at import)")
+
+
+if __name__ == "__main__":
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    run_benchmark(lines, repeat)